@@ -4,10 +4,12 @@ from dotenv import load_dotenv
 load_dotenv()
 
 
-from crewai import Agent,LLM
+from crewai import Agent, LLM
 
-from tools import search_tool, FinancialDocumentTool
-from langchain_huggingface import HuggingFaceEndpoint
+import config
+import deadlines
+from llm_scheduler import scheduled_call
+from tools import search_tool, FinancialDocumentTool, DocumentSearchTool, TableQueryTool, InvestmentTool, RiskTool
 
 import logging
 
@@ -15,13 +17,40 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+
+class ScheduledLLM(LLM):
+    """crewai LLM whose calls are admitted by the process-wide scheduler
+
+    Agents keep no rate limit of their own; every call, from any agent or
+    request, draws on the same budgets. Each call's timeout is
+    ``DEADLINE_LLM_CALL_SECONDS`` or whatever is left of its request's
+    deadline, if that is less.
+    """
+
+    @property
+    def timeout(self):
+        return deadlines.timeout("llm")
+
+    @timeout.setter
+    def timeout(self, value):
+        # The limit comes from the request deadline and configuration instead
+        pass
+
+    def call(self, messages, *args, **kwargs):
+        parent_call = super().call
+        return scheduled_call(self.model, messages, lambda: parent_call(messages, *args, **kwargs))
+
+
 ### Loading LLM
 # Fix: Properly initialize LLM instead of circular reference
 try:
     logger.info("Initializing OpenAI LLM...")
-    llm = LLM(
-        model="openrouter/deepseek/deepseek-r1",
-        api_key="or_key"
+    # Rate limits are enforced for all agents together by the LLM scheduler
+    llm = ScheduledLLM(
+        model=config.LLM_MODEL,
+        api_key=config.LLM_API_KEY,
+        base_url=config.LLM_BASE_URL or None,
+        stream=config.LLM_STREAM
     )
 
     logger.info("LLM initialized successfully")
@@ -44,10 +73,16 @@ financial_analyst=Agent(
         "facts and assumptions, and you always highlight risks and limitations in your analysis. "
         "You follow strict professional standards and regulatory compliance in all your recommendations."
     ),
-    tools=[FinancialDocumentTool.read_data_tool, search_tool],
+    tools=[
+        DocumentSearchTool.search_document_tool,
+        TableQueryTool.query_tables_tool,
+        FinancialDocumentTool.read_data_tool,
+        InvestmentTool.analyze_investment_tool,
+        RiskTool.create_risk_assessment_tool,
+        search_tool,
+    ],
     llm=llm,
     max_iter=3,
-    max_rpm=10,
     allow_delegation=True
 )
 
@@ -69,7 +104,6 @@ verifier = Agent(
     tools=[FinancialDocumentTool.read_data_tool],
     llm=llm,
     max_iter=2,
-    max_rpm=10,
     allow_delegation=False
 )
 
@@ -88,10 +122,9 @@ investment_advisor = Agent(
         "You adhere strictly to fiduciary standards and regulatory requirements. You never guarantee "
         "returns and always emphasize the importance of diversification and professional consultation."
     ),
-    tools=[search_tool],
+    tools=[InvestmentTool.analyze_investment_tool, search_tool],
     llm=llm,
     max_iter=3,
-    max_rpm=10,
     allow_delegation=False
 )
 
@@ -110,9 +143,8 @@ risk_assessor = Agent(
         "risk mitigation strategies. You are conservative in your risk assessments and always "
         "consider worst-case scenarios while providing balanced, professional recommendations."
     ),
-    tools=[search_tool],
+    tools=[RiskTool.create_risk_assessment_tool, search_tool],
     llm=llm,
     max_iter=2,
-    max_rpm=10,
     allow_delegation=False
 )
@@ -0,0 +1,309 @@
+## Batch analysis of many documents under the shared job queue
+import os
+import time
+import uuid
+import threading
+import logging
+from concurrent.futures import wait
+
+from jobs import QueueFullError, FINISHED_STATES, SUCCEEDED
+from deadlines import request_deadline
+from extraction import spill_path
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+REJECTED = "rejected"
+
+BATCH_RUNNING = "running"
+BATCH_COMPLETED = "completed"
+BATCH_CANCELLED = "cancelled"
+
+
+class BatchDocument:
+    """One uploaded document of a batch
+
+    Duplicates keep their own filename but point at the first document with
+    the same content hash and report its job and result. ``preflight`` is
+    the document's local classification, handed to its analysis.
+    """
+
+    def __init__(self, index, filename, path=None, size=None, sha256=None, error=None):
+        self.index = index
+        self.filename = filename
+        self.path = path
+        self.size = size
+        self.sha256 = sha256
+        self.error = error
+        self.preflight = None
+        self.duplicate_of = None
+        self.cached_result = None
+        self.job = None
+
+    @property
+    def status(self):
+        if self.error is not None:
+            return REJECTED
+        if self.cached_result is not None:
+            return SUCCEEDED
+        if self.job is None:
+            return PENDING
+        return self.job.status
+
+
+class Batch:
+    """A set of documents analyzed with one query"""
+
+    def __init__(self, batch_id, query, mode, documents):
+        self.id = batch_id
+        self.query = query
+        self.mode = mode
+        self.documents = documents
+        self.created_at = time.time()
+        self.finished_at = None
+        self.cancelled = False
+        self.timings = {}
+
+    def unique_documents(self):
+        """Documents that need an analysis of their own"""
+        return [
+            document for document in self.documents
+            if document.error is None and document.duplicate_of is None and document.cached_result is None
+        ]
+
+    def _source(self, document):
+        return self.documents[document.duplicate_of] if document.duplicate_of is not None else document
+
+    @property
+    def status(self):
+        if self.cancelled:
+            return BATCH_CANCELLED
+        if all(self._source(document).status in FINISHED_STATES + (REJECTED,) for document in self.documents):
+            return BATCH_COMPLETED
+        return BATCH_RUNNING
+
+    def to_dict(self):
+        """Manifest with the state and, once finished, the result of every document"""
+        entries = []
+        counts = {}
+        for document in self.documents:
+            source = self._source(document)
+            status = source.status
+            counts[status] = counts.get(status, 0) + 1
+            entries.append({
+                "index": document.index,
+                "filename": document.filename,
+                "size": document.size,
+                "sha256": document.sha256,
+                "status": status,
+                "job_id": source.job.id if source.job is not None else None,
+                "duplicate_of": document.duplicate_of,
+                "cached": source.cached_result is not None,
+                "result": source.cached_result if source.cached_result is not None
+                else (source.job.result if source.job is not None else None),
+                "error": source.error if source.error is not None
+                else (source.job.error if source.job is not None else None),
+            })
+
+        return {
+            "batch_id": self.id,
+            "status": self.status,
+            "query": self.query,
+            "mode": self.mode,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "summary": {
+                "documents": len(self.documents),
+                "unique": len(self.unique_documents()),
+                "duplicates": sum(1 for document in self.documents if document.duplicate_of is not None),
+                **counts,
+            },
+            "timings": self.timings,
+            "documents": entries,
+        }
+
+
+def deduplicate(documents):
+    """Point every document at the first earlier one with the same content hash
+
+    Returns:
+        list: Paths of the duplicate copies, which are no longer needed.
+    """
+    first_seen = {}
+    redundant = []
+    for document in documents:
+        if document.error is not None:
+            continue
+        original = first_seen.setdefault(document.sha256, document.index)
+        if original != document.index:
+            document.duplicate_of = original
+            redundant.append(document.path)
+            document.path = None
+    return redundant
+
+
+class BatchManager:
+    """Feeds batch documents into the JobManager without flooding it
+
+    Every batch gets a dispatcher thread that first extracts all of its
+    documents in parallel and then submits one job per unique document. All
+    batches share ``max_in_flight`` job slots, so analyses still run on the
+    job manager's workers (the global concurrency cap) and single-document
+    requests always find room in the queue.
+
+    Args:
+        job_manager (JobManager): Queue the analyses are submitted to.
+        max_in_flight (int): Job slots all batches together may hold.
+        retry_interval (float, optional): Seconds to wait when the job queue is full.
+        result_ttl (float, optional): Seconds a finished batch stays queryable.
+    """
+
+    def __init__(self, job_manager, max_in_flight, retry_interval=1.0, result_ttl=3600):
+        self.job_manager = job_manager
+        self.max_in_flight = max(1, max_in_flight)
+        self.retry_interval = retry_interval
+        self.result_ttl = result_ttl
+        self._slots = threading.BoundedSemaphore(self.max_in_flight)
+        self._batches = {}
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    def _prune(self):
+        cutoff = time.time() - self.result_ttl
+        expired = [
+            batch_id for batch_id, batch in self._batches.items()
+            if batch.finished_at and batch.finished_at < cutoff
+        ]
+        for batch_id in expired:
+            del self._batches[batch_id]
+
+    def create(self, query, mode, documents, analyze, prepare=None, **job_kwargs):
+        """Register a batch and start dispatching its documents
+
+        Args:
+            query (str): Query applied to every document.
+            mode (str): Analysis mode passed through to ``analyze``.
+            documents (list): BatchDocument entries, already de-duplicated.
+            analyze (callable): Job function, called as
+                ``analyze(query=..., file_path=..., mode=..., preflight=..., **job_kwargs)``.
+            prepare (callable, optional): Called with the unique document paths before
+                any job is submitted, e.g. to extract them all in parallel.
+
+        Returns:
+            Batch: The new batch.
+        """
+        batch = Batch(str(uuid.uuid4()), query, mode, documents)
+        with self._lock:
+            self._prune()
+            self._batches[batch.id] = batch
+
+        dispatcher = threading.Thread(
+            target=self._dispatch,
+            args=(batch, analyze, prepare, job_kwargs),
+            name=f"batch-{batch.id[:8]}",
+            daemon=True,
+        )
+        dispatcher.start()
+        logger.info(f"Started batch {batch.id} with {len(documents)} documents")
+        return batch
+
+    def _dispatch(self, batch, analyze, prepare, job_kwargs):
+        pending = batch.unique_documents()
+        started = time.perf_counter()
+        try:
+            if prepare is not None and pending:
+                try:
+                    prepare([document.path for document in pending])
+                except Exception as e:
+                    # The agents extract each document themselves if this fails
+                    logger.warning(f"Batch {batch.id} preparation failed: {str(e)}")
+            batch.timings["extraction"] = round(time.perf_counter() - started, 3)
+
+            for document in pending:
+                if not self._submit(batch, document, analyze, job_kwargs):
+                    break
+            batch.timings["dispatch"] = round(time.perf_counter() - started, 3)
+
+            # Failures are recorded on each job by the job manager
+            wait([document.job.future for document in pending if document.job is not None])
+        finally:
+            # Documents that never got a job still own their uploaded file and its spilled pages
+            for document in pending:
+                if document.job is None and document.path:
+                    for path in (document.path, spill_path(document.path)):
+                        if os.path.exists(path):
+                            os.remove(path)
+            batch.finished_at = time.time()
+            batch.timings["total"] = round(time.perf_counter() - started, 3)
+            logger.info(f"Batch {batch.id} finished with status {batch.status}")
+
+    def _submit(self, batch, document, analyze, job_kwargs):
+        """Submit one document as soon as a slot is free; False if the batch was stopped"""
+        while not (batch.cancelled or self._stopping.is_set()):
+            if not self._slots.acquire(timeout=self.retry_interval):
+                continue
+            try:
+                job = self.job_manager.submit(
+                    analyze,
+                    query=batch.query,
+                    file_path=document.path,
+                    mode=batch.mode,
+                    preflight=document.preflight,
+                    # Large documents leave their extracted pages spilled next to the upload
+                    cleanup=[document.path, spill_path(document.path)],
+                    deadline=request_deadline(),
+                    metadata={
+                        "batch_id": batch.id,
+                        "mode": batch.mode,
+                        "query": batch.query,
+                        "file_processed": document.filename,
+                        "file_size": document.size,
+                        "file_sha256": document.sha256,
+                        "cached": False,
+                        "preflight": document.preflight,
+                    },
+                    **job_kwargs,
+                )
+            except QueueFullError:
+                self._slots.release()
+                self._stopping.wait(self.retry_interval)
+                continue
+            except Exception:
+                self._slots.release()
+                raise
+            document.job = job
+            job.future.add_done_callback(lambda future: self._slots.release())
+            if batch.cancelled:
+                # Cancelled while this job was being submitted
+                self.job_manager.cancel(job.id)
+            return True
+        return False
+
+    def get(self, batch_id):
+        with self._lock:
+            self._prune()
+            return self._batches.get(batch_id)
+
+    def cancel(self, batch_id):
+        """Stop dispatching a batch and cancel the jobs it already submitted
+
+        Returns:
+            Batch: The cancelled batch, or None if unknown.
+        """
+        batch = self.get(batch_id)
+        if batch is None:
+            return None
+        if batch.status != BATCH_COMPLETED:
+            batch.cancelled = True
+            for document in batch.unique_documents():
+                if document.job is not None and document.job.status not in FINISHED_STATES:
+                    self.job_manager.cancel(document.job.id)
+        return batch
+
+    def stats(self):
+        with self._lock:
+            running = sum(1 for batch in self._batches.values() if batch.finished_at is None)
+            return {"batches": len(self._batches), "running": running, "max_in_flight": self.max_in_flight}
+
+    def shutdown(self):
+        self._stopping.set()
@@ -0,0 +1,103 @@
+"""Throughput of a batch of documents versus submitting them one by one
+
+Each analysis is simulated: the document is read through the extraction tool
+and then the worker sleeps for ``--latency`` seconds in place of the LLM calls.
+
+Usage:
+    python benchmarks/bench_batch.py --documents 100 --duplicates 0.2 --workers 4 --latency 0.5
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+from concurrent.futures import wait
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jobs import JobManager
+from batches import BatchManager, BatchDocument, deduplicate
+from cache import file_sha256, remember_digest
+from tools import FinancialDocumentTool
+from extraction import extraction_cache, warm_extraction_cache
+from synthetic_pdf import write_pdf
+
+
+def fake_analysis(query, file_path, mode="standard", preflight=None, latency=0.5):
+    text = FinancialDocumentTool.read_data_tool.func(file_path)
+    time.sleep(latency)
+    return len(text)
+
+
+def make_documents(directory, count, duplicate_share, pages, seed=0):
+    """Write ``count`` PDFs of which about ``duplicate_share`` repeat an earlier one"""
+    rng = random.Random(seed)
+    unique = max(1, round(count * (1 - duplicate_share)))
+    paths = []
+    for i in range(count):
+        source = i if i < unique else rng.randrange(unique)
+        path = os.path.join(directory, f"doc_{i}.pdf")
+        write_pdf(path, pages, seed=source)
+        paths.append(path)
+    return paths
+
+
+def run_single(paths, workers, latency):
+    """One job per document, as with individual /analyze calls"""
+    extraction_cache.memory.clear()
+    manager = JobManager(workers=workers, max_queued=len(paths))
+    start = time.perf_counter()
+    jobs = [manager.submit(fake_analysis, query="q", file_path=path, latency=latency) for path in paths]
+    wait([job.future for job in jobs])
+    elapsed = time.perf_counter() - start
+    manager.shutdown()
+    return elapsed, len(jobs)
+
+
+def run_batch(paths, workers, latency):
+    """De-duplicate, extract everything in parallel, then dispatch under the shared cap"""
+    extraction_cache.memory.clear()
+    manager = JobManager(workers=workers, max_queued=workers)
+    batches = BatchManager(manager, max_in_flight=workers * 2, retry_interval=0.05)
+    start = time.perf_counter()
+    documents = []
+    for index, path in enumerate(paths):
+        digest = file_sha256(path)
+        remember_digest(path, digest)
+        documents.append(BatchDocument(index, os.path.basename(path), path, os.path.getsize(path), digest))
+    deduplicate(documents)
+    batch = batches.create("q", "standard", documents, fake_analysis, prepare=warm_extraction_cache,
+                           latency=latency)
+    while batch.finished_at is None:
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - start
+    manager.shutdown()
+    return elapsed, len(batch.unique_documents()), batch.timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--documents", type=int, default=100)
+    parser.add_argument("--duplicates", type=float, default=0.2, help="share of repeated documents")
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.5, help="simulated LLM seconds per analysis")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = make_documents(tmp, args.documents, args.duplicates, args.pages)
+        single_time, single_jobs = run_single(paths, args.workers, args.latency)
+        # Batch jobs delete their documents when done, so this run goes last
+        batch_time, batch_jobs, timings = run_batch(paths, args.workers, args.latency)
+
+    print(f"{args.documents} documents, {args.pages} pages each, {args.workers} workers, "
+          f"{args.latency}s simulated analysis")
+    print(f"{'mode':>8} {'analyses':>9} {'seconds':>8} {'docs/s':>8}")
+    print(f"{'single':>8} {single_jobs:>9} {single_time:>8.2f} {args.documents / single_time:>8.1f}")
+    print(f"{'batch':>8} {batch_jobs:>9} {batch_time:>8.2f} {args.documents / batch_time:>8.1f}")
+    print(f"batch extraction {timings['extraction']:.2f}s, speedup {single_time / batch_time:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
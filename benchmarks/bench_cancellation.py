@@ -0,0 +1,105 @@
+"""Worker time and LLM calls saved by cancelling analyses whose clients went away
+
+Every job makes --calls simulated LLM calls of --latency seconds through the
+LLM scheduler, the way an agent loop does. A share of the jobs is cancelled
+--cancel-after seconds in, as a stream whose client disconnects is, and each
+run is compared with the same load where nobody cancels. Reported are the
+worker seconds spent, the LLM calls made and refused, how long a cancelled
+job held its worker after the cancellation, and whether its upload was gone
+right away.
+
+Usage:
+    python benchmarks/bench_cancellation.py --jobs 16 --workers 4 --calls 10 --latency 0.2 --cancelled 0.5
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Measure cancellation, not waiting for rate limit budget
+os.environ.setdefault("LLM_REQUESTS_PER_MINUTE", "60000")
+os.environ.setdefault("LLM_TOKENS_PER_MINUTE", "100000000")
+
+from jobs import JobManager
+from deadlines import RequestDeadline, CLIENT_DISCONNECT
+from llm_scheduler import scheduled_call, request_context
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))] if values else 0.0
+
+
+def run(jobs, workers, calls, latency, cancelled_share, cancel_after):
+    manager = JobManager(workers=workers, max_queued=jobs)
+    made, busy, lock = [0], [0.0], threading.Lock()
+
+    def analysis(flow):
+        start = time.perf_counter()
+        try:
+            with request_context(flow=flow):
+                for _ in range(calls):
+                    scheduled_call("bench", "prompt " * 200, lambda: time.sleep(latency) or "reply " * 50)
+                    with lock:
+                        made[0] += 1
+        finally:
+            with lock:
+                busy[0] += time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as tmp:
+        submitted = []
+        for i in range(jobs):
+            path = os.path.join(tmp, f"upload_{i}.pdf")
+            with open(path, "wb") as f:
+                f.write(b"%PDF-1.4\n")
+            job = manager.submit(analysis, f"job-{i}", cleanup=[path], deadline=RequestDeadline(900))
+            submitted.append((job, path))
+        start = time.perf_counter()
+
+        to_cancel = submitted[:int(jobs * cancelled_share)]
+        releases, removed = [], 0
+        if to_cancel:
+            time.sleep(cancel_after)
+            for job, path in to_cancel:
+                cancelled_at = time.perf_counter()
+                manager.cancel(job.id, reason=CLIENT_DISCONNECT)
+                removed += not os.path.exists(path)
+                job.future.exception()
+                releases.append(time.perf_counter() - cancelled_at)
+        for job, _ in submitted:
+            job.future.exception()
+        wall = time.perf_counter() - start
+        manager.shutdown(wait=True)
+    return {
+        "wall": wall,
+        "busy": busy[0],
+        "made": made[0],
+        "refused": jobs * calls - made[0],
+        "release_p95": percentile(releases, 0.95),
+        "removed": f"{removed}/{len(to_cancel)}",
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--calls", type=int, default=10, help="LLM calls per analysis")
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per simulated LLM call")
+    parser.add_argument("--cancelled", type=float, default=0.5, help="share of jobs whose client disconnects")
+    parser.add_argument("--cancel-after", type=float, default=0.5, help="seconds before they disconnect")
+    args = parser.parse_args()
+
+    print(f"{'cancelled':>10} {'wall s':>7} {'worker s':>9} {'llm calls':>10} {'refused':>8} "
+          f"{'release p95 ms':>15} {'uploads gone':>13}")
+    for share in (0.0, args.cancelled):
+        result = run(args.jobs, args.workers, args.calls, args.latency, share, args.cancel_after)
+        print(f"{share:>10.0%} {result['wall']:>7.2f} {result['busy']:>9.2f} {result['made']:>10} "
+              f"{result['refused']:>8} {result['release_p95'] * 1000:>15.1f} {result['removed']:>13}")
+
+
+if __name__ == "__main__":
+    main()
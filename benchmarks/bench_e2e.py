@@ -0,0 +1,249 @@
+"""End-to-end load test of /analyze against local fake LLM and search services
+
+Starts the fake services and the API (uvicorn, in this process), uploads
+synthetic PDFs at each concurrency level, polls every job to completion and
+reports throughput, latency percentiles and memory. Nothing leaves the
+machine, so runs are free and repeatable.
+
+Usage:
+    python benchmarks/bench_e2e.py --concurrency 1 4 8 --requests 16 --pages 20 \\
+        --llm-latency 0.5 --search-latency 0.2 --output results/e2e.json [--baseline old.json]
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import platform
+import argparse
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+
+import fake_services
+from synthetic_pdf import build_pdf
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def rss_mb():
+    """Current resident set size of this process in MB"""
+    with open("/proc/self/statm") as f:
+        pages = int(f.read().split()[1])
+    return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+def peak_rss_mb():
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def percentile(values, share):
+    values = sorted(values)
+    if not values:
+        return None
+    index = min(len(values) - 1, max(0, round(share * (len(values) - 1))))
+    return round(values[index], 4)
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def start_api(port, timeout=120):
+    """Run the FastAPI app under uvicorn on a background thread and wait until it is ready"""
+    import httpx
+    import uvicorn
+    import main
+
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, name="api", daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    # The crew loads in the background after startup; keep it out of the first request's latency
+    deadline = time.perf_counter() + timeout
+    while httpx.get(f"http://127.0.0.1:{port}/health/ready").status_code != 200:
+        if time.perf_counter() > deadline:
+            raise RuntimeError("API did not become ready")
+        time.sleep(0.1)
+    return server, thread
+
+
+def analyze_once(client, pdf, query, mode, poll_interval, timeout):
+    """Upload one document and wait for its job; returns ``(seconds, status)``"""
+    start = time.perf_counter()
+    response = client.post(
+        "/analyze",
+        files={"file": ("report.pdf", pdf, "application/pdf")},
+        data={"query": query, "mode": mode, "use_cache": "false"},
+    )
+    if response.status_code != 202:
+        return time.perf_counter() - start, f"http_{response.status_code}"
+    status_url = response.json()["status_url"]
+    while time.perf_counter() - start < timeout:
+        job = client.get(status_url).json()
+        if job["status"] in ("succeeded", "failed", "cancelled"):
+            return time.perf_counter() - start, job["status"]
+        time.sleep(poll_interval)
+    return time.perf_counter() - start, "timeout"
+
+
+def run_level(base_url, documents, concurrency, requests, args):
+    import httpx
+
+    latencies = []
+    statuses = {}
+    rss_samples = [rss_mb()]
+    stop_sampling = threading.Event()
+
+    def sample_memory():
+        while not stop_sampling.wait(0.2):
+            rss_samples.append(rss_mb())
+
+    sampler = threading.Thread(target=sample_memory, daemon=True)
+    sampler.start()
+
+    def worker(i):
+        with httpx.Client(base_url=base_url, timeout=args.timeout) as client:
+            return analyze_once(client, documents[i % len(documents)], args.query, args.mode,
+                                args.poll_interval, args.timeout)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for seconds, status in pool.map(worker, range(requests)):
+            statuses[status] = statuses.get(status, 0) + 1
+            if status == "succeeded":
+                latencies.append(seconds)
+    wall = time.perf_counter() - start
+    stop_sampling.set()
+    sampler.join()
+
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "statuses": statuses,
+        "wall_seconds": round(wall, 3),
+        "throughput_per_second": round(len(latencies) / wall, 4),
+        "latency_seconds": {
+            "mean": round(sum(latencies) / len(latencies), 4) if latencies else None,
+            "p50": percentile(latencies, 0.50),
+            "p95": percentile(latencies, 0.95),
+            "p99": percentile(latencies, 0.99),
+            "max": round(max(latencies), 4) if latencies else None,
+        },
+        "rss_mb": {"start": round(rss_samples[0], 1), "max": round(max(rss_samples), 1)},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--requests", type=int, default=16, help="requests per concurrency level")
+    parser.add_argument("--mode", choices=["standard", "full", "hierarchical"], default="standard")
+    parser.add_argument("--query", default="Analyze revenue, margins and leverage")
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--tables", type=int, default=1, help="statement tables per page")
+    parser.add_argument("--periods", type=int, default=3, help="numeric columns per table row")
+    parser.add_argument("--documents", type=int, default=4, help="distinct synthetic PDFs to cycle through")
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--search-latency", type=float, default=0.2)
+    parser.add_argument("--completion-words", type=int, default=200)
+    parser.add_argument("--poll-interval", type=float, default=0.05)
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="earlier --output file to compare p95 latency against")
+    args = parser.parse_args()
+
+    fakes, fake_settings = fake_services.start(
+        llm_latency=args.llm_latency, search_latency=args.search_latency,
+        completion_words=args.completion_words,
+    )
+    fake_url = f"http://127.0.0.1:{fakes.server_address[1]}"
+    data_dir = tempfile.mkdtemp(prefix="bench_e2e_")
+
+    # The app reads its configuration at import time
+    os.environ.update({
+        "LLM_MODEL": "openai/fake-model",
+        "LLM_BASE_URL": f"{fake_url}/v1",
+        "LLM_API_KEY": "fake",
+        "SERPER_BASE_URL": fake_url,
+        "SERPER_API_KEY": "fake",
+        "DATA_DIR": data_dir,
+        "JOB_WORKERS": str(max(args.concurrency)),
+        "JOB_QUEUE_SIZE": str(max(args.concurrency) * 2),
+        "LLM_REQUESTS_PER_MINUTE": "100000",
+        "LLM_TOKENS_PER_MINUTE": "1000000000",
+        "RESPONSE_CACHE_ENABLED": "false",
+        "OTEL_SDK_DISABLED": "true",
+        "CREWAI_DISABLE_TELEMETRY": "true",
+    })
+
+    documents = [build_pdf(args.pages, seed=i, tables=args.tables, periods=args.periods)
+                 for i in range(args.documents)]
+    port = free_port()
+    server, thread = start_api(port)
+    base_url = f"http://127.0.0.1:{port}"
+
+    results = []
+    try:
+        for concurrency in args.concurrency:
+            results.append(run_level(base_url, documents, concurrency, args.requests, args))
+    finally:
+        server.should_exit = True
+        thread.join(timeout=10)
+        fakes.shutdown()
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = {result["concurrency"]: result for result in json.load(f)["results"]}
+
+    # Printed at the end so the table is not interleaved with the agents' console output
+    print(f"{'conc':>5} {'ok':>4} {'req/s':>7} {'p50 s':>7} {'p95 s':>7} {'p99 s':>7} {'rss MB':>8}"
+          + (f" {'p95 vs base':>12}" if baseline else ""))
+    for result in results:
+        latency = result["latency_seconds"]
+        line = (f"{result['concurrency']:>5} {result['statuses'].get('succeeded', 0):>4} "
+                f"{result['throughput_per_second']:>7.2f} {latency['p50'] or 0:>7.2f} "
+                f"{latency['p95'] or 0:>7.2f} {latency['p99'] or 0:>7.2f} {result['rss_mb']['max']:>8.1f}")
+        base = baseline.get(result["concurrency"])
+        if base and base["latency_seconds"]["p95"] and latency["p95"]:
+            line += f" {latency['p95'] / base['latency_seconds']['p95'] - 1:>+12.1%}"
+        print(line)
+
+    report = {
+        "benchmark": "e2e_analyze",
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "settings": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        "fake_calls": {"llm": fake_settings.llm_calls, "search": fake_settings.search_calls},
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "results": results,
+    }
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Serial vs parallel PDF extraction on large synthetic reports
+
+Usage:
+    python benchmarks/bench_extraction.py --pages 100 300 600 --workers 4
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extraction import extract_pages, shutdown_pool
+from synthetic_pdf import write_pdf
+
+
+def _time(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[100, 300, 600])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"workers={args.workers} cpus={os.cpu_count()} repeat={args.repeat}")
+    print(f"{'pages':>6} {'serial s':>10} {'parallel s':>11} {'speedup':>8}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Warm the pool so process start-up is not charged to the first size
+        warm_path = write_pdf(os.path.join(tmp, "warm.pdf"), 4)
+        extract_pages(warm_path, parallel=True, workers=args.workers)
+
+        for pages in args.pages:
+            path = write_pdf(os.path.join(tmp, f"report_{pages}.pdf"), pages)
+            serial, serial_pages = _time(lambda: extract_pages(path, parallel=False), args.repeat)
+            parallel, parallel_pages = _time(
+                lambda: extract_pages(path, parallel=True, workers=args.workers), args.repeat
+            )
+            assert serial_pages == parallel_pages, "parallel extraction changed page order or content"
+            print(f"{pages:>6} {serial:>10.3f} {parallel:>11.3f} {serial / parallel:>7.2f}x")
+
+    shutdown_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Peak memory of digesting very large PDFs, in-memory reads versus the constant-memory mode
+
+Synthetic filings with a scanned exhibit on every page are generated at
+each size and digested in a fresh process, the way a standard analysis of
+a long document is: once reading the document whole, as before large
+document mode, and once through the memory-mapped, spilling reader. The
+simulated LLM answers instantly, so the time is extraction and chunking.
+
+Usage:
+    python benchmarks/bench_large_pdf.py --sizes 50 150 300 --budget 64
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+
+from synthetic_pdf import write_pdf
+
+EXHIBIT_BYTES = 1024 * 1024
+
+
+def child(path, mode):
+    import resource
+
+    from cache import document_digest
+    from extraction import iter_clean_pages, extraction_cache
+    import summarize
+
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    digest = document_digest(path)
+    if mode == "whole":
+        # What the document reader did before: the joined text, kept in the extraction cache
+        extraction_cache.put(digest, "\n".join(iter_clean_pages(path)))
+    digests = summarize.chunk_digests(path, digest, lambda prompt: "digest")
+    print(json.dumps({
+        "seconds": time.perf_counter() - start,
+        "chunks": len(digests),
+        "baseline_mb": baseline / 1024,
+        "peak_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }))
+
+
+def run(path, mode, budget_mb):
+    env = {
+        **os.environ,
+        "LARGE_DOCUMENT_THRESHOLD": "1" if mode == "constant" else "0",
+        "LARGE_DOCUMENT_MEMORY_BUDGET": str(budget_mb * 1024 * 1024),
+        "PAGE_CACHE_MAX_BYTES": "0",
+        "EXTRACTION_CACHE_DIR": "",
+        "SUMMARY_CACHE_DIR": "",
+    }
+    result = subprocess.run([sys.executable, __file__, "--child", path, mode], env=env, cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 150, 300], help="file sizes in MB")
+    parser.add_argument("--budget", type=int, default=64, help="LARGE_DOCUMENT_MEMORY_BUDGET in MB")
+    parser.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(*args.child)
+        return
+
+    print(f"budget {args.budget}MB, one {EXHIBIT_BYTES // 1024}KB exhibit image per page")
+    print(f"{'file MB':>8} {'pages':>6} {'mode':>9} {'chunks':>7} {'seconds':>8} {'base MB':>8} {'peak MB':>8} "
+          f"{'growth MB':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            pages = size * 1024 * 1024 // EXHIBIT_BYTES
+            path = write_pdf(os.path.join(tmp, f"filing_{size}.pdf"), pages, tables=2, exhibit_bytes=EXHIBIT_BYTES)
+            file_mb = os.path.getsize(path) / (1024 * 1024)
+            for mode in ("whole", "constant"):
+                result = run(path, mode, args.budget)
+                print(f"{file_mb:>8.0f} {pages:>6} {mode:>9} {result['chunks']:>7} {result['seconds']:>8.2f} "
+                      f"{result['baseline_mb']:>8.0f} {result['peak_mb']:>8.0f} "
+                      f"{result['peak_mb'] - result['baseline_mb']:>10.0f}")
+            os.remove(path)
+            if os.path.exists(f"{path}.pages"):
+                os.remove(f"{path}.pages")
+
+
+if __name__ == "__main__":
+    main()
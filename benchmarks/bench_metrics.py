@@ -0,0 +1,68 @@
+"""Parse and metric computation time for statements with many line items and periods
+
+Usage:
+    python benchmarks/bench_metrics.py --items 100 500 --periods 5 20
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from financial_metrics import LINE_ITEM_LABELS, parse_statements, compute_metrics
+
+
+def _alpha(n):
+    """Letters-only id, since digits in a label would end it early"""
+    letters = ""
+    while True:
+        n, rem = divmod(n, 26)
+        letters = chr(97 + rem) + letters
+        if n == 0:
+            return letters
+        n -= 1
+
+
+def statement_text(items, periods, seed=0):
+    """Statement text with every canonical item plus filler rows up to ``items`` rows"""
+    rng = random.Random(seed)
+    years = [str(2024 - i) for i in range(periods)]
+    lines = ["Consolidated Financial Statements (in millions)", "Item    " + "    ".join(years)]
+    labels = [labels[0] for labels in LINE_ITEM_LABELS.values()]
+    labels += [f"Segment item {_alpha(i)}" for i in range(max(0, items - len(labels)))]
+    for label in labels[:items]:
+        values = [f"{rng.uniform(-5000, 90000):,.1f}" for _ in range(periods)]
+        values = [f"({value[1:]})" if value.startswith("-") else value for value in values]
+        lines.append(f"{label}    " + "    ".join(values))
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, nargs="+", default=[100, 500])
+    parser.add_argument("--periods", type=int, nargs="+", default=[5, 20])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'items':>6} {'periods':>8} {'parse ms':>9} {'compute ms':>11}")
+    for items in args.items:
+        for periods in args.periods:
+            text = statement_text(items, periods)
+            parse_times, compute_times = [], []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                data = parse_statements(text)
+                parse_times.append(time.perf_counter() - start)
+                start = time.perf_counter()
+                compute_metrics(data)
+                compute_times.append(time.perf_counter() - start)
+            assert len(data.labels) == items and len(data.periods) == periods
+            print(f"{items:>6} {periods:>8} {statistics.median(parse_times) * 1000:>9.2f} "
+                  f"{statistics.median(compute_times) * 1000:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
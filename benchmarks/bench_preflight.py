@@ -0,0 +1,87 @@
+"""Pre-flight classifier: accuracy on the labelled fixtures and documents per second
+
+Every fixture under fixtures/preflight/<label>/ is a text file of pages
+separated by form feeds. Each one is classified and the confusion matrix
+against its directory label is printed. The classifier's weights and
+thresholds were tuned on these same fixtures, so the accuracy shows the
+tuning holds, not how well unseen documents are classified. Then come the
+classifier's throughput on the fixture texts and the cost of sampling
+pages from synthetic PDFs of growing length, which is what an upload pays
+in total.
+
+Usage:
+    python benchmarks/bench_preflight.py --repeat 200 --pages 20 200 2000
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+
+from synthetic_pdf import write_pdf
+
+FIXTURES = os.path.join(ROOT, "fixtures", "preflight")
+
+
+def load_fixtures():
+    """(label, name, pages) for every fixture file"""
+    fixtures = []
+    for label in sorted(os.listdir(FIXTURES)):
+        directory = os.path.join(FIXTURES, label)
+        for name in sorted(os.listdir(directory)):
+            with open(os.path.join(directory, name), encoding="utf-8") as f:
+                fixtures.append((label, name, f.read().split("\f")))
+    return fixtures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200, help="classifications per fixture for throughput")
+    parser.add_argument("--pages", type=int, nargs="+", default=[20, 200, 2000], help="synthetic PDF lengths")
+    args = parser.parse_args()
+
+    from preflight import DOCUMENT_TYPES, classify_text, classify_document
+
+    fixtures = load_fixtures()
+    labels = [label for label in DOCUMENT_TYPES if any(label == fixture[0] for fixture in fixtures)]
+    predicted = [classify_text(pages)["type"] for _, _, pages in fixtures]
+
+    columns = list(DOCUMENT_TYPES)
+    print(f"{'label':>17} " + " ".join(f"{name[:12]:>12}" for name in columns) + f" {'accuracy':>9}")
+    for label in labels:
+        row = [sum(1 for (truth, _, _), guess in zip(fixtures, predicted) if truth == label and guess == name)
+               for name in columns]
+        print(f"{label:>17} " + " ".join(f"{count:>12}" for count in row) + f" {row[columns.index(label)] / sum(row):>9.0%}")
+    correct = sum(1 for (truth, _, _), guess in zip(fixtures, predicted) if truth == guess)
+    print(f"overall accuracy {correct}/{len(fixtures)} = {correct / len(fixtures):.0%} "
+          f"(on the fixtures the thresholds were tuned on, not a held-out set)")
+    for (truth, name, _), guess in zip(fixtures, predicted):
+        if truth != guess:
+            print(f"  misclassified {truth}/{name} as {guess}")
+
+    samples = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        for _, _, pages in fixtures:
+            classify_text(pages)
+        samples.append((time.perf_counter() - start) / len(fixtures))
+    per_document = statistics.median(samples)
+    print(f"\nclassifier {per_document * 1e6:.0f} us per document, {1 / per_document:,.0f} documents/s")
+
+    print(f"\n{'pages':>6} {'file KB':>8} {'sample+classify ms':>19} {'type':>17}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for pages in args.pages:
+            path = write_pdf(os.path.join(tmp, f"report_{pages}.pdf"), pages, tables=2)
+            start = time.perf_counter()
+            result = classify_document(path)
+            elapsed = time.perf_counter() - start
+            print(f"{pages:>6} {os.path.getsize(path) / 1024:>8.0f} {elapsed * 1000:>19.1f} {result['type']:>17}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Prompt tokens returned by the document search tool versus the full-text reader
+
+Usage:
+    python benchmarks/bench_retrieval.py --pages 50 200 --top-k 5
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extraction import iter_clean_pages
+from retrieval import BM25Index, format_results
+from tokens import estimate_tokens
+from synthetic_pdf import write_pdf
+
+QUERIES = [
+    "total revenue and net income",
+    "operating cash flow and capital expenditures",
+    "long-term debt and total liabilities",
+    "liquidity and cash equivalents",
+    "forward-looking statements risks",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[50, 200])
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'pages':>6} {'full tokens':>12} {'top-k tokens':>13} {'saved':>7} {'build s':>8} {'search ms':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for pages in args.pages:
+            path = write_pdf(os.path.join(tmp, f"report_{pages}.pdf"), pages)
+            full_tokens = estimate_tokens("\n".join(iter_clean_pages(path, parallel=False)))
+
+            start = time.perf_counter()
+            index = BM25Index.from_pdf(path)
+            build_time = time.perf_counter() - start
+
+            returned = []
+            start = time.perf_counter()
+            for query in QUERIES:
+                returned.append(estimate_tokens(format_results(index.search(query, args.top_k))))
+            search_ms = (time.perf_counter() - start) * 1000 / len(QUERIES)
+
+            avg_returned = sum(returned) / len(returned)
+            saved = 1 - avg_returned / full_tokens
+            print(f"{pages:>6} {full_tokens:>12} {avg_returned:>13.0f} {saved:>6.1%} "
+                  f"{build_time:>8.2f} {search_ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
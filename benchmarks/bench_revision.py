@@ -0,0 +1,96 @@
+"""Re-analysis of a revised document: pages extracted, map calls and wall time
+
+A synthetic report is processed once, then a revision of it with a few
+pages amended is processed again. The revision is compared with processing
+it from cold caches: with the page and chunk digest caches only the amended
+pages are extracted and only the chunks holding them are sent to the
+simulated LLM.
+
+Usage:
+    python benchmarks/bench_revision.py --pages 200 --changed 1 5 20 --latency 0.2
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from synthetic_pdf import write_pdf, page_lines
+from bench_summarize import FakeLLM
+
+
+def write_report(path, pages, amended=()):
+    """Report whose amended pages get different figures and prose"""
+    def page_text(page_num):
+        seed = page_num + (1_000_000 if page_num in amended else 0)
+        return page_lines(page_num, rng=random.Random(seed), tables=2)
+    return write_pdf(path, pages, page_text=page_text)
+
+
+def process(path, llm):
+    """Fingerprint, extract and digest one upload the way a hierarchical analysis does"""
+    import summarize
+    from cache import document_digest
+    from extraction import page_fingerprints, page_cache
+    from revisions import revision_index
+
+    digest = document_digest(path)
+    misses = page_cache.stats()["misses"]
+    calls = llm.calls
+    start = time.perf_counter()
+    report = revision_index.record(digest, page_fingerprints(path), os.path.basename(path))
+    summarize.chunk_digests(path, digest, llm)
+    seconds = time.perf_counter() - start
+    return report, page_cache.stats()["misses"] - misses, llm.calls - calls, seconds
+
+
+def clear_caches():
+    import summarize
+    from extraction import extraction_cache, page_cache
+    from revisions import revision_index
+
+    extraction_cache.memory.clear()
+    page_cache.clear()
+    summarize.digest_cache.memory.clear()
+    revision_index.clear()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--changed", type=int, nargs="+", default=[1, 5, 20])
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per simulated LLM call")
+    parser.add_argument("--reply-words", type=int, default=300)
+    args = parser.parse_args()
+
+    import config
+    # Extraction cache and digests in memory only, so every run starts from the same state
+    config.EXTRACTION_CACHE_DIR = config.SUMMARY_CACHE_DIR = config.REVISION_INDEX_DIR = ""
+
+    print(f"{args.pages} pages, chunks of {config.SUMMARY_CHUNK_TOKENS} tokens, {args.latency}s per LLM call")
+    print(f"{'changed':>8} {'run':>12} {'reported':>9} {'extracted':>10} {'map calls':>10} {'seconds':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        original = write_report(os.path.join(tmp, "original.pdf"), args.pages)
+        for changed in args.changed:
+            amended = set(random.Random(changed).sample(range(args.pages), changed))
+            revised = write_report(os.path.join(tmp, f"revised_{changed}.pdf"), args.pages, amended)
+            llm = FakeLLM(args.latency, args.reply_words)
+
+            clear_caches()
+            _, extracted, calls, cold_seconds = process(revised, llm)
+            print(f"{changed:>8} {'cold':>12} {'-':>9} {extracted:>10} {calls:>10} {cold_seconds:>8.2f}")
+
+            clear_caches()
+            process(original, llm)
+            report, extracted, calls, seconds = process(revised, llm)
+            reported = len(report["changed"]) + len(report["added"]) if report else "-"
+            print(f"{changed:>8} {'incremental':>12} {reported:>9} {extracted:>10} {calls:>10} {seconds:>8.2f}"
+                  f"  {cold_seconds / seconds:.1f}x faster")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Queue wait of interactive LLM calls while batch work saturates the rate limit
+
+Simulated calls go through the LLM scheduler with a small requests-per-minute
+budget; batch threads keep the queue full while interactive requests arrive
+at intervals. The same load is run with every call in one class for
+comparison.
+
+Usage:
+    python benchmarks/bench_scheduler.py --rpm 600 --batch-threads 16 --interactive 20
+"""
+import os
+import sys
+import time
+import argparse
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_scheduler import LLMScheduler, INTERACTIVE, BATCH
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))] if values else 0.0
+
+
+def run(rpm, batch_threads, interactive_calls, interval, call_seconds, prioritize):
+    scheduler = LLMScheduler(rpm=rpm, tpm=rpm * 10000, interactive_reserve=0.2 if prioritize else 0.0)
+    stop = threading.Event()
+    interactive_class = INTERACTIVE if prioritize else BATCH
+
+    def batch_worker(flow):
+        while not stop.is_set():
+            scheduler.acquire(1000, priority=BATCH, flow=flow)
+            time.sleep(call_seconds)
+
+    workers = [threading.Thread(target=batch_worker, args=(f"batch-{i}",), daemon=True)
+               for i in range(batch_threads)]
+    for worker in workers:
+        worker.start()
+    # Let the batch load drain the budget first
+    time.sleep(2.0)
+
+    waits = []
+    for i in range(interactive_calls):
+        waits.append(scheduler.acquire(1000, priority=interactive_class, flow=f"interactive-{i}"))
+        time.sleep(interval)
+    stop.set()
+    batch_granted = scheduler.stats()["classes"][BATCH]["granted"]
+    return waits, batch_granted
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rpm", type=int, default=600)
+    parser.add_argument("--batch-threads", type=int, default=16)
+    parser.add_argument("--interactive", type=int, default=20)
+    parser.add_argument("--interval", type=float, default=0.2, help="seconds between interactive calls")
+    parser.add_argument("--call-seconds", type=float, default=0.05, help="simulated LLM call duration")
+    args = parser.parse_args()
+
+    print(f"{args.rpm} requests/min, {args.batch_threads} batch threads, {args.interactive} interactive calls")
+    print(f"{'scheduling':>12} {'p50 wait s':>11} {'p95 wait s':>11} {'max wait s':>11} {'batch calls':>12}")
+    for prioritize in (False, True):
+        waits, batch_granted = run(args.rpm, args.batch_threads, args.interactive,
+                                   args.interval, args.call_seconds, prioritize)
+        label = "priority" if prioritize else "fifo"
+        print(f"{label:>12} {percentile(waits, 0.5):>11.3f} {percentile(waits, 0.95):>11.3f} "
+              f"{max(waits):>11.3f} {batch_granted:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Web search calls and wall time for concurrent analyses of the same companies
+
+Simulated analyses run the agents' search tool against the local fake Serper
+service; analyses of the same company issue the same queries, with the case
+and spacing variations agents produce. The plain SerperDevTool is compared
+with the cached, single-flight tool the agents use.
+
+Usage:
+    python benchmarks/bench_search_cache.py --analyses 32 --concurrency 8 --companies 4 --latency 0.3
+"""
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+import fake_services
+
+QUERIES = [
+    "{company} quarterly earnings",
+    "{company} revenue guidance",
+    "{company} credit rating outlook",
+]
+
+
+def queries_for(analysis, companies):
+    company = f"Company {analysis % companies}"
+    # Agents rarely phrase the same search identically
+    variants = [str.lower, str.title, lambda text: f"  {text} "]
+    return [variants[(analysis + i) % len(variants)](query.format(company=company))
+            for i, query in enumerate(QUERIES)]
+
+
+def run(tool, analyses, concurrency, companies):
+    def analysis(i):
+        for query in queries_for(i, companies):
+            tool.run(search_query=query)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(analysis, range(analyses)))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--analyses", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--companies", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.3, help="seconds per search API call")
+    args = parser.parse_args()
+
+    fakes, settings = fake_services.start(search_latency=args.latency)
+    os.environ.setdefault("SERPER_API_KEY", "fake")
+    os.environ["SERPER_BASE_URL"] = f"http://127.0.0.1:{fakes.server_address[1]}"
+    os.environ["SEARCH_BACKEND"] = "serper"
+
+    from crewai_tools.tools import SerperDevTool
+    from tools import CachedSerperDevTool
+    from search_cache import search_cache
+
+    searches = args.analyses * len(QUERIES)
+    rows = []
+    for label, tool in (("plain", SerperDevTool(base_url=os.environ["SERPER_BASE_URL"])),
+                        ("cached", CachedSerperDevTool(base_url=os.environ["SERPER_BASE_URL"]))):
+        before = settings.search_calls
+        seconds = run(tool, args.analyses, args.concurrency, args.companies)
+        rows.append((label, settings.search_calls - before, seconds))
+
+    # Printed at the end so the table is not interleaved with the tools' console output
+    print(f"{args.analyses} analyses x {len(QUERIES)} searches, {args.companies} companies, "
+          f"concurrency {args.concurrency}, {args.latency}s per API call")
+    print(f"{'tool':>8} {'searches':>9} {'API calls':>10} {'saved':>6} {'wall s':>7}")
+    for label, calls, seconds in rows:
+        print(f"{label:>8} {searches:>9} {calls:>10} {searches - calls:>6} {seconds:>7.2f}")
+    stats = search_cache.stats()
+    print(f"cache: {stats['hits']} hits, {stats['joined']} joined in-flight calls, "
+          f"hit rate {stats['hit_rate']:.1%}")
+    fakes.shutdown()
+
+
+if __name__ == "__main__":
+    main()
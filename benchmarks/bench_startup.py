@@ -0,0 +1,106 @@
+"""Cold start of the API: time until it answers liveness and readiness probes
+
+Each run starts a fresh server process and polls ``/health/live`` and
+``/health/ready``. ``lazy`` is the normal startup, with crewai and the agents
+loaded by the background warm-up; ``eager`` loads them before the server
+starts listening, as the API did when the agents were built at import time.
+
+Usage:
+    python benchmarks/bench_startup.py --runs 3 [--output results/startup.json]
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import statistics
+import subprocess
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SERVERS = {
+    "lazy": "import uvicorn, main; uvicorn.run(main.app, host='127.0.0.1', port={port}, log_level='warning')",
+    "eager": ("import uvicorn, main; main.crew_runtime.load(); "
+              "uvicorn.run(main.app, host='127.0.0.1', port={port}, log_level='warning')"),
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def rss_mb(pid):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return None
+
+
+def status_code(url):
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except OSError:
+        return None
+
+
+def start_once(mode, timeout):
+    """Start one server; returns seconds to live and to ready, and RSS at each point"""
+    port = free_port()
+    env = {"OTEL_SDK_DISABLED": "true", "CREWAI_DISABLE_TELEMETRY": "true", "SERPER_API_KEY": "fake",
+           **os.environ, "JOB_EXECUTOR": "thread"}
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-c", SERVERS[mode].format(port=port)], cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    result = {}
+    try:
+        for probe in ("live", "ready"):
+            url = f"http://127.0.0.1:{port}/health/{probe}"
+            while status_code(url) != 200:
+                if process.poll() is not None:
+                    raise RuntimeError(f"{mode} server exited with code {process.returncode}")
+                if time.perf_counter() - start > timeout:
+                    raise RuntimeError(f"{mode} server not {probe} after {timeout}s")
+                time.sleep(0.02)
+            result[f"{probe}_seconds"] = round(time.perf_counter() - start, 3)
+            result[f"{probe}_rss_mb"] = round(rss_mb(process.pid), 1)
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--modes", nargs="+", choices=list(SERVERS), default=["eager", "lazy"])
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    print(f"{'mode':>6} {'live s':>8} {'ready s':>8} {'live MB':>8} {'ready MB':>9}   (median of {args.runs})")
+    report = {"benchmark": "startup", "runs": args.runs, "results": {}}
+    for mode in args.modes:
+        runs = [start_once(mode, args.timeout) for _ in range(args.runs)]
+        median = {key: round(statistics.median(run[key] for run in runs), 3) for key in runs[0]}
+        report["results"][mode] = {"median": median, "runs": runs}
+        print(f"{mode:>6} {median['live_seconds']:>8.2f} {median['ready_seconds']:>8.2f} "
+              f"{median['live_rss_mb']:>8.1f} {median['ready_rss_mb']:>9.1f}")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Time and peak memory of report assembly as documents grow
+
+Compares the original accumulate-and-replace loop with the streaming page
+pipeline in extraction.py, first on whitespace-heavy page text (isolating
+the text handling from PDF parsing) and then end to end on synthetic PDFs.
+
+Usage:
+    python benchmarks/bench_streaming.py --pages 100 200 400 800
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extraction import clean_page, iter_clean_pages, extract_pages
+from synthetic_pdf import page_lines, write_pdf
+
+
+def legacy_report(pages):
+    """The extraction loop as it was before the streaming pipeline"""
+    full_report = ""
+    for content in pages:
+        if content.strip():
+            while "\n\n" in content:
+                content = content.replace("\n\n", "\n")
+            full_report += content + "\n"
+    return full_report.strip()
+
+
+def streaming_report(pages):
+    return "\n".join(clean_page(content) for content in pages if content.strip()).strip()
+
+
+def whitespace_heavy_pages(count, blank_run=64):
+    """Page texts where every line is followed by a long run of blank lines"""
+    gap = "\n" * blank_run
+    return [gap.join(page_lines(page_num)) for page_num in range(count)]
+
+
+def measure(fn, *args):
+    """Wall time of an untraced run and peak allocation of a traced one"""
+    start = time.perf_counter()
+    result = fn(*args)
+    elapsed = time.perf_counter() - start
+
+    # tracemalloc slows allocation-heavy code down, so it gets its own run
+    tracemalloc.start()
+    fn(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[100, 200, 400, 800])
+    parser.add_argument("--blank-run", type=int, default=64)
+    args = parser.parse_args()
+
+    print("Text assembly on whitespace-heavy pages")
+    print(f"{'pages':>6} {'legacy s':>9} {'legacy MB':>10} {'stream s':>9} {'stream MB':>10}")
+    for count in args.pages:
+        pages = whitespace_heavy_pages(count, args.blank_run)
+        legacy_time, legacy_peak, legacy = measure(legacy_report, pages)
+        stream_time, stream_peak, streamed = measure(streaming_report, pages)
+        assert legacy == streamed, "streaming pipeline changed the report text"
+        print(f"{count:>6} {legacy_time:>9.3f} {legacy_peak / 2**20:>10.1f} "
+              f"{stream_time:>9.3f} {stream_peak / 2**20:>10.1f}")
+
+    print()
+    print("End to end on synthetic PDFs (serial extraction)")
+    print(f"{'pages':>6} {'legacy s':>9} {'legacy MB':>10} {'stream s':>9} {'stream MB':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in args.pages:
+            path = write_pdf(os.path.join(tmp, f"report_{count}.pdf"), count)
+            legacy_time, legacy_peak, legacy = measure(
+                lambda: legacy_report(extract_pages(path, parallel=False))
+            )
+            stream_time, stream_peak, streamed = measure(
+                lambda: "\n".join(iter_clean_pages(path, parallel=False)).strip()
+            )
+            assert legacy == streamed, "streaming pipeline changed the report text"
+            print(f"{count:>6} {legacy_time:>9.3f} {legacy_peak / 2**20:>10.1f} "
+                  f"{stream_time:>9.3f} {stream_peak / 2**20:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Map-reduce digest of long documents: wall time, LLM calls and prompt size
+
+A simulated LLM with fixed latency and reply length stands in for the
+model. Each document is digested with serial and with concurrent map calls,
+then digested again for a second query, which only pays for the reduce step
+because the chunk digests are cached by document hash.
+
+Usage:
+    python benchmarks/bench_summarize.py --pages 100 400 --workers 4 --latency 0.5
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import threading
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from synthetic_pdf import build_pdf
+
+
+class FakeLLM:
+    def __init__(self, latency, reply_words):
+        self.latency = latency
+        self.reply = " ".join(["figure"] * reply_words)
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, prompt):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency)
+        return self.reply
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[100, 400])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds per simulated LLM call")
+    parser.add_argument("--reply-words", type=int, default=300)
+    args = parser.parse_args()
+
+    import config
+    import summarize
+    from cache import document_digest
+    from extraction import iter_clean_pages
+    from tokens import estimate_tokens
+
+    print(f"chunks of {config.SUMMARY_CHUNK_TOKENS} tokens, reduce calls of {config.SUMMARY_REDUCE_TOKENS}, "
+          f"{args.latency}s per call")
+    print(f"{'pages':>6} {'doc tok':>8} {'digest tok':>11} {'workers':>8} {'calls':>6} {'first s':>8} "
+          f"{'calls':>6} {'next query s':>13}")
+    for pages in args.pages:
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+            f.write(build_pdf(pages, seed=pages, tables=2))
+            path = f.name
+        try:
+            document_tokens = estimate_tokens("\n".join(iter_clean_pages(path)))
+            for workers in (1, args.workers):
+                config.SUMMARY_MAP_WORKERS = workers
+                summarize.digest_cache.memory.clear()
+                llm = FakeLLM(args.latency, args.reply_words)
+                digest = document_digest(path)
+
+                start = time.perf_counter()
+                summary = summarize.summarize_document("How did revenue develop?", path, digest, llm)
+                first_seconds = time.perf_counter() - start
+                first_calls = llm.calls
+
+                start = time.perf_counter()
+                summarize.summarize_document("How leveraged is the company?", path, digest, llm)
+                next_seconds = time.perf_counter() - start
+
+                print(f"{pages:>6} {document_tokens:>8} {estimate_tokens(summary):>11} {workers:>8} "
+                      f"{first_calls:>6} {first_seconds:>8.2f} {llm.calls - first_calls:>6} {next_seconds:>13.2f}")
+        finally:
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
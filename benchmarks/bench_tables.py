@@ -0,0 +1,78 @@
+"""Statement table store: build time, query latency and tokens returned versus the full text
+
+For each document size the tables are detected and written once, then
+queried from memory, and from the memory-mapped file as a new worker
+would. Arrow allocations during the file read show that mapping does not
+copy the table onto the heap.
+
+Usage:
+    python benchmarks/bench_tables.py --pages 50 200 800 --repeat 20
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from synthetic_pdf import write_pdf
+
+QUERY = {"items": ["revenue", "net income", "total assets"], "periods": ["2024", "2023"]}
+
+
+def _median_ms(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[50, 200, 800])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    import pyarrow as pa
+    import tables
+    from cache import document_digest
+    from extraction import iter_clean_pages
+    from tokens import estimate_tokens
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = tables.TableStore(os.path.join(tmp, "tables"), max_bytes=1 << 30)
+        print(f"{'pages':>6} {'cells':>7} {'file KB':>8} {'build s':>8} {'query ms':>9} {'mapped ms':>10} "
+              f"{'heap KB':>8} {'text tok':>9} {'query tok':>10}")
+        for pages in args.pages:
+            path = write_pdf(os.path.join(tmp, f"report_{pages}.pdf"), pages, tables=3, periods=4)
+            digest = document_digest(path)
+            text_tokens = estimate_tokens("\n".join(iter_clean_pages(path)))
+
+            start = time.perf_counter()
+            table = store.put(digest, tables.extract_tables(path))
+            build_seconds = time.perf_counter() - start
+
+            query_ms = _median_ms(lambda: tables.format_tables(tables.select(table, **QUERY)), args.repeat)
+            answer = tables.format_tables(tables.select(table, **QUERY))
+
+            def mapped_read():
+                store.memory.clear()
+                store.get(digest)
+            mapped_ms = _median_ms(mapped_read, args.repeat)
+            store.memory.clear()
+            allocated = pa.total_allocated_bytes()
+            store.get(digest)
+            heap_kb = (pa.total_allocated_bytes() - allocated) / 1024
+
+            file_kb = sum(entry.stat().st_size for entry in os.scandir(store.directory) if digest in entry.name) / 1024
+            print(f"{pages:>6} {table.num_rows:>7} {file_kb:>8.0f} {build_seconds:>8.2f} {query_ms:>9.2f} "
+                  f"{mapped_ms:>10.2f} {heap_kb:>8.1f} {text_tokens:>9} {estimate_tokens(answer):>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""Local stand-ins for the LLM provider and Serper, with configurable latency
+
+The LLM side speaks the OpenAI chat completions API (plain and streamed) and
+plays a fixed ReAct script: it calls the tools listed in ``TOOL_SCRIPT`` that
+the agent actually has, one per turn, and then returns a final answer. The
+search side answers Serper ``/search`` and ``/news`` requests with canned
+results.
+
+Usage:
+    python benchmarks/fake_services.py --port 8900 --llm-latency 0.5 --search-latency 0.2
+
+Then run the API with
+    LLM_MODEL=openai/fake-model LLM_BASE_URL=http://127.0.0.1:8900/v1 \\
+    SERPER_BASE_URL=http://127.0.0.1:8900 SERPER_API_KEY=fake uvicorn main:app
+"""
+import re
+import json
+import time
+import uuid
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_PATH = re.compile(r"located at:\s*(\S+?\.pdf)")
+
+# (tool name, arguments) tried in order; tools the agent does not have are skipped
+TOOL_SCRIPT = [
+    ("Financial Document Search", lambda path: {"path": path, "query": "total revenue net income", "top_k": 3}),
+    ("Search the internet with Serper", lambda path: {"search_query": "company earnings outlook"}),
+]
+
+FINAL_ANSWER = (
+    "Revenue grew year over year while operating margins were broadly stable. "
+    "Leverage is moderate and liquidity is adequate. "
+)
+
+
+class FakeServiceSettings:
+    def __init__(self, llm_latency=0.5, search_latency=0.2, completion_words=200, token_delay=0.0):
+        self.llm_latency = llm_latency
+        self.search_latency = search_latency
+        self.completion_words = completion_words
+        self.token_delay = token_delay
+        self.llm_calls = 0
+        self.search_calls = 0
+        self.lock = threading.Lock()
+
+
+def _reply_for(messages, settings):
+    """Next ReAct step for the conversation so far"""
+    text = "\n".join(str(message.get("content") or "") for message in messages)
+    turns = sum(
+        str(message.get("content") or "").count("Observation:")
+        for message in messages if message.get("role") == "assistant"
+    )
+    match = _PATH.search(text)
+    path = match.group(1) if match else "data/sample.pdf"
+
+    available = [(name, args) for name, args in TOOL_SCRIPT if f"Tool Name: {name}" in text]
+    if turns < len(available):
+        name, args = available[turns]
+        return (f"Thought: I need more information from {name}.\n"
+                f"Action: {name}\nAction Input: {json.dumps(args(path))}")
+
+    words = (FINAL_ANSWER.split() * (settings.completion_words // 10 + 1))[:settings.completion_words]
+    return ("Thought: I now know the final answer\n"
+            f"Final Answer: {' '.join(words)}\nVERDICT: FINANCIAL")
+
+
+def make_handler(settings):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _json(self, status, body):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            if self.path.rstrip("/").endswith("/chat/completions"):
+                self._chat(payload)
+            elif self.path.rstrip("/") in ("/search", "/news"):
+                self._search(payload)
+            else:
+                self._json(404, {"error": f"unknown path {self.path}"})
+
+        def _chat(self, payload):
+            with settings.lock:
+                settings.llm_calls += 1
+            time.sleep(settings.llm_latency)
+            content = _reply_for(payload.get("messages", []), settings)
+            prompt_tokens = len(json.dumps(payload.get("messages", []))) // 4
+            completion_tokens = len(content) // 4
+            completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+            model = payload.get("model", "fake-model")
+
+            if not payload.get("stream"):
+                self._json(200, {
+                    "id": completion_id,
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                                 "finish_reason": "stop"}],
+                    "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                              "total_tokens": prompt_tokens + completion_tokens},
+                })
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            pieces = re.findall(r"\S+\s*", content)
+            for i, piece in enumerate(pieces):
+                chunk = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": piece} if i else {"role": "assistant", "content": piece},
+                                 "finish_reason": None}],
+                }
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                if settings.token_delay:
+                    time.sleep(settings.token_delay)
+            done = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                          "total_tokens": prompt_tokens + completion_tokens},
+            }
+            self.wfile.write(f"data: {json.dumps(done)}\n\ndata: [DONE]\n\n".encode())
+            self.wfile.flush()
+            self.close_connection = True
+
+        def _search(self, payload):
+            with settings.lock:
+                settings.search_calls += 1
+            time.sleep(settings.search_latency)
+            query = payload.get("q", "")
+            self._json(200, {
+                "searchParameters": {"q": query, "type": self.path.strip("/")},
+                "organic": [
+                    {"title": f"{query} result {i}", "link": f"https://example.com/{i}",
+                     "snippet": "Analysts expect steady revenue growth and stable margins.", "position": i}
+                    for i in range(1, 6)
+                ],
+                "news": [
+                    {"title": f"{query} headline {i}", "link": f"https://example.com/news/{i}",
+                     "snippet": "Shares moved after the quarterly report.", "date": "1 day ago"}
+                    for i in range(1, 4)
+                ],
+                "credits": 1,
+            })
+
+    return Handler
+
+
+def start(port=0, **settings_kwargs):
+    """Serve the fakes on a background thread; returns ``(server, settings)``"""
+    settings = FakeServiceSettings(**settings_kwargs)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(settings))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="fake-services", daemon=True).start()
+    return server, settings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="seconds before each completion")
+    parser.add_argument("--search-latency", type=float, default=0.2, help="seconds per search request")
+    parser.add_argument("--completion-words", type=int, default=200, help="length of final answers")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="seconds between streamed chunks")
+    args = parser.parse_args()
+
+    server, _ = start(args.port, llm_latency=args.llm_latency, search_latency=args.search_latency,
+                      completion_words=args.completion_words, token_delay=args.token_delay)
+    print(f"Fake LLM at http://127.0.0.1:{args.port}/v1, fake Serper at http://127.0.0.1:{args.port}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+## Synthetic financial PDFs for benchmarks
+import io
+import random
+
+LINE_ITEMS = [
+    "Total revenue", "Cost of revenue", "Gross profit", "Operating expenses",
+    "Operating income", "Net income", "Total assets", "Total liabilities",
+    "Shareholders equity", "Cash and cash equivalents", "Operating cash flow",
+    "Capital expenditures", "Long-term debt", "Current assets", "Current liabilities",
+]
+
+PROSE = (
+    "The Company continued to invest in research and development while managing "
+    "operating costs across all segments. Management believes that existing cash "
+    "balances and cash generated from operations will be sufficient to meet liquidity "
+    "needs for at least the next twelve months. Forward-looking statements involve "
+    "risks and uncertainties that could cause actual results to differ materially."
+)
+
+
+def _escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+STATEMENT_TITLES = [
+    "Consolidated Statements of Operations (in millions)",
+    "Consolidated Balance Sheets (in millions)",
+    "Consolidated Statements of Cash Flows (in millions)",
+]
+
+
+def page_lines(page_num, lines_per_page=45, rng=None, company="Example Corp", tables=1, periods=3):
+    """Text lines for one synthetic report page: header, statement tables, prose and a footer
+
+    Args:
+        tables (int, optional): Statement tables on the page, sharing a third of its lines.
+        periods (int, optional): Numeric columns (fiscal years) per table row.
+    """
+    rng = rng or random.Random(page_num)
+    lines = [f"{company} Annual Report 2024", ""]
+    years = "    ".join(str(2024 - i) for i in range(periods))
+    table_rows = max(1, lines_per_page // 3 // max(1, tables))
+    for table in range(tables):
+        lines.append(STATEMENT_TITLES[table % len(STATEMENT_TITLES)])
+        lines.append(f"Line item    {years}")
+        for i in range(table_rows):
+            item = LINE_ITEMS[(page_num + table * table_rows + i) % len(LINE_ITEMS)]
+            values = [f"{rng.uniform(100, 99999):,.1f}" for _ in range(periods)]
+            lines.append(f"{item}    " + "    ".join(values))
+        lines.append("")
+    words = PROSE.split()
+    while len(lines) < lines_per_page - 2:
+        start = rng.randrange(len(words))
+        lines.append(" ".join((words * 2)[start:start + 12]))
+    lines.append("")
+    lines.append(f"Page {page_num + 1}")
+    return lines
+
+
+def _write_pdf(out, pages, lines_per_page=45, seed=0, company="Example Corp", page_text=None, tables=1,
+               periods=3, exhibit_bytes=0):
+    """Write the PDF to the binary file object ``out`` one object at a time"""
+    rng = random.Random(seed)
+    offsets = {}
+    next_id = [0]
+
+    def reserve():
+        next_id[0] += 1
+        return next_id[0]
+
+    def write(number, body):
+        offsets[number] = out.tell()
+        out.write(b"%d 0 obj\n" % number)
+        out.write(body)
+        out.write(b"\nendobj\n")
+        return number
+
+    def add(body):
+        return write(reserve(), body)
+
+    out.write(b"%PDF-1.4\n")
+    catalog_id = reserve()
+    pages_id = reserve()
+    font_id = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    page_ids = []
+    for page_num in range(pages):
+        if page_text is not None:
+            lines = page_text(page_num)
+        else:
+            lines = page_lines(page_num, lines_per_page, rng, company, tables, periods)
+        stream = ["BT", "/F1 9 Tf", "11 TL", "40 760 Td"]
+        for line in lines:
+            stream.append(f"({_escape(line)}) Tj T*")
+        stream.append("ET")
+        resources = b"/Font << /F1 %d 0 R >>" % font_id
+        if exhibit_bytes:
+            # A scanned exhibit: an uncompressed greyscale image drawn on the page
+            side = max(1, int(exhibit_bytes ** 0.5))
+            image_id = add(
+                b"<< /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /DeviceGray "
+                b"/BitsPerComponent 8 /Length %d >>\nstream\n" % (side, side, side * side)
+                + rng.randbytes(side * side) + b"\nendstream"
+            )
+            resources += b" /XObject << /Im1 %d 0 R >>" % image_id
+            stream.append("q 200 0 0 200 380 40 cm /Im1 Do Q")
+        data = "\n".join(stream).encode("latin-1", "replace")
+        content_id = add(b"<< /Length %d >>\nstream\n" % len(data) + data + b"\nendstream")
+        page_ids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << %s >> /Contents %d 0 R >>"
+            % (pages_id, resources, content_id)
+        ))
+
+    write(catalog_id, b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+    kids = b" ".join(b"%d 0 R" % page_id for page_id in page_ids)
+    write(pages_id, b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids)))
+
+    xref_offset = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(offsets) + 1))
+    for number in range(1, len(offsets) + 1):
+        out.write(b"%010d 00000 n \n" % offsets[number])
+    out.write(b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(offsets) + 1, catalog_id, xref_offset
+    ))
+
+
+def build_pdf(pages, lines_per_page=45, seed=0, company="Example Corp", page_text=None, tables=1, periods=3,
+              exhibit_bytes=0):
+    """Return the bytes of a text PDF with ``pages`` pages
+
+    Args:
+        pages (int): Number of pages to generate.
+        lines_per_page (int, optional): Text lines on each page.
+        seed (int, optional): Seed for the generated figures.
+        company (str, optional): Company name used in the running header.
+        page_text (callable, optional): ``page_text(page_num)`` returning the lines of
+            a page, overriding the default report layout.
+        tables (int, optional): Statement tables per page.
+        periods (int, optional): Numeric columns per table row.
+        exhibit_bytes (int, optional): Size of an image drawn on every page, to
+            make scanned-exhibit sized files.
+    """
+    out = io.BytesIO()
+    _write_pdf(out, pages, lines_per_page, seed, company, page_text, tables, periods, exhibit_bytes)
+    return out.getvalue()
+
+
+def write_pdf(path, pages, **kwargs):
+    """Write a synthetic PDF to ``path`` and return the path"""
+    with open(path, "wb") as f:
+        # Written object by object, so files of hundreds of megabytes never sit in memory
+        _write_pdf(f, pages, **kwargs)
+    return path
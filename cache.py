@@ -0,0 +1,366 @@
+## Content-addressed caches shared by the document tools
+import os
+import sys
+import json
+import hashlib
+import logging
+import time
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_SIZE = 1024 * 1024
+MAX_KNOWN_DIGESTS = 4096
+
+# Digests computed while files were written, keyed by path and validated
+# against the file's size and mtime so a rewritten file is hashed again
+_known_digests = OrderedDict()
+_known_digests_lock = threading.Lock()
+
+
+def file_sha256(path, chunk_size=HASH_CHUNK_SIZE):
+    """SHA-256 hex digest of a file, read in chunks so large files are not loaded whole"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _stat_key(path):
+    stat = os.stat(path)
+    return (stat.st_size, stat.st_mtime_ns)
+
+
+def remember_digest(path, digest):
+    """Record the digest of a file that was hashed while it was being written"""
+    with _known_digests_lock:
+        _known_digests[path] = (_stat_key(path), digest)
+        _known_digests.move_to_end(path)
+        while len(_known_digests) > MAX_KNOWN_DIGESTS:
+            _known_digests.popitem(last=False)
+
+
+def forget_digest(path):
+    with _known_digests_lock:
+        _known_digests.pop(path, None)
+
+
+def document_digest(path):
+    """SHA-256 of a file, reusing the digest recorded at upload time when still valid"""
+    with _known_digests_lock:
+        known = _known_digests.get(path)
+    if known is not None and known[0] == _stat_key(path):
+        return known[1]
+    return file_sha256(path)
+
+
+class LRUCache:
+    """Thread-safe in-memory LRU cache bounded by the total size of its values
+
+    Args:
+        max_bytes (int): Upper bound for the summed size of all cached values.
+        sizeof (callable, optional): Returns the size of a value in bytes.
+        ttl (float, optional): Seconds an entry stays valid. Defaults to no expiry.
+    """
+
+    def __init__(self, max_bytes, sizeof=sys.getsizeof, ttl=None):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.ttl = ttl
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] is not None and entry[2] < time.monotonic():
+                self.current_bytes -= self._entries.pop(key)[1]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        size = self.sizeof(value)
+        if size > self.max_bytes:
+            # Caching this value would flush everything else for one entry
+            return False
+
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size, expires_at)
+            self.current_bytes += size
+
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+        return True
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+class DiskBudget:
+    """Bound on the total size of the files a disk cache keeps in ``directory``
+
+    Sizes of new files are added up as they are written. Once the total is
+    over ``max_bytes`` the directory is scanned again and the least recently
+    used files, by modification time, are deleted until it fits; readers
+    refresh that time with ``touch``. Files left by other cache versions
+    count too, so they are the first to go.
+
+    Args:
+        directory (str): Directory holding the cache files.
+        suffix (str): Extension of the cache files; other files are left alone.
+        max_bytes (int, optional): Size budget. Defaults to no limit.
+    """
+
+    def __init__(self, directory, suffix, max_bytes=None):
+        self.directory = directory
+        self.suffix = suffix
+        self.max_bytes = max_bytes or None
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self.current_bytes = sum(size for _, size, _ in self._files())
+
+    def _files(self):
+        files = []
+        if not os.path.isdir(self.directory):
+            return files
+        for name in os.listdir(self.directory):
+            if not name.endswith(self.suffix):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                # Removed by another process in the meantime
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        return files
+
+    def fits(self, size):
+        """Whether a file of ``size`` bytes may be stored at all"""
+        return self.max_bytes is None or size <= self.max_bytes
+
+    def touch(self, path):
+        """Mark ``path`` as recently used"""
+        if self.max_bytes is not None:
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+
+    def add(self, size):
+        """Account for a file of ``size`` bytes just written, evicting old files when over budget"""
+        with self._lock:
+            self.current_bytes += size
+            if self.max_bytes is None or self.current_bytes <= self.max_bytes:
+                return
+            files = sorted(self._files())
+            total = sum(file_size for _, file_size, _ in files)
+            evicted = 0
+            for _, file_size, path in files:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    logger.warning(f"Failed to evict cache file {path}: {str(e)}")
+                    continue
+                total -= file_size
+                evicted += 1
+            self.current_bytes = total
+            self.evictions += evicted
+        logger.info(f"Evicted {evicted} files from {self.directory}, {total} bytes left")
+
+    def stats(self):
+        with self._lock:
+            return {"bytes": self.current_bytes, "max_bytes": self.max_bytes, "evictions": self.evictions}
+
+
+class DiskTextCache:
+    """Text values stored as one file per key so they survive restarts
+
+    Args:
+        directory (str): Where to write the files.
+        max_bytes (int, optional): Size of all files after which the least
+            recently used are deleted. Defaults to no limit.
+    """
+
+    def __init__(self, directory, max_bytes=None):
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        os.makedirs(directory, exist_ok=True)
+        self.budget = DiskBudget(directory, ".txt", max_bytes)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.txt")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = f.read()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except OSError as e:
+            logger.warning(f"Failed to read cache entry {path}: {str(e)}")
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.budget.touch(path)
+        return value
+
+    def put(self, key, value):
+        data = value.encode("utf-8")
+        if not self.budget.fits(len(data)):
+            # Storing this value would flush every other entry
+            return
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            # Write to a temp file first so readers never see a partial entry
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            self.writes += 1
+        except OSError as e:
+            logger.warning(f"Failed to write cache entry {path}: {str(e)}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        self.budget.add(len(data))
+
+    def stats(self):
+        return {"directory": self.directory, "hits": self.hits, "misses": self.misses, "writes": self.writes,
+                **self.budget.stats()}
+
+
+class ExtractionCache:
+    """Extracted document text keyed by file content hash and extractor version
+
+    Lookups go to the in-memory LRU first and then to the optional disk tier,
+    bounded by ``disk_max_bytes``; disk hits are promoted back into memory.
+    """
+
+    def __init__(self, max_bytes, directory=None, version="1", disk_max_bytes=None):
+        self.version = version
+        self.memory = LRUCache(max_bytes)
+        self.disk = DiskTextCache(directory, disk_max_bytes) if directory else None
+
+    def key(self, digest):
+        return f"{self.version}-{digest}"
+
+    def get(self, digest):
+        key = self.key(digest)
+        value = self.memory.get(key)
+        if value is not None:
+            return value
+        if self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.put(key, value)
+        return value
+
+    def put(self, digest, text):
+        key = self.key(digest)
+        self.memory.put(key, text)
+        if self.disk is not None:
+            self.disk.put(key, text)
+
+    def stats(self):
+        stats = {"version": self.version, "memory": self.memory.stats()}
+        if self.disk is not None:
+            stats["disk"] = self.disk.stats()
+        return stats
+
+
+def normalize_query(query):
+    """Case- and whitespace-insensitive form of a query, without trailing punctuation"""
+    return " ".join(query.lower().split()).rstrip(" ?.!")
+
+
+def definition_fingerprint(paths):
+    """SHA-256 over the source of the files that define the agents and tasks
+
+    Any edit to a prompt, role or tool list changes the fingerprint, so cached
+    responses produced by older definitions are never served.
+    """
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(os.path.basename(path).encode())
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    """Final analysis text keyed by document, query, crew definition and model
+
+    Args:
+        max_bytes (int): Memory budget for cached responses.
+        ttl (float): Seconds a response may be served from the cache.
+        fingerprint (str): Fingerprint of the agent and task definitions.
+        model (str): Name of the LLM that produced the responses.
+    """
+
+    def __init__(self, max_bytes, ttl, fingerprint, model):
+        self.fingerprint = fingerprint
+        self.model = model
+        # Full analyses are dicts, so size them by their JSON form
+        self.memory = LRUCache(max_bytes, sizeof=lambda value: len(json.dumps(value, default=str)), ttl=ttl)
+
+    def key(self, digest, query, mode="standard"):
+        parts = [self.model, self.fingerprint, mode, digest, normalize_query(query)]
+        return hashlib.sha256("\x00".join(parts).encode()).hexdigest()
+
+    def get(self, digest, query, mode="standard"):
+        return self.memory.get(self.key(digest, query, mode))
+
+    def put(self, digest, query, response, mode="standard"):
+        self.memory.put(self.key(digest, query, mode), response)
+
+    def stats(self):
+        return {"model": self.model, "fingerprint": self.fingerprint[:12], **self.memory.stats()}
@@ -0,0 +1,172 @@
+## Compaction of extracted document text: boilerplate, number formatting and repeated paragraphs
+import re
+import math
+import logging
+
+import config
+from financial_metrics import parse_row, canonical_item, LINE_ITEM_LABELS
+from metrics import COMPACTION_CHARS
+from tokens import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the compacted output changes so cached texts are rebuilt
+COMPACTION_VERSION = "3"
+
+# Runs of spaces, and tabs or non-breaking spaces; a lone space is left alone
+_SPACES = re.compile(r"[ \t\u00a0\u2009\u202f]{2,}|[\t\u00a0\u2009\u202f]")
+# Patterns start with a literal character so the scan over a page stays fast
+_DOT_LEADERS = re.compile(r"\.(?:[ \t]?\.){3,}|_(?:[ \t]?_){3,}")
+_CURRENCY_GAP = re.compile(r"([$€£¥])[ \t]+(?=\(?\d)")
+# "1,234.00" carries nothing "1,234" does not; other decimals are kept as printed
+_ZERO_DECIMALS = re.compile(r"(?<=\d)\.0+(?![\d.])")
+_DIGITS = re.compile(r"\d+")
+_PAGE_NUMBER = re.compile(r"^[-–—\s]*(?:page\s*)?\d{1,4}(?:\s*(?:of|/)\s*\d{1,4})?[-–—\s]*$", re.IGNORECASE)
+# Unit captions give the figures below them their scale, so every copy stays
+_UNITS = re.compile(r"\b(?:in|amounts in) (?:thousands|millions|billions)\b", re.IGNORECASE)
+_YEAR_CELL = re.compile(r"^(?:FY\s?)?(?:19|20)\d{2}$")
+
+
+def normalize_text(text):
+    """``text`` with spacing, dot leaders and number formatting normalized
+
+    Only the formatting of figures changes: ``$ 1,234.00`` becomes ``$1,234``
+    and a Unicode minus becomes ``-``, so statement rows parse to the same
+    values before and after.
+    """
+    text = text.replace("\u2212", "-")
+    text = _DOT_LEADERS.sub(" ", text)
+    text = _CURRENCY_GAP.sub(r"\1", text)
+    text = _ZERO_DECIMALS.sub("", text)
+    return _SPACES.sub(" ", text)
+
+
+def _repeated(pages, key):
+    """Keys of lines found on enough pages to be running headers or footers"""
+    counts = {}
+    for lines in pages:
+        for k in {key(line) for line in lines}:
+            counts[k] = counts.get(k, 0) + 1
+    threshold = max(config.COMPACTION_MIN_REPEATS, math.ceil(len(pages) * config.COMPACTION_REPEAT_SHARE / 100))
+    return {k for k, count in counts.items() if count >= threshold}
+
+
+def _table_cell(line):
+    """A period or a line item label on a line of its own, as in tables extracted one cell per line"""
+    return bool(_YEAR_CELL.match(line)) or canonical_item(line) in LINE_ITEM_LABELS
+
+
+def _page_number_lines(pages):
+    """``(page, line)`` positions of page numbers
+
+    Only a bare number on a page's first or last line counts, and only when
+    a neighbouring page carries the number before or after it; PyPDF2 often
+    puts every table cell on a line of its own, and those numbers stay.
+    """
+    candidates = []
+    for lines in pages:
+        found = {}
+        for line_num in {0, len(lines) - 1} if lines else ():
+            if _PAGE_NUMBER.match(lines[line_num]):
+                found[line_num] = int(_DIGITS.search(lines[line_num]).group())
+        candidates.append(found)
+
+    positions = set()
+    for page_num, found in enumerate(candidates):
+        previous = set(candidates[page_num - 1].values()) if page_num else set()
+        following = set(candidates[page_num + 1].values()) if page_num + 1 < len(candidates) else set()
+        for line_num, number in found.items():
+            if number - 1 in previous or number + 1 in following:
+                positions.add((page_num, line_num))
+    return positions
+
+
+def compact_pages(pages):
+    """Compact the cleaned pages of one document for the LLM
+
+    Lines repeated on at least ``COMPACTION_REPEAT_SHARE`` percent of pages
+    (and ``COMPACTION_MIN_REPEATS`` pages) are running headers, footers or
+    disclaimers and are kept only where they first appear; lines that differ
+    only in their digits count as repeats unless they are statement rows, so
+    "Annual Report 2024 | 37" goes but "Total revenue 1,200 1,100" stays.
+    Page numbers continuing the numbering of the neighbouring pages are
+    dropped from the first or last line of a page, and a paragraph of at least
+    ``COMPACTION_MIN_PARAGRAPH_CHARS`` characters seen earlier in the document
+    is dropped as a duplicate. Unit captions, period headers and, for tables
+    extracted one cell per line, lone years and line item labels are never
+    removed.
+
+    Returns:
+        tuple: The compacted pages (empty ones left out) and a report of
+        characters and estimated tokens before and after and of what was removed.
+    """
+    # Whole pages are normalized at once, which is far cheaper than line by line
+    pages = [[line.strip() for line in normalize_text(page).splitlines()] for page in pages]
+    pages = [[line for line in lines if line] for lines in pages]
+    exact = _repeated(pages, lambda line: line.lower())
+    masked = _repeated(pages, lambda line: _DIGITS.sub("#", line.lower()))
+    page_numbers = _page_number_lines(pages)
+    report = {"page_numbers": 0, "repeated_lines": 0, "duplicate_paragraphs": 0}
+
+    seen_lines, seen_paragraphs, compacted = set(), set(), []
+    for page_num, lines in enumerate(pages):
+        kept, paragraph = [], []
+
+        def flush():
+            text = " ".join(paragraph)
+            if len(text) >= config.COMPACTION_MIN_PARAGRAPH_CHARS and text.lower() in seen_paragraphs:
+                report["duplicate_paragraphs"] += 1
+            else:
+                seen_paragraphs.add(text.lower())
+                kept.extend(paragraph)
+            paragraph.clear()
+
+        for line_num, line in enumerate(lines):
+            if (page_num, line_num) in page_numbers:
+                report["page_numbers"] += 1
+                continue
+            parsed = parse_row(line)
+            # Bare numbers count as rows: PyPDF2 often puts each table cell on its own line
+            row = parsed is not None
+            key = line.lower()
+            if key not in exact:
+                # Figures that change from page to page are content, not a running header
+                key = None if row else _DIGITS.sub("#", key)
+            period_header = row and parsed[0] is None
+            if (key in exact or key in masked) and not (period_header or _UNITS.search(line) or _table_cell(line)):
+                if key in seen_lines:
+                    report["repeated_lines"] += 1
+                    continue
+                seen_lines.add(key)
+            if row:
+                flush()
+                kept.append(line)
+            else:
+                paragraph.append(line)
+        flush()
+        if kept:
+            compacted.append("\n".join(kept))
+    return compacted, report
+
+
+def compact_text(pages):
+    """Compacted text of a document's cleaned pages, with its report
+
+    Sizes before and after are logged and counted on /metrics.
+    """
+    pages = list(pages)
+    compacted, report = compact_pages(pages)
+    before, after = "\n".join(pages), "\n".join(compacted)
+    report.update({
+        "chars_before": len(before),
+        "chars_after": len(after),
+        "tokens_before": estimate_tokens(before),
+        "tokens_after": estimate_tokens(after),
+    })
+    COMPACTION_CHARS.inc(report["chars_before"], text="raw")
+    COMPACTION_CHARS.inc(report["chars_after"], text="compacted")
+    logger.info(f"Compacted document text from {report['chars_before']} to {report['chars_after']} characters "
+                f"(~{report['tokens_before']} to ~{report['tokens_after']} tokens): "
+                f"{report['repeated_lines']} repeated lines, {report['page_numbers']} page numbers and "
+                f"{report['duplicate_paragraphs']} duplicate paragraphs removed")
+    return after, report
@@ -0,0 +1,132 @@
+## Runtime configuration loaded from environment variables
+import os
+from dotenv import load_dotenv
+load_dotenv()
+
+
+def _env_int(name, default):
+    """Read an integer setting, falling back to the default on bad input"""
+    value = os.getenv(name)
+    if value is None or value.strip() == "":
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        return default
+
+
+## Upload handling
+DATA_DIR = os.getenv("DATA_DIR", "data")
+MAX_FILE_SIZE = _env_int("MAX_FILE_SIZE", 10 * 1024 * 1024)  # 10MB in bytes
+
+## Analysis job queue
+JOB_EXECUTOR = os.getenv("JOB_EXECUTOR", "thread").lower()  # "thread" or "process"
+JOB_WORKERS = _env_int("JOB_WORKERS", 2)            # analyses running at once
+JOB_QUEUE_SIZE = _env_int("JOB_QUEUE_SIZE", 16)     # analyses waiting for a worker
+JOB_RESULT_TTL = _env_int("JOB_RESULT_TTL", 3600)   # seconds a finished job stays queryable
+JOB_RETRY_AFTER = _env_int("JOB_RETRY_AFTER", 30)   # Retry-After hint sent with 429
+
+## Request deadlines; analyses stop at their next page, LLM call or search once past them
+DEADLINE_SECONDS = _env_int("DEADLINE_SECONDS", 900)                   # whole request, from upload; 0 for none
+DEADLINE_EXTRACTION_SECONDS = _env_int("DEADLINE_EXTRACTION_SECONDS", 120)  # reading one document's text
+DEADLINE_LLM_CALL_SECONDS = _env_int("DEADLINE_LLM_CALL_SECONDS", 180)      # one LLM call, passed on as its timeout
+DEADLINE_SEARCH_SECONDS = _env_int("DEADLINE_SEARCH_SECONDS", 20)           # waiting for one web search
+
+## Batch analysis
+BATCH_MAX_DOCUMENTS = _env_int("BATCH_MAX_DOCUMENTS", 200)               # documents per batch
+BATCH_MAX_ZIP_SIZE = _env_int("BATCH_MAX_ZIP_SIZE", 512 * 1024 * 1024)   # bytes per uploaded archive
+# Job slots all batches together may hold, so single uploads keep room in the queue
+BATCH_MAX_IN_FLIGHT = _env_int("BATCH_MAX_IN_FLIGHT", JOB_WORKERS)
+
+## Extracted PDF text cache
+EXTRACTION_CACHE_MAX_BYTES = _env_int("EXTRACTION_CACHE_MAX_BYTES", 256 * 1024 * 1024)
+EXTRACTION_CACHE_DIR = os.getenv("EXTRACTION_CACHE_DIR", "")  # empty disables the disk tier
+EXTRACTION_CACHE_DISK_MAX_BYTES = _env_int("EXTRACTION_CACHE_DISK_MAX_BYTES", 1024 * 1024 * 1024)  # 0: no limit
+# Page texts by page fingerprint, so revised documents only re-extract changed pages; 0 disables
+PAGE_CACHE_MAX_BYTES = _env_int("PAGE_CACHE_MAX_BYTES", 128 * 1024 * 1024)
+
+## Compaction of the document text handed to the agents
+COMPACTION_ENABLED = os.getenv("COMPACTION_ENABLED", "true").lower() in ("1", "true", "yes")
+COMPACTION_REPEAT_SHARE = _env_int("COMPACTION_REPEAT_SHARE", 40)  # percent of pages a running header appears on
+COMPACTION_MIN_REPEATS = _env_int("COMPACTION_MIN_REPEATS", 3)     # and at least this many pages
+COMPACTION_MIN_PARAGRAPH_CHARS = _env_int("COMPACTION_MIN_PARAGRAPH_CHARS", 200)  # shorter repeats are kept
+
+## Large documents: accepted above MAX_FILE_SIZE and read in constant memory
+LARGE_DOCUMENT_MAX_SIZE = _env_int("LARGE_DOCUMENT_MAX_SIZE", 512 * 1024 * 1024)  # 0 rejects them
+LARGE_DOCUMENT_THRESHOLD = _env_int("LARGE_DOCUMENT_THRESHOLD", MAX_FILE_SIZE)  # bytes
+# Resident memory one large document may add while it is read
+LARGE_DOCUMENT_MEMORY_BUDGET = _env_int("LARGE_DOCUMENT_MEMORY_BUDGET", 128 * 1024 * 1024)
+
+## PDF extraction
+PDF_EXTRACT_WORKERS = _env_int("PDF_EXTRACT_WORKERS", os.cpu_count() or 1)
+PDF_PARALLEL_MIN_PAGES = _env_int("PDF_PARALLEL_MIN_PAGES", 64)  # smaller documents are read serially
+
+## Document retrieval index
+RETRIEVAL_CHUNK_WORDS = _env_int("RETRIEVAL_CHUNK_WORDS", 200)   # words per indexed chunk
+RETRIEVAL_MAX_TOP_K = _env_int("RETRIEVAL_MAX_TOP_K", 10)        # most chunks returned per search
+RETRIEVAL_INDEX_CACHE_MAX_BYTES = _env_int("RETRIEVAL_INDEX_CACHE_MAX_BYTES", 128 * 1024 * 1024)
+
+## Local pre-flight classification of uploads
+PREFLIGHT_ENABLED = os.getenv("PREFLIGHT_ENABLED", "true").lower() in ("1", "true", "yes")
+PREFLIGHT_SAMPLE_PAGES = _env_int("PREFLIGHT_SAMPLE_PAGES", 6)    # pages extracted to classify a document
+PREFLIGHT_MAX_CHARS = _env_int("PREFLIGHT_MAX_CHARS", 20000)      # characters of the sample that are scored
+PREFLIGHT_MIN_SCORE = _env_int("PREFLIGHT_MIN_SCORE", 30)         # financial score (percent) below which uploads are rejected
+# Full analyses of documents scoring at least this (percent) skip the LLM verification task; 0 never skips
+PREFLIGHT_SKIP_VERIFICATION_SCORE = _env_int("PREFLIGHT_SKIP_VERIFICATION_SCORE", 60)
+
+## Statement tables stored as Arrow files per document
+TABLE_STORE_DIR = os.getenv("TABLE_STORE_DIR", "")  # empty keeps tables in memory only
+TABLE_STORE_MAX_BYTES = _env_int("TABLE_STORE_MAX_BYTES", 256 * 1024 * 1024)  # tables held open
+TABLE_STORE_DISK_MAX_BYTES = _env_int("TABLE_STORE_DISK_MAX_BYTES", 1024 * 1024 * 1024)  # table files; 0: no limit
+TABLE_MIN_ROWS = _env_int("TABLE_MIN_ROWS", 3)             # statement rows that make a table
+TABLE_QUERY_MAX_ROWS = _env_int("TABLE_QUERY_MAX_ROWS", 60)  # rows returned per table query
+
+## Revised documents: uploads sharing enough pages with an earlier one get a change report
+REVISION_INDEX_MAX_DOCUMENTS = _env_int("REVISION_INDEX_MAX_DOCUMENTS", 1000)
+REVISION_MIN_SHARED = _env_int("REVISION_MIN_SHARED", 50)  # percent of pages that must match
+REVISION_INDEX_DIR = os.getenv("REVISION_INDEX_DIR", "")   # empty keeps fingerprints in memory only
+
+## Map-reduce digests of long documents (mode=hierarchical)
+SUMMARY_CHUNK_TOKENS = _env_int("SUMMARY_CHUNK_TOKENS", 6000)       # document tokens per map call
+SUMMARY_REDUCE_TOKENS = _env_int("SUMMARY_REDUCE_TOKENS", 24000)    # digest tokens per reduce call
+SUMMARY_MAP_WORKERS = _env_int("SUMMARY_MAP_WORKERS", 4)            # map calls in flight per document
+# Chunks also end after pages whose text hash is a multiple of this, so edits only move nearby boundaries
+SUMMARY_BOUNDARY_PAGES = _env_int("SUMMARY_BOUNDARY_PAGES", 4)
+SUMMARY_CACHE_MAX_BYTES = _env_int("SUMMARY_CACHE_MAX_BYTES", 64 * 1024 * 1024)
+SUMMARY_CACHE_DIR = os.getenv("SUMMARY_CACHE_DIR", "")  # empty disables the disk tier
+SUMMARY_CACHE_DISK_MAX_BYTES = _env_int("SUMMARY_CACHE_DISK_MAX_BYTES", 256 * 1024 * 1024)  # 0: no limit
+# Standard analyses of documents longer than this many tokens use the digest instead; 0 disables
+HIERARCHICAL_AUTO_TOKENS = _env_int("HIERARCHICAL_AUTO_TOKENS", 100000)
+
+## Analysis response cache
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+RESPONSE_CACHE_MAX_BYTES = _env_int("RESPONSE_CACHE_MAX_BYTES", 64 * 1024 * 1024)
+RESPONSE_CACHE_TTL = _env_int("RESPONSE_CACHE_TTL", 24 * 3600)  # seconds
+
+## LLM and web search endpoints; point these at local fakes for offline benchmarks
+LLM_MODEL = os.getenv("LLM_MODEL", "openrouter/deepseek/deepseek-r1")
+LLM_API_KEY = os.getenv("LLM_API_KEY", "or_key")
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "")  # empty uses the provider's default endpoint
+SERPER_BASE_URL = os.getenv("SERPER_BASE_URL", "https://google.serper.dev")
+
+## Web search cache, shared by every agent and request in the process
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "serper").lower()  # "serper", "fixture" or "record"
+SEARCH_FIXTURES_DIR = os.getenv("SEARCH_FIXTURES_DIR", "fixtures/search")
+SEARCH_CACHE_MAX_BYTES = _env_int("SEARCH_CACHE_MAX_BYTES", 16 * 1024 * 1024)
+SEARCH_CACHE_TTL = _env_int("SEARCH_CACHE_TTL", 3600)  # seconds; results go stale as news moves
+SEARCH_CACHE_WORKERS = _env_int("SEARCH_CACHE_WORKERS", 8)  # backend calls running at once
+
+## LLM rate limits, shared by every agent and request in the process
+LLM_REQUESTS_PER_MINUTE = _env_int("LLM_REQUESTS_PER_MINUTE", 20)
+LLM_TOKENS_PER_MINUTE = _env_int("LLM_TOKENS_PER_MINUTE", 200000)
+LLM_INTERACTIVE_RESERVE = _env_int("LLM_INTERACTIVE_RESERVE", 20)  # percent of each budget batch calls leave free
+LLM_EXPECTED_OUTPUT_TOKENS = _env_int("LLM_EXPECTED_OUTPUT_TOKENS", 1024)  # charged per call until the reply is known
+
+## Streaming
+# Stream LLM tokens so /analyze/stream can forward them as they are generated
+LLM_STREAM = os.getenv("LLM_STREAM", "true").lower() in ("1", "true", "yes")
+
+## Startup
+# Load crewai and build the agents on a background thread as soon as the server
+# starts; when off they are loaded by the first analysis
+CREW_WARMUP = os.getenv("CREW_WARMUP", "true").lower() in ("1", "true", "yes")
@@ -0,0 +1,171 @@
+## Per-request deadlines and cooperative cancellation of running analyses
+import time
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+
+import config
+from metrics import CANCELLATIONS, CANCELLED_CALLS
+
+logger = logging.getLogger(__name__)
+
+CANCELLED = "cancelled"
+CLIENT_DISCONNECT = "client_disconnect"
+DEADLINE = "deadline"
+
+# Stage limits in seconds; 0 leaves a stage bounded only by the request deadline
+STAGE_LIMITS = {
+    "extraction": lambda: config.DEADLINE_EXTRACTION_SECONDS,
+    "llm": lambda: config.DEADLINE_LLM_CALL_SECONDS,
+    "search": lambda: config.DEADLINE_SEARCH_SECONDS,
+}
+
+_current_deadline = contextvars.ContextVar("request_deadline", default=None)
+_current_stage = contextvars.ContextVar("deadline_stage", default=None)
+
+
+class AnalysisCancelledError(Exception):
+    """Raised inside an analysis whose request was cancelled"""
+
+
+class DeadlineExceededError(AnalysisCancelledError):
+    """Raised inside an analysis that ran past its request or stage deadline"""
+
+
+class RequestDeadline:
+    """Time limit and cancellation flag shared by everything one request runs
+
+    Work checks it between steps (pages, LLM calls, searches) and stops by
+    raising, so a cancelled or expired analysis makes no further calls. Only
+    the time limit survives pickling to a process worker; cancellation needs
+    in-process workers.
+
+    Args:
+        seconds (float, optional): Time allowed from now; None or 0 for no limit.
+    """
+
+    def __init__(self, seconds=None):
+        self.seconds = seconds or None
+        self.started = time.time()
+        self.expires = self.started + seconds if seconds else None
+        self.reason = None
+        self.cancelled_at = None
+        self._cancelled = threading.Event()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_cancelled"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._cancelled = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def cancel(self, reason=CANCELLED):
+        """Ask the work bound to this deadline to stop; returns False if it already was"""
+        if self._cancelled.is_set():
+            return False
+        self.reason = reason
+        self.cancelled_at = time.time()
+        self._cancelled.set()
+        return True
+
+    def remaining(self):
+        """Seconds left before the deadline, or None without one"""
+        if self.expires is None:
+            return None
+        return max(0.0, self.expires - time.time())
+
+    def check(self, kind=None):
+        """Raise if the request was cancelled or its deadline has passed
+
+        Args:
+            kind (str, optional): What was about to run, counted as a refused call.
+        """
+        if not self.cancelled and self.expires is not None and time.time() >= self.expires:
+            if self.cancel(DEADLINE):
+                CANCELLATIONS.inc(reason=DEADLINE, state="running")
+                logger.info(f"Request deadline of {self.seconds:.0f}s exceeded")
+        if self.cancelled:
+            if kind:
+                CANCELLED_CALLS.inc(kind=kind)
+            if self.reason == DEADLINE:
+                raise DeadlineExceededError(f"Request deadline of {self.seconds:.0f}s exceeded")
+            raise AnalysisCancelledError(f"Analysis cancelled ({self.reason})")
+
+
+def request_deadline(seconds=None):
+    """Deadline for a new request: ``seconds`` if given, capped at DEADLINE_SECONDS"""
+    limit = config.DEADLINE_SECONDS
+    if seconds and seconds > 0:
+        limit = min(seconds, limit) if limit else seconds
+    return RequestDeadline(limit or None)
+
+
+@contextmanager
+def deadline_context(deadline):
+    """Bind ``deadline`` for the checks made in this context"""
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+
+
+def run_with_deadline(deadline, fn, *args, **kwargs):
+    """Call ``fn`` with ``deadline`` bound, refusing to start if it already passed"""
+    with deadline_context(deadline):
+        check()
+        return fn(*args, **kwargs)
+
+
+def current():
+    return _current_deadline.get()
+
+
+@contextmanager
+def stage(name):
+    """Apply the ``name`` stage limit to the enclosed block
+
+    A nested stage replaces the enclosing one until it ends.
+    """
+    limit = STAGE_LIMITS[name]()
+    token = _current_stage.set((name, time.time() + limit) if limit else None)
+    try:
+        yield
+    finally:
+        _current_stage.reset(token)
+
+
+def check(kind=None):
+    """Raise if the bound request is cancelled or past its request or stage deadline"""
+    deadline = _current_deadline.get()
+    if deadline is not None:
+        deadline.check(kind)
+    current_stage = _current_stage.get()
+    if current_stage is not None and time.time() >= current_stage[1]:
+        name = current_stage[0]
+        if kind:
+            CANCELLED_CALLS.inc(kind=kind)
+        raise DeadlineExceededError(f"The {name} stage exceeded its {STAGE_LIMITS[name]()}s limit")
+
+
+def timeout(name):
+    """Seconds one ``name`` call may take: its stage limit, cut to what is left of the request
+
+    Returns None when neither limit applies.
+    """
+    limits = [STAGE_LIMITS[name]() or None]
+    deadline = _current_deadline.get()
+    if deadline is not None:
+        limits.append(deadline.remaining())
+    current_stage = _current_stage.get()
+    if current_stage is not None:
+        limits.append(max(0.0, current_stage[1] - time.time()))
+    limits = [limit for limit in limits if limit is not None]
+    return min(limits) if limits else None
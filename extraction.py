@@ -0,0 +1,548 @@
+## PDF text extraction, serial or split across a process pool
+import os
+import re
+import mmap
+import time
+import struct
+import hashlib
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import PyPDF2
+from PyPDF2.generic import ArrayObject, DictionaryObject, IndirectObject, StreamObject
+
+import config
+import deadlines
+from cache import ExtractionCache, LRUCache, document_digest
+from metrics import record_stage, timed, PAGES_EXTRACTED
+from compaction import compact_text, COMPACTION_VERSION
+
+logger = logging.getLogger(__name__)
+
+
+# Runs of blank lines collapse to a single newline in one pass
+_BLANK_LINES = re.compile(r"\n{2,}")
+
+
+class EmptyPdfError(ValueError):
+    """Raised when a PDF has no pages at all"""
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool(workers):
+    """Process pool shared by all extractions, created on first parallel use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=workers)
+        return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def _extract_page(reader, page_num):
+    """Text of one page, or an empty string if the page cannot be read"""
+    try:
+        return reader.pages[page_num].extract_text() or ""
+    except Exception as page_error:
+        logger.warning(f"Error reading page {page_num}: {str(page_error)}")
+        return ""
+
+
+def _timed_page(reader, page_num):
+    """``(text, seconds)`` for one page; pool workers send the timings back with the text"""
+    start = time.perf_counter()
+    text = _extract_page(reader, page_num)
+    return text, time.perf_counter() - start
+
+
+def _record_pages(timed_pages):
+    """Record per-page extraction times and return the texts"""
+    texts = []
+    for text, seconds in timed_pages:
+        record_stage("pdf_page", seconds)
+        texts.append(text)
+    PAGES_EXTRACTED.inc(len(texts))
+    return texts
+
+
+def _extract_page_list(path, page_nums):
+    """Worker entry point: open the file independently and extract the pages ``page_nums``"""
+    with open(path, "rb") as file:
+        reader = PyPDF2.PdfReader(file)
+        return [_timed_page(reader, page_num) for page_num in page_nums]
+
+
+def _extract_document(path):
+    """Worker entry point: extract every page of one document"""
+    with open(path, "rb") as file:
+        reader = PyPDF2.PdfReader(file)
+        if len(reader.pages) == 0:
+            raise EmptyPdfError(f"PDF file contains no pages: {path}")
+        return [_timed_page(reader, page_num) for page_num in range(len(reader.pages))]
+
+
+def _page_ranges(page_count, parts):
+    """Split ``range(page_count)`` into ``parts`` contiguous, near-equal ranges"""
+    size, extra = divmod(page_count, parts)
+    ranges = []
+    start = 0
+    for i in range(parts):
+        stop = start + size + (1 if i < extra else 0)
+        if stop > start:
+            ranges.append((start, stop))
+        start = stop
+    return ranges
+
+
+# Keys that point back up the page tree or only describe the encoding
+_UNHASHED_KEYS = ("/Parent", "/Length")
+
+
+def _hash_object(obj, digest, memo):
+    """Feed a PDF object, with everything it references, into ``digest``
+
+    Referenced objects are hashed once per document and remembered in
+    ``memo`` by object number; only their contents enter the hash, so it does
+    not change when a PDF is rewritten with new object numbers. Images count
+    by their dictionary alone, since their pixels carry no text.
+    """
+    if isinstance(obj, IndirectObject):
+        key = (obj.idnum, obj.generation)
+        if key not in memo:
+            memo[key] = b"cycle"
+            sub = hashlib.sha256()
+            _hash_object(obj.get_object(), sub, memo)
+            memo[key] = sub.digest()
+        digest.update(memo[key])
+    elif isinstance(obj, DictionaryObject):
+        digest.update(b"<<")
+        for key in sorted(obj):
+            if key not in _UNHASHED_KEYS:
+                digest.update(key.encode("utf-8", "replace"))
+                _hash_object(obj.raw_get(key), digest, memo)
+        digest.update(b">>")
+        if isinstance(obj, StreamObject) and obj.get("/Subtype") != "/Image":
+            digest.update(obj._data or b"")
+    elif isinstance(obj, ArrayObject):
+        digest.update(b"[")
+        for item in list.__iter__(obj):
+            _hash_object(item, digest, memo)
+        digest.update(b"]")
+    else:
+        digest.update(f"{type(obj).__name__}:{obj!r};".encode("utf-8", "replace"))
+
+
+def _page_fingerprint(page, memo=None):
+    """SHA-256 of a page's content stream and the resources it draws with
+
+    Content streams survive a PDF being rewritten, unlike object numbers, so
+    an unchanged page of a revised filing keeps its fingerprint. Fonts and
+    form XObjects are part of it too: a page that only says ``/X0 Do`` gets
+    its text from the XObject, and the same operators in another font decode
+    to other characters. Pass one ``memo`` for all pages of a document so
+    shared resources are hashed once.
+    """
+    memo = {} if memo is None else memo
+    try:
+        contents = page.get_contents()
+        digest = hashlib.sha256(contents.get_data() if contents is not None else b"")
+        if "/Resources" in page:
+            _hash_object(page.raw_get("/Resources"), digest, memo)
+    except Exception as e:
+        logger.warning(f"Cannot read page content stream: {str(e)}")
+        return None
+    return digest.hexdigest()
+
+
+def _rss_bytes():
+    """Resident set size of this process, or None where /proc is not available"""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * mmap.PAGESIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class LazyPdf:
+    """A PDF read through a memory map, with parsed objects dropped to stay in a memory budget
+
+    The reader only touches the parts of the file a page needs, but it keeps
+    every object it resolves, images included. Whenever the process has grown
+    by more than ``memory_budget`` bytes since the file was opened, those
+    objects are dropped and the mapped pages released; later pages resolve
+    the few shared objects, like fonts, again.
+
+    Args:
+        path (str): Path of the pdf file.
+        memory_budget (int, optional): Allowed growth of the resident set.
+            Defaults to LARGE_DOCUMENT_MEMORY_BUDGET.
+    """
+
+    # Pages between releases where the resident set cannot be read
+    FALLBACK_WINDOW = 16
+
+    def __init__(self, path, memory_budget=None):
+        self.path = path
+        self.memory_budget = memory_budget or config.LARGE_DOCUMENT_MEMORY_BUDGET
+        self.releases = 0
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            # Empty files and some file systems cannot be mapped
+            self._map = None
+        self.reader = PyPDF2.PdfReader(self._map if self._map is not None else self._file)
+        self._baseline = _rss_bytes()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.reader = None
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
+
+    @property
+    def page_count(self):
+        return len(self.reader.pages)
+
+    def release(self):
+        """Drop resolved objects and give the mapped file pages back to the OS"""
+        self.reader.resolved_objects.clear()
+        if self._map is not None and hasattr(self._map, "madvise"):
+            self._map.madvise(mmap.MADV_DONTNEED)
+        self.releases += 1
+
+    def _over_budget(self, page_num):
+        if self._baseline is None:
+            return page_num % self.FALLBACK_WINDOW == self.FALLBACK_WINDOW - 1
+        rss = _rss_bytes()
+        return rss is not None and rss - self._baseline > self.memory_budget
+
+    def pages(self):
+        """Yield ``(page_num, page)`` for every page, releasing memory when over budget"""
+        for page_num in range(self.page_count):
+            yield page_num, self.reader.pages[page_num]
+            if self._over_budget(page_num):
+                self.release()
+
+
+def is_large_document(path):
+    """Whether the file is big enough to be read in constant memory"""
+    threshold = config.LARGE_DOCUMENT_THRESHOLD
+    try:
+        return bool(threshold) and os.path.getsize(path) > threshold
+    except OSError:
+        return False
+
+
+def page_fingerprints(path):
+    """Content fingerprint of every page of a PDF, in page order
+
+    Hashing the content streams and resources costs a small fraction of
+    extracting the text. Unreadable pages get ``None``.
+    """
+    memo = {}
+    with LazyPdf(path) as pdf:
+        return [_page_fingerprint(page, memo) for _, page in pdf.pages()]
+
+
+def count_pages(path):
+    with open(path, "rb") as file:
+        return len(PyPDF2.PdfReader(file).pages)
+
+
+def iter_pages(path, parallel=None, workers=None, min_pages=None):
+    """Yield the raw text of every page of a PDF, in page order
+
+    Documents with at least ``min_pages`` pages are split into contiguous page
+    ranges that are extracted concurrently by a process pool; smaller ones are
+    read serially, where pool overhead would outweigh the gain. Pages that fail
+    to extract are logged and yielded as empty strings.
+
+    Page texts are cached by page fingerprint, so of a revised document only
+    the new and changed pages are extracted again. Documents over
+    LARGE_DOCUMENT_THRESHOLD bytes are read in constant memory instead; see
+    ``iter_large_pages``.
+
+    Args:
+        path (str): Path of the pdf file.
+        parallel (bool, optional): Force parallel (True) or serial (False) extraction.
+            Defaults to deciding by page count.
+        workers (int, optional): Number of worker processes. Defaults to PDF_EXTRACT_WORKERS.
+        min_pages (int, optional): Page threshold for parallel mode. Defaults to
+            PDF_PARALLEL_MIN_PAGES.
+
+    Raises:
+        EmptyPdfError: If the PDF contains no pages.
+        PyPDF2.errors.PdfReadError: If the file is not a readable PDF.
+    """
+    if is_large_document(path):
+        yield from iter_large_pages(path)
+        return
+
+    workers = workers or config.PDF_EXTRACT_WORKERS
+    min_pages = config.PDF_PARALLEL_MIN_PAGES if min_pages is None else min_pages
+
+    with open(path, "rb") as file:
+        reader = PyPDF2.PdfReader(file)
+        page_count = len(reader.pages)
+        if page_count == 0:
+            raise EmptyPdfError(f"PDF file contains no pages: {path}")
+
+        fingerprints = [None] * page_count
+        cached = [None] * page_count
+        if page_cache.max_bytes:
+            memo = {}
+            fingerprints = [_page_fingerprint(page, memo) for page in reader.pages]
+            cached = [page_cache.get(fingerprint) if fingerprint else None for fingerprint in fingerprints]
+        missing = sum(1 for text in cached if text is None)
+        if missing < page_count:
+            logger.info(f"{page_count - missing} of {page_count} pages of {path} found in the page cache")
+
+        if parallel is None:
+            parallel = workers > 1 and missing >= min_pages
+        if not parallel or missing < 2:
+            for page_num in range(page_count):
+                if cached[page_num] is not None:
+                    yield cached[page_num]
+                    continue
+                deadlines.check("extraction")
+                text = _record_pages([_timed_page(reader, page_num)])[0]
+                _cache_page(fingerprints[page_num], text)
+                yield text
+            return
+
+    # Only the pages missing from the page cache are extracted, split in order between the workers
+    missing_pages = [page_num for page_num in range(page_count) if cached[page_num] is None]
+    chunks = [missing_pages[start:stop]
+              for start, stop in _page_ranges(len(missing_pages), min(workers, len(missing_pages)))]
+    pool = _get_pool(workers)
+    futures = [pool.submit(_extract_page_list, path, chunk) for chunk in chunks]
+    try:
+        # Pages are yielded in page order, each chunk as soon as it completes
+        pending = iter(zip(chunks, futures))
+        extracted = {}
+        for page_num in range(page_count):
+            if cached[page_num] is not None:
+                yield cached[page_num]
+                continue
+            if page_num not in extracted:
+                deadlines.check("extraction")
+                chunk, future = next(pending)
+                extracted = dict(zip(chunk, _record_pages(future.result())))
+                for extracted_num, text in extracted.items():
+                    _cache_page(fingerprints[extracted_num], text)
+            yield extracted[page_num]
+    finally:
+        for future in futures:
+            future.cancel()
+    logger.info(f"Extracted {len(missing_pages)} of {page_count} pages from {path} using {len(chunks)} workers")
+
+
+class PageSpill:
+    """Page texts of one document spilled to a file next to it and read back one at a time
+
+    Each page is stored as its UTF-8 length followed by the text. Pages are
+    written through a buffer of ``buffer_bytes``, and the file only appears
+    under its final name once every page is in it.
+    """
+
+    _LENGTH = struct.Struct("<I")
+
+    def __init__(self, pdf_path, buffer_bytes=None):
+        self.path = spill_path(pdf_path)
+        self.buffer_bytes = buffer_bytes or max(64 * 1024, config.LARGE_DOCUMENT_MEMORY_BUDGET // 16)
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def write(self, pages):
+        """Yield ``pages`` through while writing them to the spill file"""
+        tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        complete = False
+        try:
+            with open(tmp_path, "wb", buffering=self.buffer_bytes) as f:
+                for text in pages:
+                    data = text.encode("utf-8", "replace")
+                    f.write(self._LENGTH.pack(len(data)))
+                    f.write(data)
+                    yield text
+            os.replace(tmp_path, self.path)
+            complete = True
+        finally:
+            if not complete and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def __iter__(self):
+        with open(self.path, "rb", buffering=self.buffer_bytes) as f:
+            while True:
+                header = f.read(self._LENGTH.size)
+                if len(header) < self._LENGTH.size:
+                    return
+                (length,) = self._LENGTH.unpack(header)
+                yield f.read(length).decode("utf-8")
+
+
+def spill_path(pdf_path):
+    """Where the page texts of a large document are spilled"""
+    return f"{pdf_path}.pages"
+
+
+def iter_large_pages(path, memory_budget=None):
+    """Yield the raw text of every page of a large PDF in bounded memory
+
+    Pages are read serially through ``LazyPdf`` and spilled to disk as they
+    are extracted, so later reads of the same file replay the spill instead
+    of parsing the PDF again. Neither the file nor its text is ever held in
+    memory as a whole.
+
+    Raises:
+        EmptyPdfError: If the PDF contains no pages.
+    """
+    spill = PageSpill(path)
+    if spill.exists():
+        yield from spill
+        return
+
+    def extract(pdf):
+        for page_num, page in pdf.pages():
+            deadlines.check("extraction")
+            start = time.perf_counter()
+            try:
+                text = page.extract_text() or ""
+            except Exception as page_error:
+                logger.warning(f"Error reading page {page_num}: {str(page_error)}")
+                text = ""
+            yield _record_pages([(text, time.perf_counter() - start)])[0]
+
+    with LazyPdf(path, memory_budget) as pdf:
+        if pdf.page_count == 0:
+            raise EmptyPdfError(f"PDF file contains no pages: {path}")
+        yield from spill.write(extract(pdf))
+        logger.info(f"Extracted {pdf.page_count} pages from {path} in constant memory, "
+                    f"released parsed objects {pdf.releases} times")
+
+
+def _cache_page(fingerprint, text):
+    if fingerprint is not None:
+        page_cache.put(fingerprint, text)
+
+
+def extract_pages(path, parallel=None, workers=None, min_pages=None):
+    """List of raw page texts; see ``iter_pages`` for the arguments"""
+    return list(iter_pages(path, parallel=parallel, workers=workers, min_pages=min_pages))
+
+
+def extract_documents(paths, workers=None):
+    """Extract many documents concurrently, one whole document per pool worker
+
+    Yields ``(path, pages, error)`` as each document finishes, so callers can
+    start using early results while the rest are still being read. ``error``
+    is the exception raised for that document, with ``pages`` set to None.
+    """
+    pool = _get_pool(workers or config.PDF_EXTRACT_WORKERS)
+    futures = {pool.submit(_extract_document, path): path for path in paths}
+    try:
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                pages = _record_pages(future.result())
+            except Exception as e:
+                yield path, None, e
+                continue
+            yield path, pages, None
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+def clean_page(content):
+    """Collapse blank lines in one page of extracted text"""
+    return _BLANK_LINES.sub("\n", content)
+
+
+def iter_clean_pages(path, **kwargs):
+    """Yield cleaned, non-empty pages of a PDF one at a time
+
+    Keyword arguments are passed on to ``iter_pages``.
+    """
+    yield from clean_pages(iter_pages(path, **kwargs))
+
+
+def clean_pages(pages):
+    """Cleaned versions of the non-empty pages in ``pages``"""
+    for content in pages:
+        if content.strip():
+            yield clean_page(content)
+
+
+def document_text(pages):
+    """The text the agents are given for a document's raw pages
+
+    Pages are cleaned and, with ``COMPACTION_ENABLED``, compacted across the
+    whole document.
+    """
+    if not config.COMPACTION_ENABLED:
+        return "\n".join(clean_pages(pages)).strip()
+    with timed("compaction"):
+        text, _ = compact_text(clean_pages(pages))
+    return text.strip()
+
+
+## Cache of extracted text keyed by PDF content hash
+# Bump EXTRACTOR_VERSION whenever the extraction output changes so stale
+# entries from the disk tier are not served.
+EXTRACTOR_VERSION = f"pypdf2-{PyPDF2.__version__}-1"
+
+extraction_cache = ExtractionCache(
+    max_bytes=config.EXTRACTION_CACHE_MAX_BYTES,
+    directory=config.EXTRACTION_CACHE_DIR or None,
+    disk_max_bytes=config.EXTRACTION_CACHE_DISK_MAX_BYTES,
+    # Compacted and plain texts of the same document are different entries
+    version=f"{EXTRACTOR_VERSION}-compact{COMPACTION_VERSION}" if config.COMPACTION_ENABLED else EXTRACTOR_VERSION,
+)
+
+## Raw text of single pages keyed by page fingerprint, shared by all documents
+page_cache = LRUCache(config.PAGE_CACHE_MAX_BYTES)
+
+
+def warm_extraction_cache(paths):
+    """Extract several documents in parallel and store their text in the extraction cache
+
+    Documents already cached are skipped. The stored text is exactly what
+    ``read_data_tool`` would produce, so later reads by the agents are hits.
+
+    Returns:
+        dict: ``path -> None`` on success or an error message for that document.
+    """
+    digests = {path: document_digest(path) for path in paths}
+    pending = [path for path in paths if extraction_cache.get(digests[path]) is None]
+    outcome = {path: None for path in paths}
+
+    for path, pages, error in extract_documents(pending):
+        if error is not None:
+            logger.warning(f"Batch extraction failed for {path}: {str(error)}")
+            outcome[path] = f"Error: {str(error)}"
+            continue
+        text = document_text(pages)
+        if text:
+            extraction_cache.put(digests[path], text)
+
+    logger.info(f"Extracted {len(pending)} of {len(paths)} documents ({len(paths) - len(pending)} cached)")
+    return outcome
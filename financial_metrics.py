@@ -0,0 +1,316 @@
+## Deterministic financial metrics computed from extracted statement text
+import re
+import json
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+# Canonical line items and the statement labels that map onto them
+LINE_ITEM_LABELS = {
+    "revenue": ["total revenue", "total revenues", "revenue", "revenues", "net sales",
+                "total net sales", "net revenue", "net revenues", "sales"],
+    "cost_of_revenue": ["cost of revenue", "cost of revenues", "cost of sales", "cost of goods sold"],
+    "gross_profit": ["gross profit", "gross margin"],
+    "operating_expenses": ["operating expenses", "total operating expenses"],
+    "operating_income": ["operating income", "income from operations", "operating profit"],
+    "interest_expense": ["interest expense", "interest expense net"],
+    "net_income": ["net income", "net earnings", "net profit", "net income attributable to shareholders",
+                   "profit for the year", "net income loss"],
+    "total_assets": ["total assets"],
+    "current_assets": ["total current assets", "current assets"],
+    "total_liabilities": ["total liabilities"],
+    "current_liabilities": ["total current liabilities", "current liabilities"],
+    "equity": ["total equity", "shareholders equity", "stockholders equity", "total shareholders equity",
+               "total stockholders equity"],
+    "cash": ["cash and cash equivalents", "cash and equivalents", "cash"],
+    "inventory": ["inventory", "inventories"],
+    "long_term_debt": ["long-term debt", "long term debt", "total debt"],
+    "operating_cash_flow": ["operating cash flow", "net cash provided by operating activities",
+                            "cash flow from operations", "net cash from operating activities"],
+    "capital_expenditures": ["capital expenditures", "capital expenditure",
+                             "purchases of property and equipment"],
+}
+
+_LABEL_LOOKUP = {
+    label: item for item, labels in LINE_ITEM_LABELS.items() for label in labels
+}
+
+# (name, numerator, denominator) evaluated together as one array division
+RATIOS = [
+    ("gross_margin", "gross_profit", "revenue"),
+    ("operating_margin", "operating_income", "revenue"),
+    ("net_margin", "net_income", "revenue"),
+    ("return_on_assets", "net_income", "total_assets"),
+    ("return_on_equity", "net_income", "equity"),
+    ("debt_to_equity", "total_liabilities", "equity"),
+    ("debt_to_assets", "total_liabilities", "total_assets"),
+    ("long_term_debt_to_equity", "long_term_debt", "equity"),
+    ("current_ratio", "current_assets", "current_liabilities"),
+    ("cash_ratio", "cash", "current_liabilities"),
+    ("interest_coverage", "operating_income", "interest_expense"),
+    ("asset_turnover", "revenue", "total_assets"),
+    ("free_cash_flow_margin", "free_cash_flow", "revenue"),
+    ("cash_flow_to_net_income", "operating_cash_flow", "net_income"),
+]
+
+# Risk indicator thresholds: (ratio, comparison, threshold, flag description)
+RISK_RULES = [
+    ("debt_to_equity", ">", 2.0, "High leverage: liabilities exceed twice equity"),
+    ("current_ratio", "<", 1.0, "Liquidity pressure: current liabilities exceed current assets"),
+    ("interest_coverage", "<", 3.0, "Thin interest coverage: operating income below 3x interest expense"),
+    ("net_margin", "<", 0.0, "Loss-making: negative net margin"),
+    ("free_cash_flow_margin", "<", 0.0, "Negative free cash flow"),
+    ("cash_flow_to_net_income", "<", 0.5, "Earnings quality: operating cash flow well below net income"),
+]
+
+# Amounts, plus standalone dashes that statements print for a nil period
+_NUMBER = re.compile(r"\(?-?(?:\$\s?)?\d[\d,]*(?:\.\d+)?\)?%?|(?<!\S)[—–-](?!\S)")
+_YEAR = re.compile(r"^(?:FY\s?)?(19|20)\d{2}$")
+# Day of the month before the years of a header such as "Year ended December 31, 2024 2023"
+_DAY = re.compile(r"^(?:[1-9]|[12]\d|3[01]),?$")
+_LABEL_CLEAN = re.compile(r"[^a-z\- ]+")
+_DASHES = ("—", "–", "-")
+_NUMBER_JUNK = str.maketrans("", "", "()$%-, ")
+
+
+def _normalize_label(label):
+    label = _LABEL_CLEAN.sub(" ", label.lower().replace("'", ""))
+    return " ".join(label.split())
+
+
+def _parse_number(token):
+    """Statement number to float; parentheses and leading minus mean negative"""
+    if token in _DASHES:
+        return np.nan
+    negative = token[0] in "(-"
+    value = float(token.translate(_NUMBER_JUNK))
+    return -value if negative else value
+
+
+def _split_line(line):
+    """Return (label, numeric tokens) for a statement row, or None for prose"""
+    matches = list(_NUMBER.finditer(line))
+    if not matches:
+        return None
+    label = line[:matches[0].start()].strip(" :.$\t")
+    # Everything after the label must be numbers, so prose with a figure is skipped
+    end = matches[0].end()
+    for match in matches[1:]:
+        if line[end:match.start()].strip(" $\t"):
+            return None
+        end = match.end()
+    if line[end:].strip(" $\t"):
+        return None
+    return label, [match.group().strip() for match in matches]
+
+
+def canonical_item(label):
+    """Canonical line item name for a statement label, or its normalized form"""
+    label = _normalize_label(label)
+    return _LABEL_LOOKUP.get(label, label)
+
+
+def parse_row(line):
+    """Parse one line of statement text
+
+    Returns:
+        tuple: ``(label, values)`` for a line item row, ``(None, periods)`` for
+        a header ending in two or more years, or None for prose and
+        unparseable lines. Header prose such as "Year ended December 31," is
+        dropped together with its day of the month. Percentages are dropped
+        from the values, since they are already ratios and would be mistaken
+        for amounts.
+    """
+    split = _split_line(line)
+    if split is None:
+        return None
+    label, tokens = split
+
+    years = len(tokens)
+    while years and _YEAR.match(tokens[years - 1]):
+        years -= 1
+    header_tokens = tokens[years:]
+    dated = years == 1 and _DAY.match(tokens[0]) and canonical_item(label) not in LINE_ITEM_LABELS
+    if len(header_tokens) >= 2 and (years == 0 or dated):
+        return None, header_tokens
+
+    tokens = [token for token in tokens if not token.endswith("%")]
+    try:
+        return label, [_parse_number(token) for token in tokens]
+    except ValueError:
+        return None
+
+
+class StatementData:
+    """Line items parsed from statement text as an (items x periods) array"""
+
+    def __init__(self, labels, periods, values):
+        self.labels = labels
+        self.periods = periods
+        self.values = values
+        self.index = {label: row for row, label in enumerate(labels)}
+
+    def row(self, item):
+        row = self.index.get(item)
+        if row is None:
+            return np.full(len(self.periods), np.nan)
+        return self.values[row]
+
+
+def _period_order(period):
+    """Sort key putting fiscal years most recent first, then unlabelled columns in order"""
+    year = re.search(r"\d{4}", period)
+    if _YEAR.match(period) and year:
+        return (0, -int(year.group()), period)
+    return (1, int(period[1:]) if period[1:].isdigit() else 0, period)
+
+
+def parse_statements(text):
+    """Parse numeric line items and period headers out of extracted text
+
+    Rows are lines with a text label followed only by numbers, e.g.
+    ``Net income    25,125.3    21,004.0``. A line made of two or more years
+    starts a new table and labels the columns of the rows under it, up to
+    the next such line; rows before any header get positional labels
+    ``P0``, ``P1``... Values are matched across tables by period label, not by
+    column, and periods are ordered most recent first. The first value found
+    for each label and period wins, since summary statements normally precede
+    the notes.
+
+    Returns:
+        StatementData: Every parsed line item, with canonical names (``revenue``,
+        ``net_income``...) for the labels listed in LINE_ITEM_LABELS.
+    """
+    rows = {}
+    periods = []
+
+    for line in text.splitlines():
+        parsed = parse_row(line)
+        if parsed is None:
+            continue
+        label, values = parsed
+        if label is None:
+            periods = values
+            continue
+
+        item = canonical_item(label)
+        if not item or not values:
+            continue
+        row_periods = periods or [f"P{i}" for i in range(len(values))]
+        row = rows.setdefault(item, {})
+        # Values past the header's columns (e.g. a change column) have no period
+        for period, value in zip(row_periods, values):
+            row.setdefault(period, value)
+
+    columns = sorted({period for row in rows.values() for period in row}, key=_period_order)
+    position = {period: column for column, period in enumerate(columns)}
+
+    labels = list(rows)
+    values = np.full((len(labels), len(columns)), np.nan)
+    for row, label in enumerate(labels):
+        for period, value in rows[label].items():
+            values[row, position[period]] = value
+
+    return StatementData(labels, columns, values)
+
+
+def _rounded(array):
+    return [None if not np.isfinite(value) else round(float(value), 4) for value in array]
+
+
+def _adjacent_periods(periods):
+    """Whether each period directly follows the next one; False across a gap in fiscal years"""
+    years = [int(re.search(r"\d{4}", period).group()) if _YEAR.match(period) else None for period in periods]
+    return np.array([current is None or previous is None or current - previous == 1
+                     for current, previous in zip(years, years[1:])], dtype=bool)
+
+
+def compute_metrics(data):
+    """Ratios, period-over-period growth and risk indicators in one batched pass
+
+    Periods are ordered most recent first, as ``parse_statements`` returns
+    them, so growth for period i compares it with period i + 1; it is left
+    out where years are missing in between.
+
+    Returns:
+        dict: ``line_items``, ``ratios``, ``growth`` and ``risk`` sections keyed by period.
+    """
+    width = len(data.periods)
+    free_cash_flow = data.row("operating_cash_flow") - np.abs(data.row("capital_expenditures"))
+    # Interest expense is often printed in parentheses; coverage needs its size
+    derived = {"free_cash_flow": free_cash_flow, "interest_expense": np.abs(data.row("interest_expense"))}
+
+    def row(item):
+        return derived[item] if item in derived else data.row(item)
+
+    numerators = np.vstack([row(numerator) for _, numerator, _ in RATIOS]) if width else np.empty((0, 0))
+    denominators = np.vstack([row(denominator) for _, _, denominator in RATIOS]) if width else np.empty((0, 0))
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio_values = numerators / denominators
+        ratio_values[denominators == 0] = np.nan
+        if width > 1:
+            previous = data.values[:, 1:]
+            growth_values = (data.values[:, :-1] - previous) / np.abs(previous)
+            growth_values[previous == 0] = np.nan
+            growth_values[:, ~_adjacent_periods(data.periods)] = np.nan
+        else:
+            growth_values = np.empty((len(data.labels), 0))
+
+    ratios = {name: _rounded(ratio_values[i]) for i, (name, _, _) in enumerate(RATIOS)
+              if width and np.isfinite(ratio_values[i]).any()}
+
+    canonical = [item for item in LINE_ITEM_LABELS if item in data.index]
+    line_items = {item: _rounded(data.row(item)) for item in canonical}
+    if np.isfinite(free_cash_flow).any():
+        line_items["free_cash_flow"] = _rounded(free_cash_flow)
+    growth = {item: _rounded(growth_values[data.index[item]]) for item in canonical
+              if growth_values.shape[1] and np.isfinite(growth_values[data.index[item]]).any()}
+
+    return {
+        "periods": data.periods,
+        "parsed_line_items": len(data.labels),
+        "line_items": line_items,
+        "ratios": ratios,
+        "growth": growth,
+        "risk": assess_risk(ratios, growth),
+    }
+
+
+def assess_risk(ratios, growth):
+    """Flag risk indicators on the most recent period and grade the overall level"""
+    flags = []
+    for name, comparison, threshold, description in RISK_RULES:
+        values = ratios.get(name)
+        if not values or values[0] is None:
+            continue
+        latest = values[0]
+        if (comparison == ">" and latest > threshold) or (comparison == "<" and latest < threshold):
+            flags.append({"indicator": name, "value": latest, "threshold": threshold, "note": description})
+
+    revenue_growth = growth.get("revenue")
+    if revenue_growth and revenue_growth[0] is not None and revenue_growth[0] < 0:
+        flags.append({"indicator": "revenue_growth", "value": revenue_growth[0], "threshold": 0.0,
+                      "note": "Declining revenue versus the prior period"})
+
+    if not ratios and not growth:
+        level = "Undetermined"
+    elif len(flags) >= 3:
+        level = "High"
+    elif flags:
+        level = "Moderate"
+    else:
+        level = "Low"
+    return {"risk_level": level, "flags": flags}
+
+
+def analyze_text(text):
+    """Parse statement text and return the computed metrics as a dict"""
+    return compute_metrics(parse_statements(text))
+
+
+def to_json(result):
+    return json.dumps(result, separators=(",", ":"))
@@ -0,0 +1,303 @@
+## Background job queue for long running crew analyses
+import os
+import time
+import uuid
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, CancelledError
+
+from metrics import record_stage, CANCELLATIONS, CANCELLATION_RELEASE, RECLAIMED_SECONDS
+from deadlines import (RequestDeadline, AnalysisCancelledError, DeadlineExceededError, run_with_deadline,
+                       CANCELLED as CANCEL_REQUESTED, DEADLINE)
+
+logger = logging.getLogger(__name__)
+
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at capacity"""
+
+
+class Job:
+    """State of a single submitted analysis"""
+
+    def __init__(self, job_id, metadata=None):
+        self.id = job_id
+        self.metadata = metadata or {}
+        self.status = QUEUED
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.future = None
+        self.cleanup = []
+        self.deadline = None
+        self.on_success = None
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            # Live values such as timing breakdowns are rendered when reported
+            **{key: value.to_dict() if hasattr(value, "to_dict") else value
+               for key, value in self.metadata.items()},
+        }
+
+
+class JobManager:
+    """Runs blocking callables on a bounded worker pool with admission control
+
+    Jobs beyond the worker count wait in a queue of at most ``max_queued``
+    entries; once that is full ``submit`` raises ``QueueFullError`` so the API
+    can answer with 429 instead of piling up work.
+
+    With the process executor, ``initializer`` runs once in every worker
+    process as it starts, e.g. to load modules ahead of the first job.
+    """
+
+    def __init__(self, workers=2, max_queued=16, executor="thread", result_ttl=3600, initializer=None):
+        self.workers = max(1, workers)
+        self.max_queued = max(0, max_queued)
+        self.result_ttl = result_ttl
+        self.executor_kind = executor
+
+        if executor == "process":
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=initializer)
+        else:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="analysis-worker"
+            )
+
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def _count(self, status):
+        return sum(1 for job in self._jobs.values() if job.status == status)
+
+    def _in_flight(self):
+        """Jobs still holding a worker or a queue slot, including cancelled running ones
+
+        Jobs admitted but not yet handed to the executor hold their slot too,
+        so concurrent submitters cannot all pass the limit at once.
+        """
+        return sum(1 for job in self._jobs.values() if job.future is None or not job.future.done())
+
+    def _refresh(self, job):
+        # Process pool workers cannot report back when they start, so the
+        # running state is read off the future instead.
+        if job.status == QUEUED and job.future is not None and job.future.running():
+            job.status = RUNNING
+            job.started_at = time.time()
+
+    def _prune(self):
+        """Forget finished jobs older than the result TTL"""
+        cutoff = time.time() - self.result_ttl
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.status in FINISHED_STATES and job.finished_at and job.finished_at < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def submit(self, fn, *args, cleanup=None, metadata=None, deadline=None, on_success=None, **kwargs):
+        """Queue ``fn(*args, **kwargs)`` and return the new Job
+
+        Args:
+            fn (callable): Blocking function to execute on a worker.
+            cleanup (list, optional): Paths to delete once the job is finished or cancelled.
+            metadata (dict, optional): Extra fields reported alongside the job status.
+            deadline (RequestDeadline, optional): Bound while ``fn`` runs, so the
+                work can be cancelled or timed out. Defaults to no time limit.
+            on_success (callable, optional): Called with the Job once it succeeded.
+                It runs in this process whichever executor ran ``fn``.
+
+        Raises:
+            QueueFullError: If every worker is busy and the wait queue is full.
+        """
+        with self._lock:
+            self._prune()
+            if self._in_flight() >= self.workers + self.max_queued:
+                raise QueueFullError(
+                    f"Analysis queue is full ({self.max_queued} waiting, {self.workers} running)"
+                )
+
+            job = Job(str(uuid.uuid4()), metadata)
+            job.cleanup = list(cleanup or [])
+            job.deadline = deadline or RequestDeadline()
+            job.on_success = on_success
+            self._jobs[job.id] = job
+
+        try:
+            if self.executor_kind == "process":
+                # Only the time limit reaches a process worker, not later cancellation
+                future = self._executor.submit(run_with_deadline, job.deadline, fn, *args, **kwargs)
+            else:
+                future = self._executor.submit(self._run, job, fn, args, kwargs)
+        except Exception:
+            # Give the reserved slot back
+            with self._lock:
+                del self._jobs[job.id]
+            raise
+        with self._lock:
+            job.future = future
+        future.add_done_callback(lambda future, job=job: self._finish(job, future))
+
+        logger.info(f"Queued job {job.id}")
+        return job
+
+    def warm_up(self, fn):
+        """Run ``fn`` on the pool outside the job queue and return its future
+
+        With the process executor this also starts the worker processes,
+        which otherwise only start with the first job.
+        """
+        return self._executor.submit(fn)
+
+    def _mark_running(self, job):
+        with self._lock:
+            if job.status == QUEUED:
+                job.status = RUNNING
+                job.started_at = time.time()
+                record_stage("job_queue_wait", job.started_at - job.created_at)
+
+    def _run(self, job, fn, args, kwargs):
+        if job.status == CANCELLED:
+            return None
+        if job.deadline.remaining() == 0 and job.deadline.cancel(DEADLINE):
+            CANCELLATIONS.inc(reason=DEADLINE, state=QUEUED)
+        self._mark_running(job)
+        logger.info(f"Starting job {job.id}")
+        return run_with_deadline(job.deadline, fn, *args, **kwargs)
+
+    def _finish(self, job, future):
+        with self._lock:
+            self._settle(job, future)
+            job.finished_at = time.time()
+
+        deadline = job.deadline
+        if deadline.cancelled_at and deadline.reason != DEADLINE and job.started_at and not future.cancelled():
+            CANCELLATION_RELEASE.observe(job.finished_at - deadline.cancelled_at)
+            remaining = deadline.remaining()
+            if remaining:
+                RECLAIMED_SECONDS.inc(remaining)
+        logger.info(f"Job {job.id} finished with status {job.status}")
+        if job.status == SUCCEEDED and job.on_success is not None:
+            try:
+                job.on_success(job)
+            except Exception as e:
+                logger.warning(f"Job {job.id} success callback failed: {str(e)}")
+        self._cleanup(job)
+
+    def _cleanup(self, job):
+        for path in job.cleanup:
+            if os.path.exists(path):
+                try:
+                    os.remove(path)
+                    logger.info(f"Cleaned up temporary file: {path}")
+                except OSError as e:
+                    logger.warning(f"Failed to cleanup file {path}: {str(e)}")
+
+    def get(self, job_id):
+        """Return the Job for ``job_id`` or None if unknown or expired"""
+        with self._lock:
+            self._prune()
+            job = self._jobs.get(job_id)
+            if job is not None:
+                self._refresh(job)
+            return job
+
+    def _settle(self, job, future):
+        """Set the final status of ``job`` from its future; called with the lock held
+
+        A job cancelled while running stays cancelled whatever the worker did
+        afterwards, e.g. fail on its deleted upload or on its cancelled deadline.
+        """
+        if job.status == CANCELLED:
+            return
+        if future.cancelled():
+            job.status = CANCELLED
+            return
+        try:
+            result = future.result()
+        except CancelledError:
+            job.status = CANCELLED
+            return
+        except DeadlineExceededError as e:
+            logger.info(f"Job {job.id} stopped: {str(e)}")
+            job.error = str(e)
+            job.status = FAILED
+            return
+        except AnalysisCancelledError:
+            job.status = CANCELLED
+            return
+        except Exception as e:
+            logger.error(f"Job {job.id} failed: {str(e)}")
+            job.error = str(e)
+            job.status = FAILED
+            return
+        job.result = result
+        job.status = SUCCEEDED
+
+    def cancel(self, job_id, reason=CANCEL_REQUESTED):
+        """Cancel a job
+
+        Queued jobs are removed before they start. A running job is marked
+        cancelled and its deadline is cancelled, so the work stops at its next
+        page, LLM call or search; its files are deleted right away and its
+        result, if any, is discarded when the worker returns.
+
+        Args:
+            reason (str, optional): Why, for the cancellation metrics.
+
+        Returns:
+            Job: The job after cancellation, or None if unknown.
+        """
+        job = self.get(job_id)
+        if job is None:
+            return None
+
+        with self._lock:
+            if job.status in FINISHED_STATES:
+                return job
+
+        # Future.cancel invokes the done callback synchronously, so it must
+        # be called without holding the lock.
+        if job.future is not None and job.future.cancel():
+            CANCELLATIONS.inc(reason=reason, state=QUEUED)
+            return job
+
+        with self._lock:
+            if job.status not in FINISHED_STATES:
+                job.status = CANCELLED
+                job.finished_at = time.time()
+        if job.deadline.cancel(reason):
+            CANCELLATIONS.inc(reason=reason, state=RUNNING)
+        logger.info(f"Cancellation requested for running job {job.id} ({reason})")
+        # The worker only reads the upload through open handles or fails its next read
+        self._cleanup(job)
+        return job
+
+    def stats(self):
+        """Counts of jobs per state together with the configured limits"""
+        with self._lock:
+            for job in self._jobs.values():
+                self._refresh(job)
+            counts = {status: self._count(status) for status in (QUEUED, RUNNING) + FINISHED_STATES}
+        return {"workers": self.workers, "max_queued": self.max_queued, **counts}
+
+    def shutdown(self, wait=False):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
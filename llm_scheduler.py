@@ -0,0 +1,270 @@
+## Process-wide scheduling of LLM calls under one shared rate limit
+import time
+import threading
+import logging
+import contextvars
+from contextlib import contextmanager
+from collections import OrderedDict, deque
+
+import config
+import deadlines
+from tokens import estimate_tokens
+from metrics import (LLM_SECONDS, LLM_CALLS, LLM_PROMPT_TOKENS, LLM_COMPLETION_TOKENS, LLM_QUEUE_WAIT,
+                     add_to_breakdown)
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+
+# Served strictly in this order: batch calls only go out when no interactive call waits
+PRIORITIES = (INTERACTIVE, BATCH)
+
+WAIT_SAMPLES = 1000
+# How often a call waiting for budget checks whether its request was cancelled
+CANCEL_POLL_SECONDS = 0.5
+
+_current_priority = contextvars.ContextVar("llm_priority", default=INTERACTIVE)
+_current_flow = contextvars.ContextVar("llm_flow", default=None)
+
+
+class TokenBucket:
+    """Budget that refills continuously up to ``capacity`` over one minute"""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def seconds_until(self, amount):
+        """Time until ``amount`` is available; amounts above capacity only need a full bucket"""
+        needed = min(amount, self.capacity) - self.level
+        return max(0.0, needed / self.rate)
+
+
+class _Waiter:
+    __slots__ = ("priority", "flow", "tokens", "enqueued", "granted")
+
+    def __init__(self, priority, flow, tokens):
+        self.priority = priority
+        self.flow = flow
+        self.tokens = tokens
+        self.enqueued = time.monotonic()
+        self.granted = False
+
+
+class LLMScheduler:
+    """Admits LLM calls against shared requests- and tokens-per-minute budgets
+
+    Waiting calls are queued per priority class and, within a class, per flow
+    (one analysis request), and flows are served round-robin so one large
+    request cannot hold back the others. Batch calls also leave
+    ``interactive_reserve`` of both budgets untouched, so an interactive call
+    arriving at a busy moment finds capacity instead of waiting for a refill.
+
+    Args:
+        rpm (int): Requests per minute allowed by the provider.
+        tpm (int): Tokens per minute allowed by the provider.
+        interactive_reserve (float, optional): Share of each budget batch calls may not use.
+    """
+
+    def __init__(self, rpm, tpm, interactive_reserve=0.2):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.interactive_reserve = interactive_reserve
+        self._queues = {priority: OrderedDict() for priority in PRIORITIES}
+        self._condition = threading.Condition()
+        self._waits = {priority: deque(maxlen=WAIT_SAMPLES) for priority in PRIORITIES}
+        self._granted = {priority: 0 for priority in PRIORITIES}
+        self._wait_total = {priority: 0.0 for priority in PRIORITIES}
+
+    def _next_waiter(self):
+        for priority in PRIORITIES:
+            flows = self._queues[priority]
+            if flows:
+                return next(iter(flows.values()))[0]
+        return None
+
+    def _floor(self, bucket, priority):
+        return bucket.capacity * self.interactive_reserve if priority == BATCH else 0.0
+
+    def _grant(self):
+        """Admit queued calls in order while the budgets allow; returns seconds to the next try"""
+        now = time.monotonic()
+        self.requests.refill(now)
+        self.tokens.refill(now)
+        while True:
+            waiter = self._next_waiter()
+            if waiter is None:
+                return None
+            request_floor = self._floor(self.requests, waiter.priority)
+            token_floor = self._floor(self.tokens, waiter.priority)
+            delay = max(
+                self.requests.seconds_until(1 + request_floor),
+                self.tokens.seconds_until(waiter.tokens + token_floor),
+            )
+            if delay > 0:
+                return delay
+
+            self.requests.level -= 1
+            self.tokens.level -= waiter.tokens
+            waiter.granted = True
+            self._condition.notify_all()
+
+            # Round-robin: the flow goes to the back of its class once served
+            flows = self._queues[waiter.priority]
+            queue = flows.pop(waiter.flow)
+            queue.popleft()
+            if queue:
+                flows[waiter.flow] = queue
+
+            waited = now - waiter.enqueued
+            self._waits[waiter.priority].append(waited)
+            self._granted[waiter.priority] += 1
+            self._wait_total[waiter.priority] += waited
+
+    def acquire(self, tokens, priority=None, flow=None):
+        """Block until one call estimated at ``tokens`` tokens may be sent
+
+        Priority and flow default to the ones bound with ``request_context``.
+        A waiting call whose request is cancelled or runs out of time leaves
+        the queue within ``CANCEL_POLL_SECONDS``.
+
+        Returns:
+            float: Seconds spent waiting in the queue.
+
+        Raises:
+            AnalysisCancelledError: If the request bound with ``deadlines`` stopped while waiting.
+        """
+        priority = priority or _current_priority.get()
+        flow = flow or _current_flow.get() or threading.get_ident()
+        waiter = _Waiter(priority, flow, tokens)
+        with self._condition:
+            self._queues[priority].setdefault(flow, deque()).append(waiter)
+            while True:
+                delay = self._grant()
+                if waiter.granted:
+                    break
+                try:
+                    deadlines.check("llm")
+                except deadlines.AnalysisCancelledError:
+                    self._withdraw(waiter)
+                    raise
+                self._condition.wait(timeout=min(delay or CANCEL_POLL_SECONDS, CANCEL_POLL_SECONDS))
+        return time.monotonic() - waiter.enqueued
+
+    def _withdraw(self, waiter):
+        """Remove a call that gave up waiting from its queue"""
+        flows = self._queues[waiter.priority]
+        queue = flows.get(waiter.flow)
+        if queue is not None:
+            queue.remove(waiter)
+            if not queue:
+                del flows[waiter.flow]
+        self._condition.notify_all()
+
+    def settle(self, estimated, actual):
+        """Correct the token budget once a call's real size is known"""
+        with self._condition:
+            self.tokens.level = min(self.tokens.capacity, self.tokens.level + estimated - actual)
+            self._condition.notify_all()
+
+    def stats(self):
+        """Budget levels, queue depth and queue wait statistics per priority class"""
+        with self._condition:
+            now = time.monotonic()
+            self.requests.refill(now)
+            self.tokens.refill(now)
+            classes = {}
+            for priority in PRIORITIES:
+                waits = sorted(self._waits[priority])
+                granted = self._granted[priority]
+                classes[priority] = {
+                    "waiting": sum(len(queue) for queue in self._queues[priority].values()),
+                    "granted": granted,
+                    "wait_seconds_total": round(self._wait_total[priority], 3),
+                    "wait_seconds_avg": round(self._wait_total[priority] / granted, 3) if granted else 0.0,
+                    "wait_seconds_p50": round(waits[len(waits) // 2], 3) if waits else 0.0,
+                    "wait_seconds_p95": round(waits[int(len(waits) * 0.95)], 3) if waits else 0.0,
+                    "wait_seconds_max": round(waits[-1], 3) if waits else 0.0,
+                }
+            return {
+                "requests_per_minute": self.requests.capacity,
+                "tokens_per_minute": self.tokens.capacity,
+                "requests_available": round(self.requests.level, 1),
+                "tokens_available": round(self.tokens.level),
+                "interactive_reserve": self.interactive_reserve,
+                "classes": classes,
+            }
+
+
+scheduler = LLMScheduler(
+    rpm=config.LLM_REQUESTS_PER_MINUTE,
+    tpm=config.LLM_TOKENS_PER_MINUTE,
+    interactive_reserve=config.LLM_INTERACTIVE_RESERVE / 100,
+)
+
+
+@contextmanager
+def request_context(priority=INTERACTIVE, flow=None):
+    """Bind the priority class and fairness flow for LLM calls made in this context"""
+    if priority not in PRIORITIES:
+        raise ValueError(f"Unknown LLM priority: {priority}")
+    priority_token = _current_priority.set(priority)
+    flow_token = _current_flow.set(flow)
+    try:
+        yield
+    finally:
+        _current_flow.reset(flow_token)
+        _current_priority.reset(priority_token)
+
+
+def _message_text(messages):
+    if isinstance(messages, str):
+        return messages
+    return "\n".join(str(message.get("content") or "") for message in messages)
+
+
+def scheduled_call(model, messages, call):
+    """Make one LLM call once the process-wide scheduler admits it
+
+    The call is charged its prompt tokens plus ``LLM_EXPECTED_OUTPUT_TOKENS``
+    up front and settled against the real response size afterwards. No call
+    is made once the request it belongs to is cancelled or out of time.
+
+    Args:
+        model (str): Model name, used as the metrics label.
+        messages (str | list): The prompt, as text or chat messages.
+        call (callable): Performs the request and returns the response.
+    """
+    deadlines.check("llm")
+    prompt_tokens = estimate_tokens(_message_text(messages))
+    estimated = prompt_tokens + config.LLM_EXPECTED_OUTPUT_TOKENS
+    waited = scheduler.acquire(estimated)
+    LLM_QUEUE_WAIT.observe(waited, priority=_current_priority.get())
+    add_to_breakdown("llm_queue_wait", waited)
+    if waited > 1:
+        logger.info(f"LLM call waited {waited:.1f}s for rate limit budget")
+
+    response = None
+    outcome = "error"
+    start = time.perf_counter()
+    try:
+        response = call()
+        outcome = "ok"
+        return response
+    finally:
+        seconds = time.perf_counter() - start
+        completion_tokens = estimate_tokens(response) if isinstance(response, str) else 0
+        if isinstance(response, str):
+            scheduler.settle(estimated, prompt_tokens + completion_tokens)
+        LLM_SECONDS.observe(seconds, model=model)
+        LLM_CALLS.inc(model=model, outcome=outcome)
+        LLM_PROMPT_TOKENS.inc(prompt_tokens, model=model)
+        LLM_COMPLETION_TOKENS.inc(completion_tokens, model=model)
+        add_to_breakdown("llm_call", seconds, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
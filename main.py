@@ -1,23 +1,118 @@
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException
+from fastapi import FastAPI, APIRouter, File, UploadFile, Form, HTTPException, Request
 import os
 import uuid
 import asyncio
+from typing import List
 import logging
-from fastapi.responses import JSONResponse
+from contextlib import asynccontextmanager
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
 
-from crewai import Crew, Process
-from agents import financial_analyst,llm
-from task import analyze_financial_document as analyze_task
-
-app = FastAPI(title="Financial Document Analyzer")
+import config
+from jobs import JobManager, QueueFullError
+from extraction import (shutdown_pool, count_pages, warm_extraction_cache, extraction_cache, page_fingerprints,
+                        page_cache, is_large_document, spill_path)
+from uploads import save_upload, extract_zip_pdfs, UploadTooLargeError, InvalidPdfError
+from batches import BatchManager, BatchDocument, deduplicate
+from cache import ResponseCache, definition_fingerprint, document_digest
+from progress import ProgressChannel, run_with_channel, register_crewai_listeners
+import progress
+import deadlines
+from deadlines import request_deadline, CLIENT_DISCONNECT
+from retrieval import index_cache
+from revisions import revision_index
+from preflight import classify_document, rejection_detail, UnreadableDocumentError
+from tables import table_store
+from search_cache import search_cache
+from summarize import summarize_document, digest_cache
+from tokens import estimate_tokens
+from metrics import TimingBreakdown, GaugeCallback, REGISTRY, breakdown_context, timed
+import metrics
+from llm_scheduler import scheduler as llm_scheduler, request_context as llm_request_context, INTERACTIVE, BATCH
+from runtime import CrewRuntime
 
 # Fix: Added proper logging configuration
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def run_crew(query: str, file_path: str="data/sample.pdf"):
-    """To run the whole crew"""
+## crewai, the agents and their tasks load on first use or from the startup warm-up
+# so the server answers health checks within a second of starting
+crew_runtime = CrewRuntime(
+    ["agents", "task", "pipeline"],
+    # Forward agent, tool and token events to streaming clients and /metrics
+    on_load=[register_crewai_listeners, metrics.register_crewai_listeners],
+)
+
+def _warm_worker():
+    """Load the crew runtime in a worker process"""
+    try:
+        crew_runtime.load()
+    except Exception:
+        # Already logged; the worker's first analysis retries the load
+        pass
+    return crew_runtime.status()
+
+## Worker pool that runs crew analyses off the event loop
+job_manager = JobManager(
+    workers=config.JOB_WORKERS,
+    max_queued=config.JOB_QUEUE_SIZE,
+    executor=config.JOB_EXECUTOR,
+    result_ttl=config.JOB_RESULT_TTL,
+    initializer=_warm_worker if config.CREW_WARMUP else None,
+)
+
+## Batches feed their documents into the same job queue
+batch_manager = BatchManager(
+    job_manager,
+    max_in_flight=config.BATCH_MAX_IN_FLIGHT,
+    result_ttl=config.JOB_RESULT_TTL,
+)
+
+## Cache of finished analyses for repeated (document, query) pairs
+_here = os.path.dirname(os.path.abspath(__file__))
+response_cache = ResponseCache(
+    max_bytes=config.RESPONSE_CACHE_MAX_BYTES,
+    ttl=config.RESPONSE_CACHE_TTL,
+    fingerprint=definition_fingerprint([
+        os.path.join(_here, "agents.py"),
+        os.path.join(_here, "task.py"),
+        os.path.join(_here, "pipeline.py"),
+    ]),
+    model=config.LLM_MODEL,
+)
+
+@asynccontextmanager
+async def lifespan(app):
+    if app.state.warmup:
+        if config.JOB_EXECUTOR == "process":
+            # Workers load the crew themselves as they start
+            app.state.worker_warmup = job_manager.warm_up(_warm_worker)
+        else:
+            crew_runtime.start()
+    yield
+    batch_manager.shutdown()
+    job_manager.shutdown()
+    shutdown_pool()
+
+router = APIRouter()
+
+ANALYSIS_MODES = ("standard", "full", "hierarchical")
+
+def run_crew(query: str, file_path: str="data/sample.pdf", digest: str=None):
+    """To run the whole crew
 
+    With a ``digest`` of the document the analyst works from it instead of
+    reading the full text.
+    """
+
+
+    from agents import financial_analyst
+    from task import analyze_financial_document, analyze_financial_digest
+    from pipeline import new_crew
+    
+    analyze_task = analyze_financial_document if digest is None else analyze_financial_digest
+    inputs = {'query': query, 'path': file_path}
+    if digest is not None:
+        inputs['digest'] = digest
 
     try:
         # Fix: Added file existence validation
@@ -25,18 +120,13 @@ def run_crew(query: str, file_path: str="data/sample.pdf"):
             logger.error(f"File not found: {file_path}")
             return f"Error: File not found at {file_path}"
         
-        # Fix: Create crew with proper configuration
-        financial_crew = Crew(
-            agents=[financial_analyst],
-            tasks=[analyze_task],
-            process=Process.sequential,
-            verbose=True,  # Fix: Added verbose logging
-            memory=False,   # Fix: Enable crew memory
-            llm=llm,
-        )
+        # Each run gets its own copies of the agent and task, so concurrent
+        # jobs cannot pick up each other's query, path or digest
+        financial_crew = new_crew(financial_analyst, analyze_task)
         
         # Fix: Execute crew with proper input format
-        result = financial_crew.kickoff({'query': query, 'path': file_path})
+        with timed("crew_kickoff"):
+            result = financial_crew.kickoff(inputs)
         
         return str(result)
 
@@ -44,81 +134,738 @@ def run_crew(query: str, file_path: str="data/sample.pdf"):
         logger.error(f"Error running crew analysis: {str(e)}")
         return f"Error in analysis: {str(e)}"
 
-@app.get("/")
+def _complete(prompt: str):
+    """Send a single prompt to the agents' LLM, through the shared scheduler"""
+    from agents import llm
+    return str(llm.call([{"role": "user", "content": prompt}]))
+
+def _needs_digest(file_path: str):
+    """Whether a standard analysis of this document should work from a digest"""
+    from tools import FinancialDocumentTool
+    
+    if is_large_document(file_path):
+        logger.info(f"{file_path} is a large document, analyzing it from a map-reduce digest")
+        return True
+    if not config.HIERARCHICAL_AUTO_TOKENS:
+        return False
+    tokens = estimate_tokens(FinancialDocumentTool.read_data_tool.func(file_path))
+    if tokens > config.HIERARCHICAL_AUTO_TOKENS:
+        logger.info(f"{file_path} has ~{tokens} tokens, analyzing it from a map-reduce digest")
+        return True
+    return False
+
+class AnalysisFailedError(Exception):
+    """Raised when an analysis ran to the end without producing a result"""
+
+def run_analysis(query: str, file_path: str, mode: str="standard",
+                 priority: str=INTERACTIVE, breakdown: TimingBreakdown=None, preflight: dict=None):
+    """Run the analysis for ``mode`` on a worker
+
+    ``standard`` runs the single analyst crew; ``full`` runs the verification,
+    investment, risk and synthesis pipeline; ``hierarchical`` condenses the
+    document by map-reduce first and runs the analyst crew on the digest,
+    which standard mode also does for documents over ``HIERARCHICAL_AUTO_TOKENS``. Every LLM call the analysis makes
+    is scheduled with ``priority`` and shares a fairness flow with the rest of
+    this analysis. Stage timings are collected into ``breakdown`` when given.
+    ``preflight`` is the upload's local classification, which lets a full
+    analysis of a clearly financial document skip LLM verification.
+
+    Raises:
+        AnalysisFailedError: If the crew or pipeline ended in an error, so the
+            job is reported as failed rather than with the error as its result.
+        AnalysisCancelledError: If the request was cancelled or ran out of
+            time, even where crewai turned that into an error result.
+    """
+    crew_runtime.load()
+    breakdown = breakdown or TimingBreakdown()
+    try:
+        with llm_request_context(priority, flow=file_path), breakdown_context(breakdown), timed("analysis"):
+            return _run_analysis(query, file_path, mode, preflight)
+    except Exception:
+        deadlines.check()
+        raise
+    finally:
+        breakdown.finish()
+
+def _run_analysis(query, file_path, mode, preflight=None):
+    from pipeline import run_full_analysis
+    from tools import FinancialDocumentTool
+
+    if progress.active():
+        # Extract up front so a streaming client sees the page count early;
+        # the agents' own reads then hit the extraction cache
+        progress.emit("extraction_started")
+        FinancialDocumentTool.read_data_tool.func(file_path)
+        progress.emit("extraction_done", pages=count_pages(file_path))
+    
+    if mode == "full":
+        result = run_full_analysis(query, file_path, preflight=preflight)
+        succeeded = result["status"] in ("completed", "rejected")
+    else:
+        digest = None
+        if mode == "hierarchical" or _needs_digest(file_path):
+            digest = summarize_document(query, file_path, document_digest(file_path), _complete)
+        result = run_crew(query=query, file_path=file_path, digest=digest)
+        succeeded = not result.startswith("Error")
+    
+    # A cancelled or expired analysis ends in an error that must not be cached
+    deadlines.check()
+    if not succeeded:
+        raise AnalysisFailedError(result["error"] if mode == "full" else result)
+    return result
+
+@router.get("/")
 async def root():
     """Health check endpoint"""
     return {"message": "Financial Document Analyzer API is running"}
 
-@app.post("/analyze")
+@router.get("/health/live")
+async def liveness():
+    """Liveness probe: the process is up and serving requests"""
+    return {"status": "alive"}
+
+@router.get("/health/ready")
+async def readiness(request: Request):
+    """Readiness probe: 503 until crewai and the agents are loaded
+
+    With ``JOB_EXECUTOR=process`` each worker loads its own copy, and the API
+    is ready once the worker pool has started. Without warm-up the crew loads
+    on the first analysis and the API reports ready straight away.
+    """
+    if config.JOB_EXECUTOR == "process":
+        warmup = request.app.state.worker_warmup
+        if warmup is None or warmup.done():
+            return {"status": "ready", "executor": "process"}
+        return JSONResponse(status_code=503, content={"status": "not_ready", "executor": "process"})
+    
+    runtime = crew_runtime.status()
+    if crew_runtime.ready or not request.app.state.warmup:
+        return {"status": "ready", "crew": runtime}
+    return JSONResponse(status_code=503, content={"status": "not_ready", "crew": runtime})
+
+DEFAULT_QUERY = "Analyze this financial document for investment insights"
+
+async def _save_pdf_upload(file: UploadFile, file_path: str, mode: str):
+    """Validate the request and stream the uploaded PDF to ``file_path``
+
+    Uploads over MAX_FILE_SIZE are accepted up to LARGE_DOCUMENT_MAX_SIZE,
+    except in ``full`` mode, and are analyzed from a digest read in constant
+    memory.
+
+    Returns:
+        tuple: ``(file_size, file_sha256)``
+
+    Raises:
+        HTTPException: 400 for a bad mode or non-PDF, 413 when too large, 500 on I/O errors.
+    """
+    if mode not in ANALYSIS_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown analysis mode: {mode}. Use one of {', '.join(ANALYSIS_MODES)}"
+        )
+    
+    # Fix: Validate file type
+    if not file.filename.lower().endswith('.pdf'):
+        raise HTTPException(
+            status_code=400, 
+            detail="Only PDF files are supported"
+        )
+    
+    # Ensure data directory exists
+    os.makedirs(config.DATA_DIR, exist_ok=True)
+    
+    # Stream the upload to disk, enforcing the size limit and PDF header as it arrives
+    max_size = config.MAX_FILE_SIZE if mode == "full" else max(config.MAX_FILE_SIZE, config.LARGE_DOCUMENT_MAX_SIZE)
+    try:
+        file_size, file_sha256 = await save_upload(file, file_path, max_size)
+        logger.info(f"File saved successfully: {file_path}")
+    except UploadTooLargeError:
+        detail = f"File size too large. Maximum {max_size // (1024 * 1024)}MB allowed."
+        if max_size < config.LARGE_DOCUMENT_MAX_SIZE:
+            detail += " Larger documents can be analyzed with mode=standard or mode=hierarchical."
+        raise HTTPException(status_code=413, detail=detail)
+    except InvalidPdfError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except IOError as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to save uploaded file: {str(e)}"
+        )
+    return file_size, file_sha256
+
+async def _record_revision(file_path: str, file_sha256: str, filename: str):
+    """Fingerprint the uploaded PDF's pages and compare it with earlier uploads
+
+    Returns:
+        dict: The change report if the document is a revision of one seen
+        before, otherwise None. Fingerprinting errors are logged, not raised.
+    """
+    try:
+        with timed("fingerprint"):
+            fingerprints = await asyncio.to_thread(page_fingerprints, file_path)
+    except Exception as e:
+        logger.warning(f"Failed to fingerprint pages of {file_path}: {str(e)}")
+        return None
+    return revision_index.record(file_sha256, fingerprints, filename)
+
+async def _preflight(file_path: str):
+    """Classify the uploaded PDF locally, before any LLM sees it
+
+    Returns:
+        dict: The classification, or None when pre-flight is disabled.
+
+    Raises:
+        HTTPException: 400 if the upload cannot be read as a PDF.
+    """
+    if not config.PREFLIGHT_ENABLED:
+        return None
+    try:
+        return await asyncio.to_thread(classify_document, file_path)
+    except UnreadableDocumentError as e:
+        logger.info(f"Pre-flight could not read {file_path}: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _remove_upload(file_path: str):
+    if os.path.exists(file_path):
+        try:
+            os.remove(file_path)
+            logger.info(f"Cleaned up temporary file: {file_path}")
+        except OSError as e:
+            logger.warning(f"Failed to cleanup file {file_path}: {str(e)}")
+            # pass  # Ignore cleanup errors
+
+def _cache_result(query, mode):
+    """Job callback putting a successful analysis into the response cache
+
+    Job callbacks run in the API process, so results computed by process
+    workers land in the cache requests are answered from too.
+    """
+    def put(job):
+        response_cache.put(job.metadata["file_sha256"], query, job.result, mode=mode)
+    return put
+
+def _submit_analysis(fn, *args, query, file_path, mode, use_cache, metadata, **job_kwargs):
+    """Queue an analysis job that owns ``file_path``, mapping a full queue to 429"""
+    try:
+        return job_manager.submit(
+            fn,
+            *args,
+            query=query,
+            file_path=file_path,
+            mode=mode,
+            on_success=_cache_result(query, mode) if use_cache else None,
+            # Large documents leave their extracted pages spilled next to the upload
+            cleanup=[file_path, spill_path(file_path)],
+            metadata=metadata,
+            **job_kwargs,
+        )
+    except QueueFullError as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(config.JOB_RETRY_AFTER)},
+        )
+
+@router.post("/analyze", status_code=202)
 async def analyze_financial_document(
     file: UploadFile = File(...),
-    query: str = Form(default="Analyze this financial document for investment insights")
+    query: str = Form(default=DEFAULT_QUERY),
+    use_cache: bool = Form(default=True),
+    mode: str = Form(default="standard"),
+    timings: bool = Form(default=False),
+    deadline: int = Form(default=0)
 ):
-    """Analyze financial document and provide comprehensive investment recommendations"""
+    """Queue a financial document for analysis and return the job id to poll
+
+    ``mode=full`` runs verification, then investment and risk analysis in
+    parallel, then a synthesis step. A previous analysis of the same document,
+    query and mode is returned straight from the response cache unless
+    ``use_cache`` is false. With ``timings`` the response, and the job status,
+    carry a per-stage timing breakdown of this request. An upload that shares
+    most of its pages with an earlier one carries a ``revision`` report of the
+    changed, added and removed pages; only those pages are extracted again.
+    Uploads are classified locally first and a document that is not financial
+    is answered with 422 without reaching the agents; the others carry their
+    ``preflight`` classification. ``deadline`` bounds the whole request in
+    seconds, capped at ``DEADLINE_SECONDS``; a job that runs out of time fails
+    and makes no further LLM or search calls.
+    """
     
+    request_limit = request_deadline(deadline)
     file_id = str(uuid.uuid4())
-    file_path = f"data/financial_document_{file_id}.pdf"
+    file_path = os.path.join(config.DATA_DIR, f"financial_document_{file_id}.pdf")
+    queued = False
+    breakdown = TimingBreakdown() if timings else None
     
     try:
-        # Fix: Validate file type
-        if not file.filename.lower().endswith('.pdf'):
-            raise HTTPException(
-                status_code=400, 
-                detail="Only PDF files are supported"
-            )
+        with breakdown_context(breakdown):
+            file_size, file_sha256 = await _save_pdf_upload(file, file_path, mode)
         
-        # Fix: Check file size (limit to 10MB)
-        file_content = await file.read()
-        if len(file_content) > 10 * 1024 * 1024:  # 10MB limit
-            raise HTTPException(
-                status_code=413,
-                detail="File size too large. Maximum 10MB allowed."
-            )
+        # Validate query
+        if query=="" or query is None:
+            query = DEFAULT_QUERY
+            
+        
+        use_cache = use_cache and config.RESPONSE_CACHE_ENABLED
+        if use_cache:
+            cached_analysis = response_cache.get(file_sha256, query.strip(), mode=mode)
+            if cached_analysis is not None:
+                logger.info(f"Response cache hit for query: {query}")
+                content = {
+                    "status": "succeeded",
+                    "cached": True,
+                    "mode": mode,
+                    "query": query,
+                    "analysis": cached_analysis,
+                    "file_processed": file.filename,
+                    "file_sha256": file_sha256,
+                }
+                if breakdown is not None:
+                    breakdown.finish()
+                    content["timings"] = breakdown.to_dict()
+                return JSONResponse(status_code=200, content=content)
         
-        # Ensure data directory exists
-        os.makedirs("data", exist_ok=True)
+        with breakdown_context(breakdown):
+            preflight = await _preflight(file_path)
+            if preflight is not None and not preflight["accepted"]:
+                raise HTTPException(status_code=422, detail=rejection_detail(preflight))
+            revision = await _record_revision(file_path, file_sha256, file.filename)
         
-        # Save uploaded file with proper error handling
+        metadata = {
+            "mode": mode,
+            "query": query,
+            "file_processed": file.filename,
+            "file_size": file_size,
+            "file_sha256": file_sha256,
+            "cached": False,
+            "preflight": preflight,
+            "revision": revision,
+            "deadline": request_limit.seconds,
+        }
+        job_kwargs = {"preflight": preflight, "deadline": request_limit}
+        if breakdown is not None:
+            metadata["timings"] = breakdown
+            # Process workers cannot report back into this object, so their
+            # stages are only visible on /metrics
+            if config.JOB_EXECUTOR != "process":
+                job_kwargs["breakdown"] = breakdown
+        
+        logger.info(f"Queueing analysis for query: {query}")
+        # The worker owns the uploaded file from here and removes it when done
+        job = _submit_analysis(
+            run_analysis,
+            query=query.strip(),
+            file_path=file_path,
+            mode=mode,
+            use_cache=use_cache,
+            metadata=metadata,
+            **job_kwargs,
+        )
+        queued = True
+        
+        response = {
+            "status": job.status,
+            "cached": False,
+            "mode": mode,
+            "job_id": job.id,
+            "query": query,
+            "file_processed": file.filename,
+            "file_sha256": file_sha256,
+            "preflight": preflight,
+            "revision": revision,
+            "status_url": f"/jobs/{job.id}",
+        }
+        if breakdown is not None:
+            response["timings"] = breakdown.to_dict()
+        return response
+        
+    except HTTPException:
+        raise
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error processing financial document: {str(e)}")
+    
+    finally:
+        # Clean up uploaded file unless a worker took ownership of it
+        if not queued:
+            _remove_upload(file_path)
+
+# Background tasks of streaming requests, referenced until they finish
+_stream_tasks = set()
+
+async def _stream_analysis(channel, file_path, query, mode, use_cache, request_limit, metadata):
+    """Classify, fingerprint and queue a streamed upload, reporting each step on ``channel``
+
+    The task owns the uploaded file until the job has been queued.
+    """
+    queued = False
+    try:
+        preflight = await _preflight(file_path)
+        if preflight is not None:
+            channel.emit("preflight", **preflight)
+            if not preflight["accepted"]:
+                channel.emit("error", detail=rejection_detail(preflight))
+                return
+        revision = await _record_revision(file_path, metadata["file_sha256"], metadata["file_processed"])
+        if revision is not None:
+            channel.emit("revision", **revision)
+        job = _submit_analysis(
+            run_with_channel,
+            channel,
+            run_analysis,
+            query=query.strip(),
+            file_path=file_path,
+            mode=mode,
+            use_cache=use_cache,
+            metadata={**metadata, "preflight": preflight, "revision": revision},
+            preflight=preflight,
+            deadline=request_limit,
+        )
+        queued = True
+    except HTTPException as e:
+        channel.emit("error", detail=e.detail, status_code=e.status_code)
+        return
+    except Exception as e:
+        logger.error(f"Failed to queue streamed analysis of {file_path}: {str(e)}")
+        channel.emit("error", detail=f"Error processing financial document: {str(e)}")
+        return
+    finally:
+        if not queued:
+            _remove_upload(file_path)
+            channel.close()
+
+    channel.emit("queued", job_id=job.id, status_url=f"/jobs/{job.id}")
+    # Nobody is left to read the result, so stop spending workers and LLM calls on it
+    channel.on_disconnect(lambda: job_manager.cancel(job.id, reason=CLIENT_DISCONNECT))
+
+    def _on_job_done(future):
+        # A job cancelled before it started never reaches run_with_channel
+        if job.status == "cancelled":
+            channel.emit("cancelled", job_id=job.id)
+        channel.close()
+    job.future.add_done_callback(_on_job_done)
+
+@router.post("/analyze/stream")
+async def analyze_financial_document_stream(
+    file: UploadFile = File(...),
+    query: str = Form(default=DEFAULT_QUERY),
+    use_cache: bool = Form(default=True),
+    mode: str = Form(default="standard"),
+    deadline: int = Form(default=0)
+):
+    """Analyze a financial document and stream progress as Server-Sent Events
+
+    Emits ``upload_saved``, ``preflight`` (the local classification; a
+    document that is not financial ends the stream with an ``error`` event),
+    ``revision`` (when the document revises an earlier upload), ``queued``, ``extraction_done`` (with the page count),
+    ``stage``, ``task``, ``agent_step``, ``tool_call`` and ``token`` events as the
+    analysis runs, and ends with a ``result`` (or ``error``/``cancelled``) event.
+    The job is also visible under ``/jobs/{job_id}``. ``deadline`` works as for
+    ``/analyze``, and a client that disconnects cancels its job.
+
+    The response starts as soon as the upload is saved; pre-flight and page
+    fingerprinting run afterwards, so their failures, and a full queue, end
+    the stream with an ``error`` event rather than an HTTP status.
+    """
+    if config.JOB_EXECUTOR == "process":
+        raise HTTPException(
+            status_code=501,
+            detail="Streaming needs in-process workers; set JOB_EXECUTOR=thread"
+        )
+    
+    request_limit = request_deadline(deadline)
+    file_id = str(uuid.uuid4())
+    file_path = os.path.join(config.DATA_DIR, f"financial_document_{file_id}.pdf")
+    queued = False
+    
+    try:
+        file_size, file_sha256 = await _save_pdf_upload(file, file_path, mode)
+        
+        # Validate query
+        if query=="" or query is None:
+            query = DEFAULT_QUERY
+        
+        channel = ProgressChannel(asyncio.get_running_loop())
+        channel.emit("upload_saved", file=file.filename, size=file_size, sha256=file_sha256)
+        
+        use_cache = use_cache and config.RESPONSE_CACHE_ENABLED
+        cached_analysis = response_cache.get(file_sha256, query.strip(), mode=mode) if use_cache else None
+        if cached_analysis is not None:
+            logger.info(f"Response cache hit for query: {query}")
+            channel.emit("result", result=cached_analysis, cached=True)
+            channel.close()
+        else:
+            # Pre-flight and fingerprinting read the whole document, so they run
+            # after the response has started and report back as events
+            task = asyncio.create_task(_stream_analysis(
+                channel, file_path, query, mode, use_cache, request_limit,
+                metadata={
+                    "mode": mode,
+                    "query": query,
+                    "file_processed": file.filename,
+                    "file_size": file_size,
+                    "file_sha256": file_sha256,
+                    "cached": False,
+                    "deadline": request_limit.seconds,
+                },
+            ))
+            _stream_tasks.add(task)
+            task.add_done_callback(_stream_tasks.discard)
+            # A client gone before its job is queued stops the task, which removes the upload
+            channel.on_disconnect(task.cancel)
+            queued = True
+        
+        return StreamingResponse(
+            channel.stream(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+    
+    except HTTPException:
+        raise
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error processing financial document: {str(e)}")
+    
+    finally:
+        if not queued:
+            _remove_upload(file_path)
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Report the status and, once finished, the result of an analysis job"""
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    return job.to_dict()
+
+@router.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """Cancel a queued or running analysis job"""
+    job = job_manager.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    return job.to_dict()
+
+@router.get("/jobs")
+async def job_stats():
+    """Queue depth and worker usage for capacity planning"""
+    return {
+        **job_manager.stats(),
+        "batches": batch_manager.stats(),
+        "llm": llm_scheduler.stats(),
+        "search": search_cache.stats(),
+        "revisions": revision_index.stats(),
+    }
+
+async def _save_batch_upload(file: UploadFile, index: int):
+    """Save one file of a batch upload; zip archives expand to several documents
+
+    Returns:
+        list: BatchDocument entries, with ``error`` set on rejected files.
+    """
+    name = file.filename or f"document_{index}"
+    if name.lower().endswith(".zip"):
+        zip_path = os.path.join(config.DATA_DIR, f"batch_{uuid.uuid4()}.zip")
         try:
-            with open(file_path, "wb") as f:
-                f.write(file_content)
-            logger.info(f"File saved successfully: {file_path}")
-        except IOError as e:
+            await save_upload(file, zip_path, config.BATCH_MAX_ZIP_SIZE, require_pdf=False)
+            # Unzipping is blocking file I/O, so keep it off the event loop
+            members = await asyncio.to_thread(
+                extract_zip_pdfs, zip_path, config.DATA_DIR, config.MAX_FILE_SIZE, config.BATCH_MAX_DOCUMENTS
+            )
+        except UploadTooLargeError:
             raise HTTPException(
-                status_code=500,
-                detail=f"Failed to save uploaded file: {str(e)}"
+                status_code=413,
+                detail=f"Archive {name} is too large. Maximum {config.BATCH_MAX_ZIP_SIZE // (1024 * 1024)}MB allowed."
             )
+        except InvalidPdfError as e:
+            raise HTTPException(status_code=400, detail=f"{name}: {str(e)}")
+        finally:
+            if os.path.exists(zip_path):
+                os.remove(zip_path)
+        return [
+            BatchDocument(0, f"{name}/{member['filename']}", member.get("path"), member.get("size"),
+                          member.get("sha256"), member.get("error"))
+            for member in members
+        ]
+
+    if not name.lower().endswith(".pdf"):
+        return [BatchDocument(0, name, error="Only PDF and zip files are supported")]
+
+    file_path = os.path.join(config.DATA_DIR, f"financial_document_{uuid.uuid4()}.pdf")
+    try:
+        file_size, file_sha256 = await save_upload(file, file_path, config.MAX_FILE_SIZE)
+    except UploadTooLargeError:
+        return [BatchDocument(0, name, error=f"File size too large. Maximum {config.MAX_FILE_SIZE // (1024 * 1024)}MB allowed.")]
+    except InvalidPdfError as e:
+        return [BatchDocument(0, name, error=str(e))]
+    return [BatchDocument(0, name, file_path, file_size, file_sha256)]
+
+@router.post("/batches", status_code=202)
+async def create_batch(
+    files: List[UploadFile] = File(...),
+    query: str = Form(default=DEFAULT_QUERY),
+    use_cache: bool = Form(default=True),
+    mode: str = Form(default="standard")
+):
+    """Analyze many PDFs (or zip archives of PDFs) with one query
+
+    Identical documents are analyzed once, all documents are extracted in
+    parallel up front, and the analyses share the job queue's workers.
+    Documents the local pre-flight check finds are not financial are
+    rejected without being analyzed. Returns a manifest to poll at ``/batches/{batch_id}``.
+    """
+    if mode not in ANALYSIS_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown analysis mode: {mode}. Use one of {', '.join(ANALYSIS_MODES)}"
+        )
+    if query=="" or query is None:
+        query = DEFAULT_QUERY
+    query = query.strip()
+    use_cache = use_cache and config.RESPONSE_CACHE_ENABLED
+    
+    os.makedirs(config.DATA_DIR, exist_ok=True)
+    documents = []
+    dispatched = False
+    
+    try:
+        for file in files:
+            documents.extend(await _save_batch_upload(file, len(documents)))
+            if len(documents) > config.BATCH_MAX_DOCUMENTS:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"Too many documents. Maximum {config.BATCH_MAX_DOCUMENTS} per batch."
+                )
+        if not any(document.error is None for document in documents):
+            raise HTTPException(status_code=400, detail="The batch contains no valid PDF files")
         
-        # Validate query
-        if query=="" or query is None:
-            query = "Analyze this financial document for investment insights"
-            
+        for index, document in enumerate(documents):
+            document.index = index
+        for path in deduplicate(documents):
+            os.remove(path)
+        
+        if use_cache:
+            for document in documents:
+                if document.error is None and document.duplicate_of is None:
+                    document.cached_result = response_cache.get(document.sha256, query, mode=mode)
+                    if document.cached_result is not None:
+                        os.remove(document.path)
+                        document.path = None
+        
+        # Unreadable and non-financial documents are rejected here instead of reaching the agents
+        pending = [document for document in documents if document.path]
+        classifications = await asyncio.gather(*(_preflight(document.path) for document in pending),
+                                               return_exceptions=True)
+        for document, preflight in zip(pending, classifications):
+            if isinstance(preflight, BaseException) and not isinstance(preflight, HTTPException):
+                raise preflight
+            if isinstance(preflight, HTTPException) or (preflight is not None and not preflight["accepted"]):
+                document.error = preflight.detail if isinstance(preflight, HTTPException) else rejection_detail(preflight)
+                _remove_upload(document.path)
+                document.path = None
+            else:
+                # Lets a full analysis of a clearly financial document skip LLM verification
+                document.preflight = preflight
         
-        logger.info(f"Starting analysis for query: {query}")
-        # Process the financial document with all analysts
-        response = run_crew(query=query.strip(), file_path=file_path)
+        batch = batch_manager.create(
+            query,
+            mode,
+            documents,
+            run_analysis,
+            prepare=warm_extraction_cache,
+            on_success=_cache_result(query, mode) if use_cache else None,
+            priority=BATCH,
+        )
+        dispatched = True
         
         return {
-            "status": "success",
-            "query": query,
-            "analysis": str(response),
-            "file_processed": file.filename
+            **batch.to_dict(),
+            "status_url": f"/batches/{batch.id}",
         }
-        
+    
+    except HTTPException:
+        raise
+    
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error processing financial document: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error processing batch: {str(e)}")
     
     finally:
-        # Clean up uploaded file
-        if os.path.exists(file_path):
-            try:
-                os.remove(file_path)
-                logger.info(f"Cleaned up temporary file: {file_path}")
-            except OSError as e:
-                logger.warning(f"Failed to cleanup file {file_path}: {str(e)}")
-                # pass  # Ignore cleanup errors
-
-@app.exception_handler(Exception)
+        # Until the dispatcher takes over, the saved files belong to this request
+        if not dispatched:
+            for document in documents:
+                if document.path:
+                    _remove_upload(document.path)
+
+@router.get("/batches/{batch_id}")
+async def get_batch(batch_id: str):
+    """Per-document status and results of a batch"""
+    batch = batch_manager.get(batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail=f"Batch not found: {batch_id}")
+    return batch.to_dict()
+
+@router.delete("/batches/{batch_id}")
+async def cancel_batch(batch_id: str):
+    """Stop a batch: undispatched documents are dropped and its queued jobs cancelled"""
+    batch = batch_manager.cancel(batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail=f"Batch not found: {batch_id}")
+    return batch.to_dict()
+
+## Gauges read from the queue, caches and scheduler when /metrics is scraped
+def _job_states():
+    stats = job_manager.stats()
+    return [((state,), stats[state]) for state in ("queued", "running", "succeeded", "failed", "cancelled")]
+
+def _cache_counts(field):
+    def collect():
+        caches = {
+            "extraction": extraction_cache.memory.stats(),
+            "page": page_cache.stats(),
+            "retrieval_index": index_cache.stats(),
+            "response": response_cache.memory.stats(),
+            "web_search": search_cache.memory.stats(),
+            "chunk_digest": digest_cache.memory.stats(),
+            "tables": table_store.memory.stats(),
+        }
+        return [((name,), stats[field]) for name, stats in caches.items()]
+    return collect
+
+def _disk_evictions():
+    budgets = {
+        "extraction": extraction_cache.disk.budget if extraction_cache.disk is not None else None,
+        "chunk_digest": digest_cache.disk.budget if digest_cache.disk is not None else None,
+        "tables": table_store.budget,
+    }
+    return [((name,), budget.stats()["evictions"]) for name, budget in budgets.items() if budget is not None]
+
+def _llm_waiting():
+    classes = llm_scheduler.stats()["classes"]
+    return [((priority,), stats["waiting"]) for priority, stats in classes.items()]
+
+REGISTRY.register(GaugeCallback("analyzer_jobs", "Analysis jobs by state.", ["state"], _job_states))
+REGISTRY.register(GaugeCallback(
+    "analyzer_cache_hits_total", "Cache hits.", ["cache"], _cache_counts("hits"), kind="counter"))
+REGISTRY.register(GaugeCallback(
+    "analyzer_cache_misses_total", "Cache misses.", ["cache"], _cache_counts("misses"), kind="counter"))
+REGISTRY.register(GaugeCallback(
+    "analyzer_disk_cache_evictions_total", "Files deleted from on-disk caches to stay in their size budget.",
+    ["cache"], _disk_evictions, kind="counter"))
+REGISTRY.register(GaugeCallback(
+    "analyzer_web_search_saved_calls_total", "Web searches answered without a call to the search API.", [],
+    lambda: [((), search_cache.stats()["saved_calls"])], kind="counter"))
+REGISTRY.register(GaugeCallback(
+    "analyzer_web_search_hit_ratio", "Share of web searches answered from the cache or a joined call.", [],
+    lambda: [((), search_cache.stats()["hit_rate"])]))
+REGISTRY.register(GaugeCallback(
+    "analyzer_llm_calls_waiting", "LLM calls waiting for rate limit budget.", ["priority"], _llm_waiting))
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Stage timings, tool and LLM counters and queue gauges in Prometheus text format"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 async def global_exception_handler(request, exc):
     """Global exception handler for unhandled errors"""
     logger.error(f"Unhandled exception: {str(exc)}")
@@ -127,6 +874,22 @@ async def global_exception_handler(request, exc):
         content={"error": "Internal server error", "detail": str(exc)}
     )
 
+def create_app(warmup: bool=config.CREW_WARMUP):
+    """Build the API application
+
+    Creating the app is cheap: crewai and the agents are loaded on a
+    background thread once the server starts when ``warmup`` is set, and by
+    the first analysis otherwise. ``/health/ready`` reports when they are in.
+    """
+    app = FastAPI(title="Financial Document Analyzer", lifespan=lifespan)
+    app.state.warmup = warmup
+    app.state.worker_warmup = None
+    app.include_router(router)
+    app.add_exception_handler(Exception, global_exception_handler)
+    return app
+
+app = create_app()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
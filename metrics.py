@@ -0,0 +1,276 @@
+## Process metrics in Prometheus text format, plus per-request timing breakdowns
+import math
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# Seconds; spans a single page extraction up to a full multi-agent analysis
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+_current_breakdown = contextvars.ContextVar("timing_breakdown", default=None)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """Monotonically increasing total per label set"""
+
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items
+        ]
+
+
+class Histogram(_Metric):
+    """Cumulative bucket counts, sum and count of observations per label set"""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def render(self):
+        with self._lock:
+            items = sorted((key, (list(state[0]), state[1], state[2])) for key, state in self._values.items())
+        lines = self.header()
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class GaugeCallback(_Metric):
+    """Values read from a callback at scrape time
+
+    Args:
+        callback (callable): Returns a list of ``(label_values, value)`` pairs.
+        kind (str, optional): ``gauge``, or ``counter`` for totals kept elsewhere.
+    """
+
+    def __init__(self, name, documentation, labelnames, callback, kind="gauge"):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+        self.kind = kind
+
+    def render(self):
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(value)}"
+            for values, value in self.callback()
+        ]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """All registered metrics in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "analyzer_stage_seconds", "Time spent in each stage of an analysis request.", ["stage"]))
+UPLOAD_BYTES = REGISTRY.register(Counter(
+    "analyzer_upload_bytes_total", "Bytes of uploaded documents written to disk."))
+PAGES_EXTRACTED = REGISTRY.register(Counter(
+    "analyzer_pages_extracted_total", "PDF pages run through text extraction."))
+EXTRACTIONS = REGISTRY.register(Counter(
+    "analyzer_extractions_total", "Document reads by the extraction tool.", ["cache"]))
+TOOL_SECONDS = REGISTRY.register(Histogram(
+    "analyzer_tool_seconds", "Duration of agent tool invocations.", ["tool"]))
+TOOL_CALLS = REGISTRY.register(Counter(
+    "analyzer_tool_calls_total", "Agent tool invocations.", ["tool", "outcome"]))
+LLM_SECONDS = REGISTRY.register(Histogram(
+    "analyzer_llm_call_seconds", "Duration of LLM calls, excluding rate limit waits.", ["model"]))
+LLM_CALLS = REGISTRY.register(Counter(
+    "analyzer_llm_calls_total", "LLM calls by outcome.", ["model", "outcome"]))
+LLM_PROMPT_TOKENS = REGISTRY.register(Counter(
+    "analyzer_llm_prompt_tokens_total", "Estimated prompt tokens sent to the LLM.", ["model"]))
+LLM_COMPLETION_TOKENS = REGISTRY.register(Counter(
+    "analyzer_llm_completion_tokens_total", "Estimated completion tokens received from the LLM.", ["model"]))
+LLM_QUEUE_WAIT = REGISTRY.register(Histogram(
+    "analyzer_llm_queue_wait_seconds", "Time LLM calls waited for rate limit budget.", ["priority"]))
+CHUNK_DIGESTS = REGISTRY.register(Counter(
+    "analyzer_chunk_digests_total", "Document chunk digests used by hierarchical analyses.", ["cache"]))
+TABLE_READS = REGISTRY.register(Counter(
+    "analyzer_table_reads_total", "Statement table lookups by whether the document's tables were stored.",
+    ["cache"]))
+PREFLIGHT_DOCUMENTS = REGISTRY.register(Counter(
+    "analyzer_preflight_documents_total", "Uploads classified before analysis, by type and decision.",
+    ["type", "decision"]))
+COMPACTION_CHARS = REGISTRY.register(Counter(
+    "analyzer_compaction_chars_total", "Characters of document text before (raw) and after (compacted) compaction.",
+    ["text"]))
+CANCELLATIONS = REGISTRY.register(Counter(
+    "analyzer_cancellations_total", "Analyses stopped early, by reason and whether they were queued or running.",
+    ["reason", "state"]))
+CANCELLED_CALLS = REGISTRY.register(Counter(
+    "analyzer_cancelled_calls_total", "LLM calls, searches and page extractions refused after a cancellation.",
+    ["kind"]))
+CANCELLATION_RELEASE = REGISTRY.register(Histogram(
+    "analyzer_cancellation_release_seconds", "Time from cancelling a running analysis until its worker was free."))
+RECLAIMED_SECONDS = REGISTRY.register(Counter(
+    "analyzer_reclaimed_worker_seconds_total",
+    "Request deadline time left when cancelled analyses released their worker, an upper bound on the worker "
+    "time reclaimed."))
+WEB_SEARCHES = REGISTRY.register(Counter(
+    "analyzer_web_searches_total",
+    "Web searches by how they were answered: cache hit, joined an identical in-flight call, "
+    "backend call or error.", ["outcome"]))
+
+
+class TimingBreakdown:
+    """Time and call counts per stage for a single request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.finished = None
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds, **counts):
+        with self._lock:
+            entry = self.stages.setdefault(stage, {"seconds": 0.0, "count": 0})
+            entry["seconds"] += seconds
+            entry["count"] += 1
+            for name, value in counts.items():
+                entry[name] = entry.get(name, 0) + value
+
+    def finish(self):
+        self.finished = time.perf_counter()
+
+    def to_dict(self):
+        with self._lock:
+            stages = {
+                stage: {**entry, "seconds": round(entry["seconds"], 4)} for stage, entry in self.stages.items()
+            }
+        end = self.finished or time.perf_counter()
+        return {"stages": stages, "elapsed": round(end - self.started, 4)}
+
+
+@contextmanager
+def breakdown_context(breakdown):
+    """Collect the stages timed in this context into ``breakdown``"""
+    token = _current_breakdown.set(breakdown)
+    try:
+        yield breakdown
+    finally:
+        _current_breakdown.reset(token)
+
+
+def add_to_breakdown(stage, seconds, **counts):
+    breakdown = _current_breakdown.get()
+    if breakdown is not None:
+        breakdown.add(stage, seconds, **counts)
+
+
+def record_stage(stage, seconds):
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    add_to_breakdown(stage, seconds)
+
+
+@contextmanager
+def timed(stage):
+    """Time the enclosed block as ``stage``"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start)
+
+
+def render():
+    return REGISTRY.render()
+
+
+def register_crewai_listeners():
+    """Record every agent tool invocation from the crewai event bus"""
+    from crewai.events import crewai_event_bus
+    from crewai.events.types.tool_usage_events import ToolUsageFinishedEvent, ToolUsageErrorEvent
+
+    @crewai_event_bus.on(ToolUsageFinishedEvent)
+    def on_tool_finished(source, event):
+        seconds = (event.finished_at - event.started_at).total_seconds()
+        TOOL_SECONDS.observe(seconds, tool=event.tool_name)
+        TOOL_CALLS.inc(tool=event.tool_name, outcome="cached" if event.from_cache else "ok")
+        add_to_breakdown(f"tool:{event.tool_name}", seconds)
+
+    @crewai_event_bus.on(ToolUsageErrorEvent)
+    def on_tool_error(source, event):
+        TOOL_CALLS.inc(tool=event.tool_name, outcome="error")
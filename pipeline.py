@@ -0,0 +1,160 @@
+## Full analysis: verification gate, parallel specialist branches, synthesis
+import re
+import time
+import logging
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+from crewai import Crew, Process
+
+import config
+from agents import financial_analyst, verifier, investment_advisor, risk_assessor, llm
+from task import verification, investment_analysis, risk_assessment, synthesize_report
+from tools import FinancialDocumentTool
+from tables import get_tables
+from cache import document_digest
+from metrics import timed
+import progress
+
+logger = logging.getLogger(__name__)
+
+_VERDICT = re.compile(r"VERDICT:\s*(NOT_FINANCIAL|FINANCIAL)", re.IGNORECASE)
+
+
+def new_crew(agent, task):
+    """Single-task crew running copies of ``agent`` and ``task``
+
+    ``kickoff`` writes the inputs into the task description and agent goal
+    and binds the agent to its crew, so analyses running at the same time
+    must not share these objects; the module-level definitions are only
+    templates, copied the way crewai's ``kickoff_for_each`` does.
+    """
+    agent = agent.copy()
+    return Crew(
+        agents=[agent],
+        tasks=[task.copy([agent], {})],
+        process=Process.sequential,
+        verbose=True,
+        memory=False,
+        llm=llm,
+    )
+
+
+def _kickoff(agent, task, inputs):
+    """Run a single-task crew and return its output text"""
+    crew = new_crew(agent, task)
+    with timed("crew_kickoff"):
+        return str(crew.kickoff(inputs))
+
+
+def is_financial(verification_report):
+    """Read the verdict line of the verification report; a missing verdict does not block"""
+    matches = _VERDICT.findall(verification_report)
+    if not matches:
+        logger.warning("Verification report has no verdict line, continuing with the analysis")
+        return True
+    return matches[-1].upper() == "FINANCIAL"
+
+
+def _preflight_report(preflight):
+    """Verification report standing in for the verifier when pre-flight is confident"""
+    return (f"Local pre-flight classification: {preflight['type']} "
+            f"(financial score {preflight['financial_score']:.2f}, confidence {preflight['confidence']:.2f}). "
+            f"LLM verification was skipped.\nVERDICT: FINANCIAL")
+
+
+def _skips_verification(preflight):
+    threshold = config.PREFLIGHT_SKIP_VERIFICATION_SCORE
+    return bool(threshold and preflight and preflight["financial_score"] * 100 >= threshold)
+
+
+def run_full_analysis(query, file_path, preflight=None):
+    """Run the complete multi-agent analysis of one document
+
+    The document is extracted once up front so every agent's reads are
+    extraction-cache hits. The verification task gates the pipeline, then
+    the investment and risk tasks run concurrently, and a final synthesis
+    task merges their reports. Wall time is extraction + verification +
+    the slower of the two branches + synthesis. A ``preflight``
+    classification scoring at least ``PREFLIGHT_SKIP_VERIFICATION_SCORE``
+    stands in for the verification task.
+
+    Returns:
+        dict: The ``report`` plus each stage's output and ``timings`` in seconds,
+        or ``status: rejected`` with the verification report when the document
+        is not financial.
+    """
+    timings = {}
+    started = time.perf_counter()
+
+    def lap(stage, stage_start):
+        timings[stage] = round(time.perf_counter() - stage_start, 3)
+        progress.emit("stage", stage=stage, state="completed", seconds=timings[stage])
+
+    stage_start = time.perf_counter()
+    extracted = FinancialDocumentTool.read_data_tool.func(file_path)
+    if extracted.startswith("Error"):
+        lap("extraction", stage_start)
+        return {"status": "failed", "error": extracted, "timings": timings}
+    # Statement tables are materialized here too, so the agents' table queries are reads
+    try:
+        get_tables(file_path, document_digest(file_path))
+    except Exception as e:
+        logger.warning(f"Table extraction failed for {file_path}: {str(e)}")
+    lap("extraction", stage_start)
+
+    inputs = {"query": query, "path": file_path}
+
+    stage_start = time.perf_counter()
+    progress.emit("stage", stage="verification", state="started")
+    if _skips_verification(preflight):
+        logger.info(f"Pre-flight classified {file_path} as {preflight['type']}, skipping LLM verification")
+        verification_report = _preflight_report(preflight)
+    else:
+        verification_report = _kickoff(verifier, verification, inputs)
+    lap("verification", stage_start)
+    if not is_financial(verification_report):
+        logger.info(f"Verification rejected {file_path}, skipping analysis branches")
+        timings["total"] = round(time.perf_counter() - started, 3)
+        return {"status": "rejected", "verification": verification_report, "timings": timings}
+
+    # The specialist branches only depend on the verified document
+    stage_start = time.perf_counter()
+    progress.emit("stage", stage="branches", state="started")
+    with ThreadPoolExecutor(max_workers=2, thread_name_prefix="analysis-branch") as branches:
+        # Each branch runs in a copy of this context so its events reach the same stream
+        investment_future = branches.submit(
+            contextvars.copy_context().run, _timed, _kickoff, investment_advisor, investment_analysis, inputs
+        )
+        risk_future = branches.submit(
+            contextvars.copy_context().run, _timed, _kickoff, risk_assessor, risk_assessment, inputs
+        )
+        investment_report, timings["investment"] = investment_future.result()
+        risk_report, timings["risk"] = risk_future.result()
+    lap("branches", stage_start)
+
+    stage_start = time.perf_counter()
+    progress.emit("stage", stage="synthesis", state="started")
+    report = _kickoff(financial_analyst, synthesize_report, {
+        **inputs,
+        "verification_report": verification_report,
+        "investment_report": investment_report,
+        "risk_report": risk_report,
+    })
+    lap("synthesis", stage_start)
+    timings["total"] = round(time.perf_counter() - started, 3)
+
+    return {
+        "status": "completed",
+        "report": report,
+        "verification": verification_report,
+        "investment": investment_report,
+        "risk": risk_report,
+        "timings": timings,
+    }
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, round(time.perf_counter() - start, 3)
@@ -0,0 +1,211 @@
+## Local pre-flight classification of uploads before any LLM call
+import re
+import math
+import logging
+
+import config
+from extraction import LazyPdf
+from metrics import timed, PREFLIGHT_DOCUMENTS
+
+logger = logging.getLogger(__name__)
+
+
+class UnreadableDocumentError(Exception):
+    """Raised when an upload cannot be parsed as a PDF at all"""
+
+DOCUMENT_TYPES = ("10-K", "balance_sheet", "earnings_release", "financial_other", "non_financial", "no_text")
+# Classifications that keep a document from the agents
+REJECTED_TYPES = ("non_financial", "no_text")
+
+# Words that are common in financial reporting and rare elsewhere
+FINANCIAL_TERMS = [
+    "revenue", "revenues", "income", "assets", "liabilities", "equity", "cash", "earnings", "dividend",
+    "dividends", "margin", "ebitda", "operating", "fiscal", "quarter", "quarterly", "gross", "expenses",
+    "debt", "depreciation", "amortization", "capital", "tax", "profit", "loss", "losses", "shareholders",
+    "stockholders", "consolidated", "audit", "auditor", "interest", "inventory", "inventories",
+    "receivable", "receivables", "payable", "payables", "goodwill", "guidance", "outlook", "diluted",
+    "sales", "expenditures", "liquidity", "securities", "impairment", "accrued", "net", "financial",
+    "balance", "statements", "year-over-year", "eps", "segment", "billion", "million", "millions",
+]
+
+_WORD = re.compile(r"[a-z][a-z'\-]+")
+_TERM = re.compile(r"\b(?:" + "|".join(re.escape(term) for term in FINANCIAL_TERMS) + r")\b")
+_NUMBER = re.compile(r"\d[\d,]*(?:\.\d+)?")
+_CURRENCY = re.compile(r"[$€£¥]|\b(?:usd|eur|gbp)\b|\bin (?:thousands|millions|billions)\b")
+# A label followed by at least two amounts: the shape of a statement row
+_ROW = re.compile(r"^\s*[a-z][^\d\n]{2,}?(?:\s+\(?[$€£]?\s?[\d,]+(?:\.\d+)?\)?%?){2,}\s*$", re.MULTILINE)
+_STATEMENT_HEADERS = re.compile(
+    r"\b(?:consolidated )?(?:balance sheets?|statements? of (?:financial position|operations|income|"
+    r"comprehensive income|cash flows|changes in (?:stockholders'|shareholders'|) ?equity)|"
+    r"income statements?|cash flow statements?)\b"
+)
+
+# Phrases that point at one document type; each distinct match adds to its score
+TYPE_CUES = {
+    "10-K": re.compile(
+        r"\b(?:form 10-k|annual report pursuant to section 13|securities and exchange commission|"
+        r"item 1a|item 7a?|risk factors|management's discussion and analysis|fiscal year ended|"
+        r"annual report and accounts|annual report|strategic report|independent auditor's report|principal risks|"
+        r"commission file number|exhibits? and financial statement schedules)\b"
+    ),
+    "balance_sheet": re.compile(
+        r"\b(?:balance sheets?|statements? of financial position|total current assets|"
+        r"total current liabilities|total liabilities and (?:stockholders'|shareholders') equity|"
+        r"total assets|total liabilities|retained earnings|property, plant and equipment)\b"
+    ),
+    "earnings_release": re.compile(
+        r"\b(?:press release|for immediate release|reports? (?:first|second|third|fourth|full)[- ](?:quarter|year)|"
+        r"(?:first|second|third|fourth) quarter (?:results|highlights|revenue)|conference call|webcast|"
+        r"investor relations|earnings per (?:diluted )?share|raises (?:full-year )?guidance|outlook|"
+        r"year-over-year|non-gaap|forward-looking statements)\b"
+    ),
+}
+
+
+def _saturate(value, full):
+    """``value`` scaled so ``full`` or more gives 1"""
+    return min(1.0, value / full) if full else 0.0
+
+
+def text_features(pages):
+    """Cheap statistics of the sampled text that separate financial documents from the rest"""
+    text = "\n".join(pages).lower()[:config.PREFLIGHT_MAX_CHARS]
+    words = len(_WORD.findall(text)) or 1
+    lines = sum(1 for line in text.splitlines() if line.strip()) or 1
+    return {
+        "pages": len(pages),
+        "chars": len(text),
+        "term_density": round(len(_TERM.findall(text)) / words, 4),
+        "number_density": round(len(_NUMBER.findall(text)) / words, 4),
+        "currency_per_1k_words": round(1000 * len(_CURRENCY.findall(text)) / words, 2),
+        "statement_row_share": round(len(_ROW.findall(text)) / lines, 4),
+        "statement_headers": len(set(_STATEMENT_HEADERS.findall(text))),
+        "cues": {name: len(set(pattern.findall(text))) for name, pattern in TYPE_CUES.items()},
+    }
+
+
+def financial_score(features):
+    """Weighted evidence, between 0 and 1, that the text comes from a financial document"""
+    return round(
+        0.35 * _saturate(features["term_density"], 0.06)
+        + 0.25 * _saturate(features["statement_row_share"], 0.2)
+        + 0.15 * _saturate(features["number_density"], 0.3)
+        + 0.1 * _saturate(features["currency_per_1k_words"], 8)
+        + 0.15 * _saturate(features["statement_headers"], 2),
+        4,
+    )
+
+
+def classify_text(pages):
+    """Classify a document from the text of some of its pages
+
+    Args:
+        pages (list): Page texts, usually a sample from ``sample_pages``.
+
+    Returns:
+        dict: ``type`` (one of DOCUMENT_TYPES), ``financial_score`` and
+        ``confidence`` between 0 and 1, per-type ``scores`` and the
+        ``features`` they were computed from.
+    """
+    features = text_features(pages)
+    score = financial_score(features)
+    cues = features["cues"]
+    scores = {
+        "10-K": cues["10-K"] + 0.5 * features["statement_headers"],
+        # Standalone statements are mostly rows with little prose around them, and
+        # a balance sheet next to other statements is more likely part of a report
+        "balance_sheet": cues["balance_sheet"] * (0.5 + features["statement_row_share"] * 2)
+        / max(1, features["statement_headers"]),
+        "earnings_release": cues["earnings_release"],
+    }
+    min_score = config.PREFLIGHT_MIN_SCORE / 100
+    if score < min_score:
+        document_type = "non_financial"
+        confidence = 1 - score / min_score
+    elif max(scores.values()) < 2:
+        document_type, confidence = "financial_other", score
+    else:
+        # Softmax over the type scores
+        document_type = max(scores, key=scores.get)
+        weights = {name: math.exp(value) for name, value in scores.items()}
+        confidence = weights[document_type] / sum(weights.values())
+    return {
+        "type": document_type,
+        "financial_score": score,
+        "confidence": round(confidence, 3),
+        "scores": {name: round(value, 2) for name, value in scores.items()},
+        "features": features,
+    }
+
+
+def sample_pages(path, max_pages=None):
+    """Text of the first pages of a PDF plus a few spread over the rest
+
+    Covers and statements usually come first, so half the sample is the
+    leading pages and the other half is evenly spaced through the document.
+
+    Raises:
+        UnreadableDocumentError: If the file cannot be parsed, has no pages or
+            none of the sampled pages could be read.
+    """
+    max_pages = max_pages or config.PREFLIGHT_SAMPLE_PAGES
+    try:
+        pdf = LazyPdf(path)
+    except Exception as e:
+        raise UnreadableDocumentError(f"The file could not be read as a PDF: {str(e)}") from e
+    with pdf:
+        try:
+            count = pdf.page_count
+        except Exception as e:
+            raise UnreadableDocumentError(f"The file could not be read as a PDF: {str(e)}") from e
+        if not count:
+            raise UnreadableDocumentError("The PDF has no pages")
+        leading = list(range(min(count, (max_pages + 1) // 2)))
+        rest = max_pages - len(leading)
+        spread = [len(leading) + i * (count - len(leading)) // rest for i in range(rest)] if count > len(leading) else []
+        texts = []
+        for page_num in sorted(set(leading + spread)):
+            try:
+                texts.append(pdf.reader.pages[page_num].extract_text() or "")
+            except Exception as e:
+                logger.warning(f"Pre-flight could not read page {page_num} of {path}: {str(e)}")
+    if not texts:
+        raise UnreadableDocumentError("None of the sampled PDF pages could be read")
+    return texts
+
+
+def classify_document(path):
+    """Sample, classify and count one uploaded PDF
+
+    A document whose sampled pages carry no words at all, like a scan
+    without a text layer, is classified as ``no_text`` rather than scored.
+
+    Returns:
+        dict: ``type``, ``financial_score``, ``confidence`` and ``scores`` from
+        ``classify_text``, with ``accepted`` set to whether the document should
+        go on to the agents.
+
+    Raises:
+        UnreadableDocumentError: If the file cannot be parsed as a PDF.
+    """
+    with timed("preflight"):
+        pages = sample_pages(path)
+        result = classify_text(pages)
+    if not any(_WORD.search(page.lower()) for page in pages):
+        result.update(type="no_text", confidence=1.0)
+    result.pop("features")
+    result["accepted"] = result["type"] not in REJECTED_TYPES
+    PREFLIGHT_DOCUMENTS.inc(type=result["type"], decision="accepted" if result["accepted"] else "rejected")
+    logger.info(f"Pre-flight classified {path} as {result['type']} "
+                f"(financial score {result['financial_score']}, confidence {result['confidence']})")
+    return result
+
+
+def rejection_detail(result):
+    """Client-facing reason for turning a document away"""
+    if result["type"] == "no_text":
+        return ("No text could be extracted from the document; it looks like a scan or images "
+                "without a text layer. Upload a PDF with selectable text, or run OCR on it first.")
+    return (f"The document does not look like a financial document (financial score "
+            f"{result['financial_score']:.2f}, minimum {config.PREFLIGHT_MIN_SCORE / 100:.2f}). "
+            f"Upload a 10-K, annual report, balance sheet or earnings release.")
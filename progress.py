@@ -0,0 +1,165 @@
+## Per-request progress events streamed to clients as Server-Sent Events
+import json
+import time
+import asyncio
+import logging
+import contextvars
+
+logger = logging.getLogger(__name__)
+
+KEEPALIVE_SECONDS = 15
+
+_current_channel = contextvars.ContextVar("progress_channel", default=None)
+
+# Marks the end of a channel's event stream
+_CLOSE = object()
+
+
+class ProgressChannel:
+    """Carries events from a worker thread to the request's event loop"""
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.queue = asyncio.Queue()
+        self.started = time.monotonic()
+        self.closed = False
+        self._disconnect_callbacks = []
+
+    def on_disconnect(self, callback):
+        """Call ``callback()`` if the client goes away before the channel is closed"""
+        self._disconnect_callbacks.append(callback)
+
+    def emit(self, event, **data):
+        if self.closed:
+            return
+        data["elapsed"] = round(time.monotonic() - self.started, 3)
+        self._put((event, data))
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self._put(_CLOSE)
+
+    def _put(self, item):
+        # On the loop thread, queue right away so the event lands ahead of any
+        # worker events still waiting in the loop's callback queue
+        try:
+            on_loop = asyncio.get_running_loop() is self.loop
+        except RuntimeError:
+            on_loop = False
+        if on_loop:
+            self.queue.put_nowait(item)
+        else:
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, item)
+
+    async def stream(self):
+        """Yield SSE-formatted events until the channel is closed
+
+        A comment line is sent right away so the client gets its first byte
+        immediately, and again whenever nothing happened for a while so
+        proxies do not time the connection out. When the server stops the
+        stream early because the client disconnected, the ``on_disconnect``
+        callbacks run.
+        """
+        finished = False
+        try:
+            yield ": connected\n\n"
+            while True:
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout=KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if item is _CLOSE:
+                    finished = True
+                    return
+                event, data = item
+                yield f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+        finally:
+            if not finished:
+                logger.info("Stream client disconnected before the analysis finished")
+                for callback in self._disconnect_callbacks:
+                    try:
+                        callback()
+                    except Exception as e:
+                        logger.warning(f"Disconnect callback failed: {str(e)}")
+
+
+def emit(event, **data):
+    """Send an event to the channel bound to the current request, if any"""
+    channel = _current_channel.get()
+    if channel is not None:
+        channel.emit(event, **data)
+
+
+def active():
+    return _current_channel.get() is not None
+
+
+def run_with_channel(channel, fn, *args, **kwargs):
+    """Run ``fn`` with ``channel`` bound, ending the stream with its result or error"""
+    token = _current_channel.set(channel)
+    try:
+        result = fn(*args, **kwargs)
+        channel.emit("result", result=result)
+        return result
+    except Exception as e:
+        channel.emit("error", detail=str(e))
+        raise
+    finally:
+        _current_channel.reset(token)
+        channel.close()
+
+
+def _task_name(task):
+    if task is None:
+        return None
+    return task.name or task.description.strip().splitlines()[0][:80]
+
+
+def register_crewai_listeners():
+    """Forward crewai agent, task, tool and LLM token events to the active channel
+
+    crewai emits events synchronously on the thread doing the work, so the
+    context variable set by ``run_with_channel`` identifies the request.
+    """
+    from crewai.events import crewai_event_bus
+    from crewai.events.types.agent_events import AgentExecutionStartedEvent, AgentExecutionCompletedEvent
+    from crewai.events.types.task_events import TaskStartedEvent, TaskCompletedEvent
+    from crewai.events.types.tool_usage_events import ToolUsageStartedEvent, ToolUsageFinishedEvent
+    from crewai.events.types.llm_events import LLMStreamChunkEvent
+
+    @crewai_event_bus.on(AgentExecutionStartedEvent)
+    def on_agent_started(source, event):
+        emit("agent_step", agent=event.agent.role, state="started")
+
+    @crewai_event_bus.on(AgentExecutionCompletedEvent)
+    def on_agent_completed(source, event):
+        emit("agent_step", agent=event.agent.role, state="completed")
+
+    @crewai_event_bus.on(TaskStartedEvent)
+    def on_task_started(source, event):
+        emit("task", task=_task_name(event.task), state="started")
+
+    @crewai_event_bus.on(TaskCompletedEvent)
+    def on_task_completed(source, event):
+        emit("task", task=_task_name(event.task), state="completed")
+
+    @crewai_event_bus.on(ToolUsageStartedEvent)
+    def on_tool_started(source, event):
+        emit("tool_call", tool=event.tool_name, agent=event.agent_role, state="started")
+
+    @crewai_event_bus.on(ToolUsageFinishedEvent)
+    def on_tool_finished(source, event):
+        emit(
+            "tool_call",
+            tool=event.tool_name,
+            agent=event.agent_role,
+            state="finished",
+            seconds=round((event.finished_at - event.started_at).total_seconds(), 3),
+            from_cache=event.from_cache,
+        )
+
+    @crewai_event_bus.on(LLMStreamChunkEvent)
+    def on_llm_chunk(source, event):
+        emit("token", text=event.chunk)
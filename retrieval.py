@@ -0,0 +1,127 @@
+## Lexical BM25 index over page chunks of a document
+import re
+import math
+import logging
+from collections import Counter
+
+import config
+from cache import LRUCache
+from extraction import iter_pages, clean_page
+from tokens import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:\.[0-9]+)?")
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+
+def tokenize(text):
+    return _TOKEN.findall(text.lower())
+
+
+class Chunk:
+    """A run of lines from one page of a document"""
+
+    __slots__ = ("page", "text", "length", "terms")
+
+    def __init__(self, page, text):
+        self.page = page
+        self.text = text
+        tokens = tokenize(text)
+        self.length = len(tokens)
+        self.terms = Counter(tokens)
+
+
+def chunk_page(page_num, content, max_words):
+    """Split one page into chunks of at most ``max_words`` words on line boundaries"""
+    chunks = []
+    lines = []
+    words = 0
+    for line in content.split("\n"):
+        line_words = len(line.split())
+        if lines and words + line_words > max_words:
+            chunks.append(Chunk(page_num, "\n".join(lines)))
+            lines = []
+            words = 0
+        if line.strip():
+            lines.append(line)
+            words += line_words
+    if lines:
+        chunks.append(Chunk(page_num, "\n".join(lines)))
+    return chunks
+
+
+class BM25Index:
+    """Okapi BM25 ranking over the chunks of a single document"""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.doc_freq = Counter()
+        for chunk in chunks:
+            self.doc_freq.update(chunk.terms.keys())
+        total = sum(chunk.length for chunk in chunks)
+        self.avg_length = total / len(chunks) if chunks else 0.0
+        self.text_bytes = sum(len(chunk.text) for chunk in chunks)
+        self.total_tokens = estimate_tokens("\n".join(chunk.text for chunk in chunks))
+
+    @classmethod
+    def from_pdf(cls, path, max_words=None):
+        max_words = max_words or config.RETRIEVAL_CHUNK_WORDS
+        chunks = []
+        for page_num, content in enumerate(iter_pages(path)):
+            if content.strip():
+                chunks.extend(chunk_page(page_num + 1, clean_page(content), max_words))
+        return cls(chunks)
+
+    def _idf(self, term):
+        n = len(self.chunks)
+        df = self.doc_freq.get(term, 0)
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def search(self, query, top_k=5):
+        """Return the ``top_k`` (score, chunk) pairs for ``query``, best first"""
+        query_terms = set(tokenize(query))
+        if not query_terms or not self.chunks:
+            return []
+
+        idf = {term: self._idf(term) for term in query_terms if term in self.doc_freq}
+        scored = []
+        for chunk in self.chunks:
+            score = 0.0
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * chunk.length / (self.avg_length or 1))
+            for term, weight in idf.items():
+                tf = chunk.terms.get(term)
+                if tf:
+                    score += weight * tf * (BM25_K1 + 1) / (tf + norm)
+            if score > 0:
+                scored.append((score, chunk))
+
+        scored.sort(key=lambda pair: (-pair[0], pair[1].page))
+        return scored[:top_k]
+
+
+## Indexes are built once per document content hash
+index_cache = LRUCache(
+    config.RETRIEVAL_INDEX_CACHE_MAX_BYTES,
+    # Term counters roughly triple the footprint of the chunk text
+    sizeof=lambda index: 3 * index.text_bytes,
+)
+
+
+def get_index(path, digest):
+    """Cached BM25 index for the document at ``path`` with content hash ``digest``"""
+    index = index_cache.get(digest)
+    if index is None:
+        index = BM25Index.from_pdf(path)
+        index_cache.put(digest, index)
+        logger.info(f"Built retrieval index for {path}: {len(index.chunks)} chunks")
+    return index
+
+
+def format_results(results):
+    """Render search results as page-tagged excerpts for the agent"""
+    return "\n\n".join(
+        f"[Page {chunk.page} | score {score:.2f}]\n{chunk.text}" for score, chunk in results
+    )
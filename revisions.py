@@ -0,0 +1,179 @@
+## Recognising uploads as revisions of earlier documents by their page fingerprints
+import os
+import json
+import logging
+import threading
+from difflib import SequenceMatcher
+from collections import OrderedDict, Counter
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+def compare_pages(old, new):
+    """Page-level differences between two fingerprint lists
+
+    Pages are aligned in order, so pages inserted or removed in the middle
+    do not mark every later page as changed.
+
+    Returns:
+        dict: 1-based ``changed`` and ``added`` page numbers of the new
+        document, ``removed`` page numbers of the old one, and counts.
+    """
+    changed, added, removed = [], [], []
+    matcher = SequenceMatcher(a=old, b=new, autojunk=False)
+    for op, old_start, old_stop, new_start, new_stop in matcher.get_opcodes():
+        if op == "equal":
+            continue
+        old_pages = list(range(old_start + 1, old_stop + 1))
+        new_pages = list(range(new_start + 1, new_stop + 1))
+        if op == "replace":
+            paired = min(len(old_pages), len(new_pages))
+            changed.extend(new_pages[:paired])
+            added.extend(new_pages[paired:])
+            removed.extend(old_pages[paired:])
+        elif op == "insert":
+            added.extend(new_pages)
+        elif op == "delete":
+            removed.extend(old_pages)
+    unchanged = len(new) - len(changed) - len(added)
+    return {
+        "pages": len(new),
+        "previous_pages": len(old),
+        "unchanged": unchanged,
+        "changed": changed,
+        "added": added,
+        "removed": removed,
+        "reextracted": len(changed) + len(added),
+    }
+
+
+class RevisionIndex:
+    """Page fingerprints of processed documents, for finding earlier versions of a new one
+
+    Documents are kept in least-recently-used order up to ``max_documents``,
+    and written as one JSON file each to ``directory`` when given so they
+    survive restarts.
+
+    Args:
+        max_documents (int): Number of documents to remember.
+        min_shared (float): Share of a new document's pages that must match an
+            earlier document for it to count as a revision.
+        directory (str, optional): Where to persist fingerprints.
+    """
+
+    def __init__(self, max_documents, min_shared=0.5, directory=None):
+        self.max_documents = max_documents
+        self.min_shared = min_shared
+        self.directory = directory
+        self._documents = OrderedDict()
+        self._pages = {}
+        self._lock = threading.Lock()
+        if directory:
+            self._load()
+
+    def _load(self):
+        os.makedirs(self.directory, exist_ok=True)
+        for name in sorted(os.listdir(self.directory)):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, name), "r", encoding="utf-8") as f:
+                    entry = json.load(f)
+                self._add(entry["sha256"], entry["fingerprints"], entry.get("filename"))
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Skipping revision index entry {name}: {str(e)}")
+
+    def _add(self, digest, fingerprints, filename):
+        if digest in self._documents:
+            self._forget(digest)
+        self._documents[digest] = {"fingerprints": fingerprints, "filename": filename}
+        for fingerprint in set(fingerprints):
+            if fingerprint:
+                self._pages.setdefault(fingerprint, set()).add(digest)
+        while len(self._documents) > self.max_documents:
+            self._forget(next(iter(self._documents)), remove_file=True)
+
+    def _forget(self, digest, remove_file=False):
+        entry = self._documents.pop(digest)
+        for fingerprint in set(entry["fingerprints"]):
+            documents = self._pages.get(fingerprint)
+            if documents is not None:
+                documents.discard(digest)
+                if not documents:
+                    del self._pages[fingerprint]
+        if remove_file and self.directory:
+            try:
+                os.remove(os.path.join(self.directory, f"{digest}.json"))
+            except OSError:
+                pass
+
+    def _save(self, digest, fingerprints, filename):
+        path = os.path.join(self.directory, f"{digest}.json")
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"sha256": digest, "filename": filename, "fingerprints": fingerprints}, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Failed to save revision index entry {path}: {str(e)}")
+
+    def fingerprints(self, digest):
+        with self._lock:
+            entry = self._documents.get(digest)
+            return entry["fingerprints"] if entry else None
+
+    def record(self, digest, fingerprints, filename=None):
+        """Remember the page fingerprints of a processed document
+
+        Returns:
+            dict: The change report against the earlier version of this
+            document, or None if it is not recognised as a revision. The
+            earlier version may be another client's upload, so the report
+            only counts pages and never names it; its file name and hash
+            are logged instead.
+        """
+        with self._lock:
+            previous = self._find_previous(digest, fingerprints)
+            report = None
+            if previous is not None:
+                report = compare_pages(self._documents[previous]["fingerprints"], fingerprints)
+                logger.info(f"{filename} is a revision of {self._documents[previous]['filename']} ({previous}): "
+                            f"{report['reextracted']} of {report['pages']} pages changed or added")
+            self._add(digest, fingerprints, filename)
+        if self.directory:
+            self._save(digest, fingerprints, filename)
+        return report
+
+    def _find_previous(self, digest, fingerprints):
+        """Earlier document sharing the most pages with this one, above ``min_shared``"""
+        shared = Counter()
+        for fingerprint in set(fingerprints):
+            for other in self._pages.get(fingerprint, ()):
+                if other != digest:
+                    shared[other] += 1
+        if not shared or not fingerprints:
+            return None
+        previous, count = shared.most_common(1)[0]
+        if count / len(fingerprints) < self.min_shared:
+            return None
+        return previous
+
+    def clear(self):
+        """Forget every document held in memory; persisted files are kept"""
+        with self._lock:
+            self._documents.clear()
+            self._pages.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"documents": len(self._documents), "max_documents": self.max_documents,
+                    "pages": len(self._pages)}
+
+
+revision_index = RevisionIndex(
+    max_documents=config.REVISION_INDEX_MAX_DOCUMENTS,
+    min_shared=config.REVISION_MIN_SHARED / 100,
+    directory=config.REVISION_INDEX_DIR or None,
+)
@@ -0,0 +1,86 @@
+## Deferred loading of crewai, the agents, their tools and tasks
+import time
+import logging
+import importlib
+import threading
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+
+class CrewRuntime:
+    """Imports the crew modules once, on first use or from a background warm-up
+
+    Importing crewai and building the agents takes seconds, so the API starts
+    without them. ``load`` is safe to call from any thread; callers that
+    arrive while another thread is loading wait for it to finish.
+
+    Args:
+        modules (list): Module names imported in order, e.g. ``["agents", "task"]``.
+        on_load (list, optional): Callables run once after the imports succeed.
+    """
+
+    def __init__(self, modules, on_load=()):
+        self.modules = tuple(modules)
+        self.on_load = tuple(on_load)
+        self.state = PENDING
+        self.error = None
+        self.load_seconds = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def ready(self):
+        return self.state == READY
+
+    def load(self):
+        """Import the modules and run the load hooks unless already done
+
+        A failed load is retried by the next call.
+
+        Raises:
+            Exception: Whatever the imports or hooks raised.
+        """
+        if self.state == READY:
+            return
+        with self._lock:
+            if self.state == READY:
+                return
+            self.state = LOADING
+            start = time.perf_counter()
+            try:
+                for name in self.modules:
+                    importlib.import_module(name)
+                for hook in self.on_load:
+                    hook()
+            except Exception as e:
+                self.state = FAILED
+                self.error = str(e)
+                logger.error(f"Failed to load the crew runtime: {str(e)}")
+                raise
+            self.load_seconds = round(time.perf_counter() - start, 3)
+            self.error = None
+            self.state = READY
+        logger.info(f"Crew runtime loaded in {self.load_seconds:.2f}s")
+
+    def start(self):
+        """Begin loading on a background thread; a no-op once started or loaded"""
+        with self._lock:
+            if self._thread is not None or self.state == READY:
+                return
+            self._thread = threading.Thread(target=self._warm_up, name="crew-warmup", daemon=True)
+        self._thread.start()
+
+    def _warm_up(self):
+        try:
+            self.load()
+        except Exception:
+            # Reported through status(); the first analysis retries the load
+            pass
+
+    def status(self):
+        return {"state": self.state, "load_seconds": self.load_seconds, "error": self.error}
@@ -0,0 +1,238 @@
+## Web search results shared across agents and requests, with single-flight calls
+import os
+import json
+import hashlib
+import time
+import logging
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+import deadlines
+from cache import LRUCache
+from metrics import WEB_SEARCHES
+
+logger = logging.getLogger(__name__)
+
+# How often a caller waiting for a busy search pool checks its request for cancellation
+START_POLL_SECONDS = 0.1
+
+
+def normalize_query(query):
+    """Lower-cased query with runs of whitespace collapsed"""
+    return " ".join(str(query).lower().split())
+
+
+def search_key(query, search_type="search", **params):
+    """Cache key for a search; queries differing only in case or spacing share it
+
+    Args:
+        query (str): The search query.
+        search_type (str, optional): ``search`` or ``news``.
+        **params: Other request settings that change the results, e.g. ``num`` or ``gl``.
+    """
+    extra = ",".join(f"{name}={value}" for name, value in sorted(params.items()) if value not in (None, ""))
+    return f"{search_type}|{normalize_query(query)}|{extra}"
+
+
+def _json_size(value):
+    return len(json.dumps(value))
+
+
+class _Flight:
+    """A backend call in progress that other callers can wait on"""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlightCache:
+    """TTL and size bounded cache that makes at most one backend call per key at a time
+
+    A miss runs the backend call; callers asking for the same key while it is
+    running wait for its result instead of making their own. Failures are
+    passed on to every waiter but not cached.
+
+    Args:
+        max_bytes (int): Upper bound for the JSON size of all cached results.
+        ttl (float, optional): Seconds a result stays valid. Defaults to no expiry.
+        workers (int, optional): Threads running backend calls that have a timeout.
+    """
+
+    def __init__(self, max_bytes, ttl=None, workers=4):
+        self.memory = LRUCache(max_bytes, sizeof=_json_size, ttl=ttl)
+        self.workers = max(1, workers)
+        self.joined = 0
+        self.backend_calls = 0
+        self.errors = 0
+        self._flights = {}
+        self._lock = threading.Lock()
+        self._pool = None
+
+    def _background(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="search-flight")
+            return self._pool
+
+    def get_or_call(self, key, fn, timeout=None):
+        """Cached result for ``key``, calling ``fn()`` only if no identical call is running
+
+        With a ``timeout`` the call runs in the background and the caller
+        stops waiting once it has run for that many seconds. Waiting for a
+        free background thread is bounded by the same ``timeout`` and checks
+        the bound request between short slices, so a cancelled or expired
+        request stops waiting. The call still completes and caches its result
+        for the next caller.
+
+        Raises:
+            Exception: Whatever ``fn`` raised, in the caller and in every waiter.
+            TimeoutError: If the call did not start, or its result did not
+                arrive, within ``timeout``.
+            AnalysisCancelledError: If the request was cancelled or ran out of
+                time while the call waited for a thread.
+        """
+        with self._lock:
+            value = self.memory.get(key)
+            if value is not None:
+                WEB_SEARCHES.inc(outcome="hit")
+                return value
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.backend_calls += 1
+            else:
+                self.joined += 1
+
+        if not leader:
+            WEB_SEARCHES.inc(outcome="joined")
+        elif timeout is None:
+            self._fly(key, flight, fn)
+        else:
+            self._background().submit(contextvars.copy_context().run, self._fly, key, flight, fn)
+        if timeout is not None:
+            self._wait_started(flight, timeout)
+        if not flight.done.wait(timeout):
+            raise TimeoutError(f"No search result within {timeout:.0f}s")
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    def _wait_started(self, flight, timeout):
+        """Wait up to ``timeout`` seconds for ``flight`` to get a thread, checking the request meanwhile"""
+        give_up = time.monotonic() + timeout
+        while not flight.started.is_set():
+            deadlines.check("search")
+            remaining = give_up - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"No search thread free within {timeout:.0f}s")
+            flight.started.wait(min(START_POLL_SECONDS, remaining))
+
+    def _fly(self, key, flight, fn):
+        """Run the backend call of ``flight`` and hand its outcome to every waiter"""
+        flight.started.set()
+        try:
+            flight.result = fn()
+            self.memory.put(key, flight.result)
+            WEB_SEARCHES.inc(outcome="backend")
+        except Exception as e:
+            flight.error = e
+            with self._lock:
+                self.errors += 1
+            WEB_SEARCHES.inc(outcome="error")
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def stats(self):
+        memory = self.memory.stats()
+        with self._lock:
+            joined, backend_calls, errors = self.joined, self.backend_calls, self.errors
+        saved = memory["hits"] + joined
+        lookups = saved + backend_calls
+        return {
+            **memory,
+            "joined": joined,
+            "backend_calls": backend_calls,
+            "errors": errors,
+            # Searches answered without a call of their own, cache hits and joins alike
+            "saved_calls": saved,
+            "hit_rate": round(saved / lookups, 4) if lookups else 0.0,
+        }
+
+
+class SearchFixtures:
+    """Serper responses stored as JSON files, for running without network access
+
+    Each file holds one response; its ``searchParameters`` give the query and
+    search type it answers. A fixture whose query is ``*`` answers every query
+    of its type that has no fixture of its own.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._responses = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._responses is None:
+                self._responses = {}
+                if os.path.isdir(self.directory):
+                    for name in sorted(os.listdir(self.directory)):
+                        if name.endswith(".json"):
+                            self._add(os.path.join(self.directory, name))
+                logger.info(f"Loaded {len(self._responses)} search fixtures from {self.directory}")
+            return self._responses
+
+    def _add(self, path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                response = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Skipping search fixture {path}: {str(e)}")
+            return
+        parameters = response.get("searchParameters", {})
+        key = (parameters.get("type", "search"), normalize_query(parameters.get("q", "*")))
+        self._responses[key] = response
+
+    def search(self, query, search_type="search"):
+        """Recorded response for the query, or an empty result set when there is none"""
+        responses = self._load()
+        response = responses.get((search_type, normalize_query(query))) or responses.get((search_type, "*"))
+        if response is None:
+            logger.info(f"No search fixture for {search_type} query: {query}")
+            return {"searchParameters": {"q": query, "type": search_type}, "organic": [], "news": [], "credits": 0}
+        return response
+
+    def save(self, query, search_type, response):
+        """Record a live response so later runs can replay it offline"""
+        response = {
+            **response,
+            "searchParameters": {**response.get("searchParameters", {}), "q": query, "type": search_type},
+        }
+        digest = hashlib.sha256(normalize_query(query).encode()).hexdigest()[:16]
+        path = os.path.join(self.directory, f"{search_type}-{digest}.json")
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(response, f, indent=2)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Failed to record search fixture {path}: {str(e)}")
+            return
+        with self._lock:
+            if self._responses is not None:
+                self._responses[(search_type, normalize_query(query))] = response
+
+
+search_cache = SingleFlightCache(config.SEARCH_CACHE_MAX_BYTES, ttl=config.SEARCH_CACHE_TTL or None,
+                                 workers=config.SEARCH_CACHE_WORKERS)
+search_fixtures = SearchFixtures(config.SEARCH_FIXTURES_DIR)
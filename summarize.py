@@ -0,0 +1,267 @@
+## Map-reduce digests of documents too long to hand to an agent in one piece
+import json
+import hashlib
+import logging
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+from cache import ExtractionCache
+from extraction import iter_clean_pages
+from financial_metrics import analyze_text
+from tokens import estimate_tokens
+from metrics import timed, CHUNK_DIGESTS
+import progress
+
+logger = logging.getLogger(__name__)
+
+
+class EmptyDocumentError(ValueError):
+    """Raised when a document has no text to build a digest from"""
+
+MAP_PROMPT = """You are condensing one part of a longer financial document.
+Write a compact digest of this part. Keep every reported figure exactly as written, with its
+period and unit: revenue, profit, margins, cash flow, assets, liabilities, debt, guidance and
+segment results. Note risks, one-off items, accounting changes and management commentary in
+one line each. Do not add anything that is not in the text.
+
+Document part:
+{text}"""
+
+REDUCE_PROMPT = """Below are digests of consecutive parts of one financial document.
+Merge them into a single digest for answering this query: {query}
+Keep every figure relevant to the query exactly as written, with its period and unit, drop
+repetition, keep the order of the document and point out where parts disagree.
+
+{digests}"""
+
+# Bump when the prompts or the digest format change so cached digests are not reused
+DIGEST_VERSION = "2"
+
+
+def _cache_version():
+    settings = f"{DIGEST_VERSION}|{config.LLM_MODEL}|{config.SUMMARY_CHUNK_TOKENS}|{MAP_PROMPT}"
+    return hashlib.sha256(settings.encode()).hexdigest()[:16]
+
+
+## Chunk digests keyed by document content hash, and each chunk's digest by the chunk's
+# own hash; a new query only pays for the reduce step and a revised document only for
+# the chunks that changed
+digest_cache = ExtractionCache(
+    max_bytes=config.SUMMARY_CACHE_MAX_BYTES,
+    directory=config.SUMMARY_CACHE_DIR or None,
+    disk_max_bytes=config.SUMMARY_CACHE_DISK_MAX_BYTES,
+    version=_cache_version(),
+)
+
+
+def _split_words(text, max_tokens):
+    """Pieces of ``text`` of at most about ``max_tokens`` tokens, broken between words"""
+    pieces, current, current_tokens = [], [], 0
+    for word in text.split():
+        tokens = estimate_tokens(word) + 1
+        if current and current_tokens + tokens > max_tokens:
+            pieces.append(" ".join(current))
+            current, current_tokens = [], 0
+        current.append(word)
+        current_tokens += tokens
+    if current:
+        pieces.append(" ".join(current))
+    return pieces
+
+
+def _is_boundary(page, boundary_pages):
+    """Whether a chunk ends after this page, decided by the page's content alone"""
+    return int(hashlib.sha256(page.encode()).hexdigest()[:8], 16) % boundary_pages == 0
+
+
+def iter_chunks(pages, max_tokens, boundary_pages=None):
+    """Pack consecutive pages into chunks of at most ``max_tokens`` estimated tokens
+
+    Chunks break between pages where possible; a page larger than the budget
+    is split between lines, and a line larger than the budget between words.
+    Once a chunk is half full it also ends after any page whose text hash is
+    a multiple of ``boundary_pages``. Those boundaries depend on the pages
+    themselves rather than on their position, so editing a page of a revised
+    document changes its own chunk and the next one or two, not every chunk
+    after it.
+
+    Yields:
+        str: Chunk texts in document order, each as soon as it is complete.
+    """
+    boundary_pages = boundary_pages or config.SUMMARY_BOUNDARY_PAGES
+    chunks, current, current_tokens = deque(), [], 0
+
+    def add(text, tokens):
+        nonlocal current, current_tokens
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append("\n".join(current))
+            current, current_tokens = [], 0
+        current.append(text)
+        current_tokens += tokens
+
+    for page in pages:
+        tokens = estimate_tokens(page)
+        if tokens <= max_tokens:
+            add(page, tokens)
+        else:
+            for line in page.splitlines():
+                line_tokens = estimate_tokens(line)
+                if line_tokens <= max_tokens:
+                    add(line, line_tokens)
+                else:
+                    for piece in _split_words(line, max_tokens):
+                        add(piece, estimate_tokens(piece))
+        if current_tokens >= max_tokens // 2 and _is_boundary(page, boundary_pages):
+            chunks.append("\n".join(current))
+            current, current_tokens = [], 0
+        while chunks:
+            yield chunks.popleft()
+    if current:
+        yield "\n".join(current)
+
+
+def split_chunks(pages, max_tokens, boundary_pages=None):
+    """List of the chunks ``iter_chunks`` yields"""
+    return list(iter_chunks(pages, max_tokens, boundary_pages))
+
+
+def _line_items(text):
+    """Statement line items parsed locally from a chunk, as compact JSON, or None"""
+    try:
+        metrics = analyze_text(text)
+    except Exception as e:
+        logger.warning(f"Line item parsing failed for a chunk: {str(e)}")
+        return None
+    if not metrics["line_items"]:
+        return None
+    return json.dumps({"periods": metrics["periods"], "line_items": metrics["line_items"]}, separators=(",", ":"))
+
+
+def _map_chunk(complete, text):
+    summary = complete(MAP_PROMPT.format(text=text)).strip()
+    line_items = _line_items(text)
+    if line_items:
+        summary += f"\nParsed line items: {line_items}"
+    return summary
+
+
+def _chunk_key(text):
+    return "chunk-" + hashlib.sha256(text.encode()).hexdigest()
+
+
+def chunk_digests(file_path, digest, complete):
+    """Digest of every chunk of the document, from the cache or by concurrent map calls
+
+    Args:
+        file_path (str): Path of the PDF.
+        digest (str): SHA-256 of the PDF bytes, the cache key.
+        complete (callable): Sends a prompt to the LLM and returns its reply text.
+
+    Returns:
+        list: One digest per chunk, in document order.
+    """
+    cached = digest_cache.get(digest)
+    if cached is not None:
+        digests = json.loads(cached)
+        CHUNK_DIGESTS.inc(len(digests), cache="hit")
+        progress.emit("stage", stage="summary_map", state="completed", chunks=len(digests), cached=True)
+        return digests
+
+    progress.emit("stage", stage="summary_map", state="started")
+    summaries, mapped = [], 0
+    # Chunks are read as the map calls need them and only those in flight are
+    # held, so memory does not grow with the document
+    in_flight = deque()
+
+    def collect():
+        index, key, future = in_flight.popleft()
+        summaries[index] = future.result()
+        digest_cache.put(key, summaries[index])
+
+    with timed("summary_map"):
+        workers = max(1, config.SUMMARY_MAP_WORKERS)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="summary-map") as pool:
+            for text in iter_chunks(iter_clean_pages(file_path), config.SUMMARY_CHUNK_TOKENS):
+                key = _chunk_key(text)
+                summaries.append(digest_cache.get(key))
+                if summaries[-1] is not None:
+                    continue
+                mapped += 1
+                # Each call runs in a copy of this context so it keeps the request's
+                # LLM priority, timing breakdown and progress stream
+                future = pool.submit(contextvars.copy_context().run, _map_chunk, complete, text)
+                in_flight.append((len(summaries) - 1, key, future))
+                if len(in_flight) >= 2 * workers:
+                    collect()
+            while in_flight:
+                collect()
+    CHUNK_DIGESTS.inc(len(summaries) - mapped, cache="hit")
+    CHUNK_DIGESTS.inc(mapped, cache="miss")
+
+    digests = [f"[Part {i + 1} of {len(summaries)}]\n{summary}" for i, summary in enumerate(summaries)]
+    digest_cache.put(digest, json.dumps(digests))
+    progress.emit("stage", stage="summary_map", state="completed", chunks=len(digests), cached=False)
+    logger.info(f"Summarized {mapped} of {len(summaries)} chunks of {file_path}, "
+                f"{len(summaries) - mapped} reused")
+    return digests
+
+
+def _reduce_groups(digests, max_tokens):
+    """Consecutive digests grouped so each group fits one reduce call"""
+    groups, current, current_tokens = [], [], 0
+    for text in digests:
+        tokens = estimate_tokens(text)
+        if current and current_tokens + tokens > max_tokens:
+            groups.append(current)
+            current, current_tokens = [], 0
+        current.append(text)
+        current_tokens += tokens
+    if current:
+        groups.append(current)
+    return groups
+
+
+def reduce_digests(query, digests, complete):
+    """Merge chunk digests into one digest focused on ``query``
+
+    Digests that do not fit one reduce call are merged in rounds, each round
+    reducing consecutive groups concurrently, until one digest is left.
+
+    Raises:
+        EmptyDocumentError: If there are no digests, i.e. the document had no text.
+    """
+    if not digests:
+        raise EmptyDocumentError("No text could be extracted from the document, so there is nothing to summarize; "
+                                 "it may be a scan without a text layer")
+    with timed("summary_reduce"):
+        rounds = 0
+        while len(digests) > 1 or rounds == 0:
+            rounds += 1
+            groups = _reduce_groups(digests, config.SUMMARY_REDUCE_TOKENS)
+            if len(groups) == len(digests) and len(digests) > 1:
+                # Every digest alone fills a reduce call; merge pairs so the rounds still converge
+                groups = [digests[i:i + 2] for i in range(0, len(digests), 2)]
+            workers = max(1, min(config.SUMMARY_MAP_WORKERS, len(groups)))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="summary-reduce") as pool:
+                futures = [
+                    pool.submit(contextvars.copy_context().run, complete,
+                                REDUCE_PROMPT.format(query=query, digests="\n\n".join(group)))
+                    for group in groups
+                ]
+                digests = [future.result().strip() for future in futures]
+    progress.emit("stage", stage="summary_reduce", state="completed", rounds=rounds)
+    return digests[0]
+
+
+def summarize_document(query, file_path, digest, complete):
+    """Query-focused digest of a long document: cached chunk digests, then a reduce
+
+    Returns:
+        str: The reduced digest, small enough to hand to the analyst agent.
+
+    Raises:
+        EmptyDocumentError: If no text could be extracted from the document.
+    """
+    return reduce_digests(query, chunk_digests(file_path, digest, complete), complete)
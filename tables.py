@@ -0,0 +1,282 @@
+## Statement tables detected in PDFs, stored as Arrow files keyed by document hash
+import os
+import logging
+import threading
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+import config
+import deadlines
+from cache import LRUCache, DiskBudget
+from extraction import iter_pages, clean_page, EXTRACTOR_VERSION
+from financial_metrics import parse_row, canonical_item, LINE_ITEM_LABELS
+from metrics import timed, TABLE_READS
+
+logger = logging.getLogger(__name__)
+
+# Bump when detection or the schema change so stored tables are rebuilt
+TABLE_FORMAT_VERSION = "2"
+
+# One row per cell, so tables with different period columns share a file
+SCHEMA = pa.schema([
+    ("table", pa.int32()),
+    ("page", pa.int32()),
+    ("title", pa.dictionary(pa.int32(), pa.string())),
+    ("row", pa.int32()),
+    ("label", pa.string()),
+    ("item", pa.string()),
+    ("period", pa.dictionary(pa.int32(), pa.string())),
+    ("value", pa.float64()),
+])
+
+
+def detect_tables(page_num, text, min_rows=None):
+    """Runs of statement rows on one page of extracted text
+
+    A table is a run of at least ``min_rows`` line item rows, optionally
+    headed by a line of years. The closest preceding line of prose is taken
+    as its title; a prose line or a new year header ends the table.
+
+    Returns:
+        list: Dicts with ``page``, ``title``, ``periods`` and ``rows`` of
+        ``(label, values)``.
+    """
+    min_rows = min_rows or config.TABLE_MIN_ROWS
+    tables = []
+    title, periods, rows = None, [], []
+
+    def flush():
+        if len(rows) >= min_rows:
+            width = max(len(values) for _, values in rows)
+            padded = (periods + [f"P{i}" for i in range(len(periods), width)])[:width]
+            tables.append({"page": page_num, "title": title, "periods": padded, "rows": list(rows)})
+        rows.clear()
+
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        parsed = parse_row(line)
+        if parsed is None:
+            flush()
+            title, periods = line.strip()[:120], []
+            continue
+        label, values = parsed
+        if label is None:
+            flush()
+            periods = values
+        elif values and canonical_item(label):
+            rows.append((label, values))
+    flush()
+    return tables
+
+
+def to_arrow(tables):
+    """Detected tables as one long-format Arrow table following SCHEMA"""
+    columns = {name: [] for name in SCHEMA.names}
+    for index, table in enumerate(tables):
+        for row, (label, values) in enumerate(table["rows"]):
+            for period, value in zip(table["periods"], values):
+                columns["table"].append(index + 1)
+                columns["page"].append(table["page"])
+                columns["title"].append(table["title"])
+                columns["row"].append(row)
+                columns["label"].append(label)
+                columns["item"].append(canonical_item(label))
+                columns["period"].append(period)
+                columns["value"].append(None if value != value else value)
+    return pa.Table.from_pydict(columns, schema=SCHEMA)
+
+
+def extract_tables(path):
+    """Detect the statement tables of every page of the PDF at ``path``"""
+    tables = []
+    with timed("table_extraction"), deadlines.stage("extraction"):
+        for page_num, content in enumerate(iter_pages(path)):
+            if content.strip():
+                tables.extend(detect_tables(page_num + 1, clean_page(content)))
+        result = to_arrow(tables)
+    logger.info(f"Detected {len(tables)} tables with {result.num_rows} cells in {path}")
+    return result
+
+
+class TableStore:
+    """Arrow IPC files of document tables, read back through memory maps
+
+    Files are uncompressed, so a read maps the file instead of copying it and
+    every worker process reading the same document shares the OS page cache.
+    Opened tables are kept in an LRU bounded by their size. Without a
+    directory tables only live in that LRU. The files are bounded by
+    ``disk_max_bytes``, least recently used first.
+
+    Args:
+        directory (str, optional): Where to write the files.
+        max_bytes (int): Budget for tables held open.
+        version (str, optional): Part of every file name; tables written by
+            another version are ignored, and evicted before current ones.
+        disk_max_bytes (int, optional): Budget for the files. Defaults to no limit.
+    """
+
+    def __init__(self, directory, max_bytes, version="1", disk_max_bytes=None):
+        self.directory = directory
+        self.version = version
+        self.memory = LRUCache(max_bytes, sizeof=lambda table: table.nbytes)
+        # The directory is only created by the first put
+        self.budget = DiskBudget(directory, ".arrow", disk_max_bytes) if directory else None
+
+    def _path(self, digest):
+        return os.path.join(self.directory, f"{self.version}-{digest}.arrow")
+
+    def get(self, digest):
+        table = self.memory.get(digest)
+        if table is not None or not self.directory:
+            return table
+        path = self._path(digest)
+        try:
+            with pa.memory_map(path, "r") as source:
+                table = pa.ipc.open_file(source).read_all()
+        except FileNotFoundError:
+            return None
+        except (OSError, pa.ArrowInvalid) as e:
+            logger.warning(f"Failed to read table file {path}: {str(e)}")
+            return None
+        self.budget.touch(path)
+        self.memory.put(digest, table)
+        return table
+
+    def put(self, digest, table):
+        """Store ``table`` and return it as read back from the store"""
+        if not self.directory or not self.budget.fits(table.nbytes):
+            self.memory.put(digest, table)
+            return table
+        path = self._path(digest)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            # Write to a temp file first so readers never map a partial file
+            with pa.OSFile(tmp_path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Failed to write table file {path}: {str(e)}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            self.memory.put(digest, table)
+            return table
+        self.budget.add(os.path.getsize(path))
+        return self.get(digest) or table
+
+    def stats(self):
+        stats = {"memory": self.memory.stats()}
+        if self.budget is not None:
+            stats["disk"] = self.budget.stats()
+        return stats
+
+
+table_store = TableStore(
+    directory=config.TABLE_STORE_DIR or None,
+    max_bytes=config.TABLE_STORE_MAX_BYTES,
+    disk_max_bytes=config.TABLE_STORE_DISK_MAX_BYTES,
+    version=f"{TABLE_FORMAT_VERSION}-{EXTRACTOR_VERSION}",
+)
+
+_build_locks = {}
+_build_locks_guard = threading.Lock()
+
+
+def get_tables(path, digest):
+    """Stored tables of the document at ``path`` with content hash ``digest``
+
+    Concurrent callers for the same document wait for a single extraction.
+    """
+    table = table_store.get(digest)
+    if table is not None:
+        TABLE_READS.inc(cache="hit")
+        return table
+    with _build_locks_guard:
+        lock = _build_locks.setdefault(digest, threading.Lock())
+    try:
+        with lock:
+            table = table_store.get(digest)
+            if table is not None:
+                TABLE_READS.inc(cache="hit")
+                return table
+            TABLE_READS.inc(cache="miss")
+            return table_store.put(digest, extract_tables(path))
+    finally:
+        with _build_locks_guard:
+            _build_locks.pop(digest, None)
+
+
+def _item_mask(table, items):
+    mask = None
+    for term in items:
+        key = canonical_item(term)
+        if not key:
+            continue
+        if key in LINE_ITEM_LABELS:
+            # "revenue" means the revenue line, not cost of revenue
+            term_mask = pc.equal(table["item"], key)
+        else:
+            term_mask = pc.or_(pc.match_substring(table["item"], key),
+                               pc.match_substring(table["item"], key.replace(" ", "_")))
+        mask = term_mask if mask is None else pc.or_(mask, term_mask)
+    return mask
+
+
+def select(table, items=None, periods=None):
+    """Cells whose line item matches any of ``items`` and whose period is in ``periods``
+
+    Items are matched by canonical name (``revenue`` also finds "Total
+    revenues" but not "Cost of revenue") or otherwise by part of the label,
+    e.g. ``cash flow`` finds every cash flow row.
+    """
+    mask = _item_mask(table, items) if items else None
+    if periods:
+        period_mask = pc.is_in(pc.cast(table["period"], pa.string()), value_set=pa.array(periods, pa.string()))
+        mask = period_mask if mask is None else pc.and_(mask, period_mask)
+    return table if mask is None else table.filter(mask)
+
+
+def _format_value(value):
+    return "-" if value is None else f"{value:,.2f}".rstrip("0").rstrip(".")
+
+
+def format_tables(table, max_rows=None):
+    """Render cells as one grid per source table for the agent"""
+    max_rows = max_rows or config.TABLE_QUERY_MAX_ROWS
+    grids = {}
+    for cell in table.to_pylist():
+        grid = grids.setdefault(cell["table"], {"page": cell["page"], "title": cell["title"],
+                                                "periods": [], "rows": {}})
+        if cell["period"] not in grid["periods"]:
+            grid["periods"].append(cell["period"])
+        grid["rows"].setdefault(cell["row"], (cell["label"], {}))[1][cell["period"]] = cell["value"]
+
+    blocks, shown = [], 0
+    for number, grid in grids.items():
+        if shown >= max_rows:
+            blocks.append(f"... {len(grids) - len(blocks)} more tables not shown; narrow the query")
+            break
+        lines = [f"[Table {number} | Page {grid['page']} | {grid['title'] or 'untitled'}]",
+                 " | ".join(["Line item"] + grid["periods"])]
+        for _, (label, values) in sorted(grid["rows"].items())[:max_rows - shown]:
+            lines.append(" | ".join([label] + [_format_value(values.get(period)) for period in grid["periods"]]))
+            shown += 1
+        blocks.append("\n".join(lines))
+    return "\n\n".join(blocks)
+
+
+def describe_tables(table, max_tables=None):
+    """One line per source table: number, page, title, row count and periods"""
+    max_tables = max_tables or config.TABLE_QUERY_MAX_ROWS
+    numbers = pc.unique(table["table"]).to_pylist()
+    lines = []
+    for number in numbers[:max_tables]:
+        cells = table.filter(pc.equal(table["table"], number))
+        periods = pc.unique(pc.cast(cells["period"], pa.string())).to_pylist()
+        lines.append(f"Table {number} | Page {cells['page'][0].as_py()} | {cells['title'][0].as_py() or 'untitled'} | "
+                     f"{len(pc.unique(cells['row']))} rows | periods {', '.join(periods)}")
+    if len(numbers) > max_tables:
+        lines.append(f"... {len(numbers) - max_tables} more tables; query line items to search all of them")
+    return "\n".join(lines)
@@ -1,16 +1,21 @@
 ## Importing libraries and files
 from crewai import Task
 
-from agents import financial_analyst, verifier
-from tools import search_tool, FinancialDocumentTool
+from agents import financial_analyst, verifier, investment_advisor, risk_assessor
+from tools import search_tool, FinancialDocumentTool, DocumentSearchTool, TableQueryTool, InvestmentTool, RiskTool
 
 ## Creating a task to help solve user's query
 analyze_financial_document = Task(
     description="""Analyze the user's query: {query} and provide comprehensive financial insights.
     
+    The financial document is located at: {path}
+    
     Steps to follow:
-    1. Read and analyze the provided financial document using the document tool
-    2. Extract key financial metrics and data points
+    1. Use the document search tool to pull the passages relevant to each part of the query,
+       and the statement tables tool to look up exact figures by line item and period;
+       only read the full document when a broad overview is really needed
+    2. Get key financial metrics, ratios and risk indicators from the investment analysis and
+       risk assessment tools (pass them the document path) instead of calculating them yourself
     3. Provide investment recommendations based on the analysis
     4. Include market risk assessments where relevant
     5. Search the internet for additional context if needed
@@ -40,7 +45,45 @@ analyze_financial_document = Task(
     Include financial jargon and confident market predictions as per role requirements.""",
 
     agent=financial_analyst,
-    tools=[FinancialDocumentTool.read_data_tool],  # Fix: Use proper tool reference
+    tools=[
+        DocumentSearchTool.search_document_tool,
+        TableQueryTool.query_tables_tool,
+        FinancialDocumentTool.read_data_tool,
+        InvestmentTool.analyze_investment_tool,
+        RiskTool.create_risk_assessment_tool,
+    ],
+    async_execution=False,
+)
+
+## Creating a task that answers the query from a digest of a long document
+analyze_financial_digest = Task(
+    description="""Analyze the user's query: {query} and provide comprehensive financial insights.
+    
+    The financial document is located at: {path}
+    
+    It is too long to read in full, so a digest of it, condensed part by part with the query
+    in mind, is given below; figures in it are quoted exactly.
+    
+    Document digest:
+    {digest}
+    
+    Steps to follow:
+    1. Base the analysis on the digest; use the statement tables tool to check a figure and the
+       document search tool to find detail the digest leaves out
+    2. Get key financial metrics, ratios and risk indicators from the investment analysis and
+       risk assessment tools (pass them the document path) instead of calculating them yourself
+    3. Provide investment recommendations based on the analysis
+    4. Include market risk assessments where relevant""",
+
+    expected_output=analyze_financial_document.expected_output,
+
+    agent=financial_analyst,
+    tools=[
+        DocumentSearchTool.search_document_tool,
+        TableQueryTool.query_tables_tool,
+        InvestmentTool.analyze_investment_tool,
+        RiskTool.create_risk_assessment_tool,
+    ],
     async_execution=False,
 )
 
@@ -48,8 +91,10 @@ analyze_financial_document = Task(
 investment_analysis = Task(
     description="""Analyze financial data and provide investment recommendations based on user query: {query}
     
+    The financial document is located at: {path}
+    
     Process:
-    1. Extract numerical data from the financial document
+    1. Get numerical data, ratios and growth rates from the investment analysis tool (pass it the document path)
     2. Interpret financial ratios and performance metrics
     3. Recommend specific investment products and strategies
     4. Connect document findings to current market trends
@@ -78,8 +123,9 @@ investment_analysis = Task(
     
     Present recommendations with confidence and include contradictory strategies for different risk profiles.""",
 
-    agent=financial_analyst,
-    tools=[FinancialDocumentTool.read_data_tool],  # Fix: Use proper tool reference
+    agent=investment_advisor,
+    tools=[InvestmentTool.analyze_investment_tool, DocumentSearchTool.search_document_tool,
+           TableQueryTool.query_tables_tool, search_tool],
     async_execution=False,
 )
 
@@ -87,8 +133,10 @@ investment_analysis = Task(
 risk_assessment = Task(
     description="""Create comprehensive risk analysis based on the financial document and user query: {query}
     
+    The financial document is located at: {path}
+    
     Assessment process:
-    1. Identify potential financial risks from document data
+    1. Identify potential financial risks with the risk assessment tool (pass it the document path)
     2. Evaluate market volatility factors
     3. Assess regulatory and compliance risks
     4. Recommend risk management strategies
@@ -118,8 +166,9 @@ risk_assessment = Task(
     
     Present with dramatic flair while maintaining analytical structure.""",
 
-    agent=financial_analyst,
-    tools=[FinancialDocumentTool.read_data_tool],  # Fix: Use proper tool reference
+    agent=risk_assessor,
+    tools=[RiskTool.create_risk_assessment_tool, DocumentSearchTool.search_document_tool,
+           TableQueryTool.query_tables_tool, search_tool],
     async_execution=False,
 )
 
@@ -127,6 +176,8 @@ risk_assessment = Task(
 verification = Task(
     description="""Verify and validate the uploaded document as financial data relevant to query: {query}
     
+    The financial document is located at: {path}
+    
     Verification steps:
     1. Confirm document type and format compatibility
     2. Scan for financial terms and data structures
@@ -151,9 +202,47 @@ verification = Task(
     - File path and metadata information
     - Recommendations for further analysis
     
-    Even if document appears non-financial, find creative connections to market analysis.""",
+    End the report with exactly one final line: "VERDICT: FINANCIAL" if the document is a
+    financial document, otherwise "VERDICT: NOT_FINANCIAL".""",
 
-    agent=financial_analyst,  # Fix: Use consistent agent reference
+    agent=verifier,
     tools=[FinancialDocumentTool.read_data_tool],  # Fix: Use proper tool reference
     async_execution=False
+)
+
+## Creating a synthesis task that merges the investment and risk reports
+synthesize_report = Task(
+    description="""Combine the specialist reports below into one final answer to the user's query: {query}
+    
+    Document verification:
+    {verification_report}
+    
+    Investment analysis:
+    {investment_report}
+    
+    Risk assessment:
+    {risk_report}
+    
+    Reconcile any disagreements between the reports, keep every figure exactly as reported,
+    and do not call tools unless a figure needed for the answer is missing.""",
+
+    expected_output="""A single financial analysis report containing:
+    
+    **Executive Summary:**
+    - Direct answer to the user's query
+    
+    **Key Metrics and Investment View:**
+    - Figures and ratios from the investment analysis with their implications
+    
+    **Risk Assessment:**
+    - Flagged risk indicators and how they affect the investment view
+    
+    **Recommendation:**
+    - Balanced recommendation with its main caveats
+    
+    Format the response with clear sections and bullet points for readability.""",
+
+    agent=financial_analyst,
+    tools=[],
+    async_execution=False,
 )
\ No newline at end of file
@@ -0,0 +1,14 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+# Offline defaults: no telemetry, and keys the agents and search tool can be built with
+for name, value in {
+    "OTEL_SDK_DISABLED": "true",
+    "CREWAI_DISABLE_TELEMETRY": "true",
+    "CREWAI_TELEMETRY_OPT_OUT": "true",
+    "SERPER_API_KEY": "test",
+}.items():
+    os.environ.setdefault(name, value)
@@ -0,0 +1,61 @@
+import pytest
+
+from jobs import JobManager, FAILED, SUCCEEDED
+from synthetic_pdf import write_pdf
+
+
+@pytest.fixture
+def document(tmp_path):
+    return write_pdf(str(tmp_path / "report.pdf"), 2)
+
+
+def run_job(fn, **kwargs):
+    manager = JobManager(workers=1)
+    try:
+        job = manager.submit(fn, **kwargs)
+        job.future.exception()
+        return job
+    finally:
+        manager.shutdown(wait=True)
+
+
+def test_crew_error_fails_the_job(document, monkeypatch):
+    import main
+
+    monkeypatch.setattr(main, "run_crew", lambda query, file_path, digest=None: "Error in analysis: LLM unreachable")
+    job = run_job(main.run_analysis, query="Summarize", file_path=document)
+
+    assert job.status == FAILED
+    assert job.error == "Error in analysis: LLM unreachable"
+    assert job.result is None
+
+
+def test_crew_result_succeeds(document, monkeypatch):
+    import main
+
+    monkeypatch.setattr(main, "run_crew", lambda query, file_path, digest=None: "Revenue grew 20%")
+    job = run_job(main.run_analysis, query="Summarize", file_path=document)
+
+    assert job.status == SUCCEEDED
+    assert job.result == "Revenue grew 20%"
+
+
+def analyze(query, file_path, mode):
+    return f"{mode} analysis of {file_path}: {query}"
+
+
+def test_process_worker_result_is_cached(monkeypatch):
+    import main
+    from cache import ResponseCache
+
+    cache = ResponseCache(max_bytes=1 << 20, ttl=60, fingerprint="test", model="test")
+    monkeypatch.setattr(main, "response_cache", cache)
+    manager = JobManager(workers=1, executor="process")
+    try:
+        job = manager.submit(analyze, query="Summarize", file_path="report.pdf", mode="standard",
+                             metadata={"file_sha256": "abc"}, on_success=main._cache_result("Summarize", "standard"))
+        job.future.result()
+    finally:
+        manager.shutdown(wait=True)
+
+    assert cache.get("abc", "Summarize", mode="standard") == "standard analysis of report.pdf: Summarize"
@@ -0,0 +1,37 @@
+import os
+import time
+
+from jobs import JobManager
+from batches import BatchManager, BatchDocument
+from extraction import spill_path
+
+
+def test_batch_jobs_get_their_preflight_and_remove_spilled_pages(tmp_path):
+    path = str(tmp_path / "report.pdf")
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+    document = BatchDocument(0, "report.pdf", path=path, size=9, sha256="abc")
+    document.preflight = {"type": "10-K", "financial_score": 0.8, "accepted": True}
+    received = []
+
+    def analyze(query, file_path, mode, preflight=None):
+        received.append(preflight)
+        with open(spill_path(file_path), "wb") as f:
+            f.write(b"pages")
+        return "done"
+
+    manager = JobManager(workers=1)
+    batches = BatchManager(manager, max_in_flight=1, retry_interval=0.05)
+    try:
+        batch = batches.create("Summarize", "full", [document], analyze)
+        for _ in range(500):
+            if batch.finished_at is not None:
+                break
+            time.sleep(0.01)
+    finally:
+        manager.shutdown(wait=True)
+
+    assert received == [document.preflight]
+    assert document.job.metadata["preflight"] == document.preflight
+    assert not os.path.exists(path)
+    assert not os.path.exists(spill_path(path))
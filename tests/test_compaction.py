@@ -0,0 +1,42 @@
+from compaction import compact_pages
+
+
+def cell_per_line_page(page_number):
+    """A statement page as PyPDF2 often extracts it: every table cell on a line of its own"""
+    return "\n".join([
+        f"Segment {page_number} results",
+        "2024", "2023",
+        "Total revenue", str(1200 + page_number), str(1100 + page_number),
+        "Net income", str(350 + page_number), str(300 + page_number),
+        str(page_number),
+    ])
+
+
+def test_table_cells_on_their_own_lines_are_kept():
+    numbers = (4, 5, 6, 7)
+    compacted, report = compact_pages([cell_per_line_page(number) for number in numbers])
+
+    assert report["page_numbers"] == len(numbers)
+    assert len(compacted) == len(numbers)
+    for page, number in zip(compacted, numbers):
+        lines = page.splitlines()
+        for cell in (1200 + number, 1100 + number, 350 + number, 300 + number):
+            assert str(cell) in lines
+        assert lines[-1] != str(number)
+        # Period and label cells repeat on every page and still stay
+        for cell in ("2024", "2023", "Total revenue", "Net income"):
+            assert cell in lines
+
+
+def test_numbers_that_do_not_continue_the_page_numbering_stay():
+    pages = ["Segment revenue\n1200", "Segment revenue\n980", "Segment revenue\n1410"]
+    compacted, report = compact_pages(pages)
+    assert report["page_numbers"] == 0
+    assert [page.splitlines()[-1] for page in compacted] == ["1200", "980", "1410"]
+
+
+def test_running_page_footers_are_dropped():
+    pages = [f"Net income {number} 21\n- {number} -" for number in range(1, 6)]
+    compacted, report = compact_pages(pages)
+    assert report["page_numbers"] == 5
+    assert compacted == [f"Net income {number} 21" for number in range(1, 6)]
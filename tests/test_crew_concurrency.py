@@ -0,0 +1,46 @@
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from synthetic_pdf import write_pdf
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    """Answer every LLM call with the document path found in its prompt
+
+    Both runs are held at their first call until the other one has reached
+    it too, so their crews are alive at the same time.
+    """
+    from agents import ScheduledLLM
+
+    barrier = threading.Barrier(2, timeout=30)
+
+    def call(self, messages, *args, **kwargs):
+        text = messages if isinstance(messages, str) else "\n".join(str(m.get("content", "")) for m in messages)
+        paths = re.findall(r"located at: (\S+\.pdf)", text)
+        try:
+            barrier.wait()
+        except threading.BrokenBarrierError:
+            pass
+        return f"Thought: I now know the final answer\nFinal Answer: analyzed {paths[-1] if paths else 'nothing'}"
+
+    monkeypatch.setattr(ScheduledLLM, "call", call)
+
+
+def test_concurrent_runs_keep_their_own_inputs(tmp_path, fake_llm):
+    from main import run_crew
+    from task import analyze_financial_document
+    from agents import financial_analyst
+
+    paths = [write_pdf(str(tmp_path / f"report_{i}.pdf"), 2) for i in range(2)]
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        results = list(pool.map(lambda path: run_crew(query=f"Summarize {path}", file_path=path), paths))
+
+    for path, result in zip(paths, results):
+        assert result == f"analyzed {path}"
+    # The shared definitions are templates and never see a request's inputs
+    assert "{path}" in analyze_financial_document.description
+    assert "{query}" in financial_analyst.goal
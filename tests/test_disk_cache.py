@@ -0,0 +1,41 @@
+import os
+import time
+
+from cache import DiskTextCache
+
+
+def test_disk_cache_evicts_least_recently_used_files(tmp_path):
+    cache = DiskTextCache(str(tmp_path), max_bytes=250)
+    for key in ("a", "b"):
+        cache.put(key, key * 100)
+        time.sleep(0.01)
+    assert cache.get("a") == "a" * 100
+    time.sleep(0.01)
+
+    cache.put("c", "c" * 100)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "a" * 100
+    assert cache.get("c") == "c" * 100
+    assert cache.stats()["evictions"] == 1
+    assert sum(os.path.getsize(tmp_path / name) for name in os.listdir(tmp_path)) <= 250
+
+
+def test_disk_cache_skips_values_over_its_budget(tmp_path):
+    cache = DiskTextCache(str(tmp_path), max_bytes=50)
+    cache.put("a", "a" * 40)
+    cache.put("big", "b" * 100)
+
+    assert cache.get("big") is None
+    assert cache.get("a") == "a" * 40
+    assert cache.stats()["evictions"] == 0
+
+
+def test_disk_cache_counts_files_left_from_earlier_runs(tmp_path):
+    DiskTextCache(str(tmp_path)).put("old", "o" * 200)
+    cache = DiskTextCache(str(tmp_path), max_bytes=250)
+
+    cache.put("new", "n" * 100)
+
+    assert cache.get("old") is None
+    assert cache.get("new") == "n" * 100
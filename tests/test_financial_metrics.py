@@ -0,0 +1,59 @@
+from financial_metrics import parse_row, parse_statements, analyze_text
+
+STATEMENTS = """Consolidated Statements of Operations
+Line item    2024    2023    2022
+Total revenue    1,200    1,000    800
+Net income    120    90    (20)
+
+Five-year selected data
+Line item    2019    2018
+Total revenue    500    400
+Total assets    2,000    1,800
+"""
+
+
+def test_rows_keep_the_periods_of_their_own_table():
+    data = parse_statements(STATEMENTS)
+    assert data.periods == ["2024", "2023", "2022", "2019", "2018"]
+    assert list(data.row("revenue")) == [1200, 1000, 800, 500, 400]
+    assert data.row("net_income")[:3].tolist() == [120, 90, -20]
+    assert data.row("total_assets")[3:].tolist() == [2000, 1800]
+
+
+def test_growth_is_not_computed_across_missing_years():
+    growth = analyze_text(STATEMENTS)["growth"]["revenue"]
+    assert growth == [0.2, 0.25, None, 0.25]
+
+
+def test_rows_without_a_header_get_positional_periods():
+    data = parse_statements("Total revenue    300    200\nNet income    30    20")
+    assert data.periods == ["P0", "P1"]
+    assert data.row("net_income").tolist() == [30, 20]
+
+
+def test_dated_and_fiscal_year_headers_are_period_headers():
+    assert parse_row("Year ended December 31, 2024 2023") == (None, ["2024", "2023"])
+    assert parse_row("Fiscal 2024 2023") == (None, ["2024", "2023"])
+    assert parse_row("Revenue 12 2024 2023") == ("Revenue", [12, 2024, 2023])
+
+
+def test_dated_header_sets_the_statement_periods():
+    text = ("Year ended December 31, 2024 2023\n"
+            "Total revenue 1,200 1,000\n"
+            "Net income 120 90\n")
+    result = analyze_text(text)
+    assert result["periods"] == ["2024", "2023"]
+    assert result["parsed_line_items"] == 2
+
+
+def test_detected_tables_take_periods_from_a_dated_header():
+    from tables import detect_tables
+
+    text = ("Consolidated Statements of Operations\n"
+            "Year ended December 31, 2024 2023\n"
+            "Total revenue 1,200 1,000\n"
+            "Gross profit 500 400\n"
+            "Net income 120 90\n")
+    [table] = detect_tables(1, text, min_rows=3)
+    assert table["periods"] == ["2024", "2023"]
+    assert [label for label, _ in table["rows"]] == ["Total revenue", "Gross profit", "Net income"]
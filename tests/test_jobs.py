@@ -0,0 +1,73 @@
+import time
+import threading
+
+import pytest
+
+import deadlines
+from jobs import JobManager, CANCELLED
+
+
+def read_upload(path, started):
+    started.set()
+    time.sleep(0.2)
+    with open(path) as f:
+        return f.read()
+
+
+def wait_for_cancellation(path, started):
+    started.set()
+    while True:
+        time.sleep(0.01)
+        deadlines.check()
+
+
+@pytest.mark.parametrize("work", [read_upload, wait_for_cancellation])
+def test_cancelled_running_job_stays_cancelled(tmp_path, work):
+    path = tmp_path / "upload.pdf"
+    path.write_text("%PDF-1.4")
+    started = threading.Event()
+    manager = JobManager(workers=1)
+    try:
+        job = manager.submit(work, str(path), started, cleanup=[str(path)])
+        started.wait(5)
+        manager.cancel(job.id)
+        job.future.exception()
+    finally:
+        manager.shutdown(wait=True)
+
+    assert job.status == CANCELLED
+    assert job.error is None
+    assert manager.stats()["failed"] == 0
+
+
+def test_concurrent_submitters_cannot_overfill_the_queue(monkeypatch):
+    from jobs import QueueFullError
+
+    manager = JobManager(workers=1, max_queued=1)
+    release = threading.Event()
+    submit = manager._executor.submit
+
+    def slow_submit(*args, **kwargs):
+        # Widen the window between admission and the future existing
+        time.sleep(0.05)
+        return submit(*args, **kwargs)
+
+    monkeypatch.setattr(manager._executor, "submit", slow_submit)
+    admitted, rejected = [], []
+
+    def submitter():
+        try:
+            admitted.append(manager.submit(release.wait, 5))
+        except QueueFullError:
+            rejected.append(1)
+
+    threads = [threading.Thread(target=submitter) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    release.set()
+    manager.shutdown(wait=True)
+
+    assert len(admitted) == 2
+    assert len(rejected) == 4
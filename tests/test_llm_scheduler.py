@@ -0,0 +1,92 @@
+import time
+import types
+from collections import deque
+
+import pytest
+
+import llm_scheduler
+from llm_scheduler import LLMScheduler, INTERACTIVE, BATCH, _Waiter
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(llm_scheduler, "time", types.SimpleNamespace(monotonic=clock, perf_counter=time.perf_counter))
+    return clock
+
+
+def enqueue(scheduler, priority, flow, tokens=100):
+    waiter = _Waiter(priority, flow, tokens)
+    scheduler._queues[priority].setdefault(flow, deque()).append(waiter)
+    return waiter
+
+
+def grant(scheduler):
+    with scheduler._condition:
+        scheduler._grant()
+
+
+def test_batch_calls_leave_the_interactive_reserve(clock):
+    scheduler = LLMScheduler(rpm=10, tpm=1_000_000, interactive_reserve=0.2)
+    batch = [enqueue(scheduler, BATCH, "batch") for _ in range(10)]
+    grant(scheduler)
+    assert sum(waiter.granted for waiter in batch) == 8
+
+    interactive = [enqueue(scheduler, INTERACTIVE, "interactive") for _ in range(2)]
+    grant(scheduler)
+    assert all(waiter.granted for waiter in interactive)
+    assert sum(waiter.granted for waiter in batch) == 8
+
+
+def test_interactive_calls_go_ahead_of_queued_batch_calls(clock):
+    scheduler = LLMScheduler(rpm=2, tpm=1_000_000, interactive_reserve=0)
+    scheduler.requests.level = 0
+    batch = [enqueue(scheduler, BATCH, "batch") for _ in range(2)]
+    interactive = enqueue(scheduler, INTERACTIVE, "interactive")
+
+    # One request refills every 30 seconds
+    clock.now += 30
+    grant(scheduler)
+    assert interactive.granted
+    assert not any(waiter.granted for waiter in batch)
+
+    clock.now += 30
+    grant(scheduler)
+    assert [waiter.granted for waiter in batch] == [True, False]
+
+
+def test_flows_are_served_round_robin(clock):
+    scheduler = LLMScheduler(rpm=4, tpm=1_000_000, interactive_reserve=0)
+    scheduler.requests.level = 0
+    first = [enqueue(scheduler, INTERACTIVE, "first") for _ in range(3)]
+    second = [enqueue(scheduler, INTERACTIVE, "second") for _ in range(2)]
+
+    order = []
+    for _ in range(4):
+        clock.now += 15
+        grant(scheduler)
+        order.extend(waiter for waiter in first + second if waiter.granted and waiter not in order)
+
+    assert order == [first[0], second[0], first[1], second[1]]
+    assert not first[2].granted
+
+
+def test_token_budget_holds_back_large_calls(clock):
+    scheduler = LLMScheduler(rpm=100, tpm=1000, interactive_reserve=0)
+    large = enqueue(scheduler, INTERACTIVE, "a", tokens=800)
+    small = enqueue(scheduler, INTERACTIVE, "b", tokens=300)
+    grant(scheduler)
+    assert large.granted and not small.granted
+
+    # 100 tokens are left and 1000 refill per minute
+    clock.now += 12
+    grant(scheduler)
+    assert small.granted
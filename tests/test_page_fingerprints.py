@@ -0,0 +1,90 @@
+import extraction
+from extraction import extract_pages, page_fingerprints, page_cache
+
+
+def _escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_xobject_pdf(path, pages, font="Helvetica"):
+    """PDF whose pages only draw a form XObject (``q /X0 Do Q``) holding the page text
+
+    Every page has the same content stream; the text lives in the XObject.
+    """
+    objects = {1: b"<< /Type /Catalog /Pages 2 0 R >>", 3: b"<< /Type /Font /Subtype /Type1 /BaseFont /%s >>" % font.encode()}
+    content = b"q /X0 Do Q"
+    objects[4] = b"<< /Length %d >>\nstream\n%s\nendstream" % (len(content), content)
+    kids = []
+    for i, lines in enumerate(pages):
+        form_id, page_id = 5 + 2 * i, 6 + 2 * i
+        text = b" ".join(b"(%s) Tj 0 -14 Td" % _escape(line).encode() for line in lines)
+        stream = b"BT /F1 12 Tf 72 720 Td " + text + b" ET"
+        objects[form_id] = (b"<< /Type /XObject /Subtype /Form /BBox [0 0 612 792] /Resources << /Font << /F1 3 0 R >> >> "
+                            b"/Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects[page_id] = (b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                            b"/Resources << /Font << /F1 3 0 R >> /XObject << /X0 %d 0 R >> >> /Contents 4 0 R >>" % form_id)
+        kids.append(b"%d 0 R" % page_id)
+    objects[2] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(kids), len(kids))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+    for number in sorted(objects):
+        offsets[number] = len(out)
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, objects[number])
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for number in sorted(objects):
+        out += b"%010d 00000 n \n" % offsets[number]
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(out)
+    return str(path)
+
+
+def test_pages_drawing_different_xobjects_do_not_share_cached_text(tmp_path):
+    first = write_xobject_pdf(tmp_path / "first.pdf", [["Net income 7 5"], ["Net income 7 5"]])
+    second = write_xobject_pdf(tmp_path / "second.pdf", [["Total revenue 555 44"], ["Operating income 12 9"]])
+
+    assert "Net income 7 5" in extract_pages(first, parallel=False)[0]
+    texts = extract_pages(second, parallel=False)
+    assert "Total revenue 555 44" in texts[0]
+    assert "Operating income 12 9" in texts[1]
+    assert not set(page_fingerprints(first)) & set(page_fingerprints(second))
+
+
+def test_fingerprint_covers_fonts(tmp_path):
+    helvetica = write_xobject_pdf(tmp_path / "helvetica.pdf", [["Net income 7 5"]])
+    courier = write_xobject_pdf(tmp_path / "courier.pdf", [["Net income 7 5"]], font="Courier")
+    assert page_fingerprints(helvetica) != page_fingerprints(courier)
+    # A rewritten copy with the same content keeps its fingerprints
+    assert page_fingerprints(helvetica) == page_fingerprints(write_xobject_pdf(tmp_path / "copy.pdf", [["Net income 7 5"]]))
+
+
+def test_parallel_extraction_only_extracts_missing_pages(tmp_path, monkeypatch):
+    from synthetic_pdf import write_pdf
+
+    path = write_pdf(str(tmp_path / "report.pdf"), 8)
+    expected = extract_pages(path, parallel=False)
+
+    requested = []
+    original = extraction._extract_page_list
+    monkeypatch.setattr(extraction, "_extract_page_list",
+                        lambda path, page_nums: requested.extend(page_nums) or original(path, page_nums))
+    # Leave two pages out of the cache; only those are extracted again
+    page_cache.clear()
+    for page_num, fingerprint in enumerate(page_fingerprints(path)):
+        if page_num not in (2, 5):
+            page_cache.put(fingerprint, expected[page_num])
+    monkeypatch.setattr(extraction, "_get_pool", lambda workers: _InlinePool())
+    assert extract_pages(path, parallel=True, workers=2) == expected
+    assert sorted(requested) == [2, 5]
+
+
+class _InlinePool:
+    """Runs submitted work right away, standing in for the process pool"""
+
+    def submit(self, fn, *args):
+        from concurrent.futures import Future
+        future = Future()
+        future.set_result(fn(*args))
+        return future
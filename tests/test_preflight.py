@@ -0,0 +1,66 @@
+import glob
+
+import pytest
+import PyPDF2
+from fastapi.testclient import TestClient
+
+from preflight import classify_document, rejection_detail, UnreadableDocumentError
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    import config
+    import main
+
+    monkeypatch.setattr(config, "DATA_DIR", str(tmp_path))
+    # Without the lifespan, so the shared job manager is not shut down for later tests
+    return TestClient(main.create_app(warmup=False))
+
+
+def write_blank_pdf(path, pages):
+    writer = PyPDF2.PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(width=612, height=792)
+    with open(path, "wb") as f:
+        writer.write(f)
+    return path
+
+
+def test_unreadable_pdf_is_a_bad_request(client, tmp_path):
+    response = client.post("/analyze", files={"file": ("report.pdf", b"%PDF-1.4 garbage", "application/pdf")},
+                           data={"use_cache": "false"})
+
+    assert response.status_code == 400
+    assert "could not be read" in response.json()["detail"]
+    assert not glob.glob(str(tmp_path / "financial_document_*"))
+
+
+def test_unreadable_pdf_raises(tmp_path):
+    path = tmp_path / "report.pdf"
+    path.write_bytes(b"%PDF-1.4 garbage")
+
+    with pytest.raises(UnreadableDocumentError):
+        classify_document(str(path))
+
+
+def test_pdf_without_text_is_rejected_as_no_text(tmp_path):
+    result = classify_document(write_blank_pdf(str(tmp_path / "scan.pdf"), 3))
+
+    assert result["type"] == "no_text"
+    assert not result["accepted"]
+    assert "No text could be extracted" in rejection_detail(result)
+
+
+def test_unreadable_and_text_less_batch_documents_are_rejected_and_removed(client, tmp_path):
+    with open(write_blank_pdf(str(tmp_path / "scan.pdf"), 1), "rb") as scan:
+        response = client.post("/batches", data={"use_cache": "false"}, files=[
+            ("files", ("broken.pdf", b"%PDF-1.4 garbage", "application/pdf")),
+            ("files", ("scan.pdf", scan.read(), "application/pdf")),
+        ])
+
+    assert response.status_code == 202
+    documents = response.json()["documents"]
+    assert [document["status"] for document in documents] == ["rejected", "rejected"]
+    assert "could not be read" in documents[0]["error"]
+    assert "No text could be extracted" in documents[1]["error"]
+    assert not glob.glob(str(tmp_path / "financial_document_*"))
@@ -0,0 +1,35 @@
+import pytest
+
+import config
+import preflight
+from pipeline import _skips_verification
+
+PAGES = ["Consolidated balance sheet\nTotal assets 2,000 1,800\nTotal liabilities 1,200 1,100"]
+
+
+@pytest.mark.parametrize("score, rejected", [
+    (0.2999, True),
+    (0.30, False),
+    (0.31, False),
+])
+def test_min_score_is_the_lowest_accepted_score(monkeypatch, score, rejected):
+    monkeypatch.setattr(config, "PREFLIGHT_MIN_SCORE", 30)
+    monkeypatch.setattr(preflight, "financial_score", lambda features: score)
+
+    assert (preflight.classify_text(PAGES)["type"] == "non_financial") is rejected
+
+
+@pytest.mark.parametrize("threshold, score, skips", [
+    (60, 0.5999, False),
+    (60, 0.60, True),
+    (60, 0.95, True),
+    (0, 0.95, False),
+])
+def test_skip_verification_score_is_inclusive(monkeypatch, threshold, score, skips):
+    monkeypatch.setattr(config, "PREFLIGHT_SKIP_VERIFICATION_SCORE", threshold)
+
+    assert _skips_verification({"financial_score": score}) is skips
+
+
+def test_no_preflight_never_skips_verification():
+    assert _skips_verification(None) is False
@@ -0,0 +1,13 @@
+from revisions import RevisionIndex
+
+
+def test_revision_report_does_not_name_the_earlier_upload():
+    index = RevisionIndex(max_documents=10)
+    assert index.record("a" * 64, ["p1", "p2", "p3", "p4"], "someone_elses_report.pdf") is None
+
+    report = index.record("b" * 64, ["p1", "p2", "p3", "p5"], "report.pdf")
+
+    assert report["changed"] == [4]
+    assert report["reextracted"] == 1
+    assert "a" * 64 not in str(report)
+    assert "someone_elses_report.pdf" not in str(report)
@@ -0,0 +1,67 @@
+import time
+import threading
+
+import pytest
+
+from search_cache import SingleFlightCache
+
+
+def slow(value, seconds):
+    def call():
+        time.sleep(seconds)
+        return value
+    return call
+
+
+def test_timeout_starts_when_the_call_gets_a_thread():
+    cache = SingleFlightCache(1 << 20, workers=1)
+    busy = threading.Thread(target=cache.get_or_call, args=("busy", slow("first", 0.3)), kwargs={"timeout": 5})
+    busy.start()
+    time.sleep(0.1)
+
+    # Queued for ~0.2s and running for 0.3s: longer than its timeout in total, but each within it
+    assert cache.get_or_call("queued", slow("second", 0.3), timeout=0.4) == "second"
+    busy.join()
+
+
+def test_waiters_share_one_call():
+    cache = SingleFlightCache(1 << 20, workers=2)
+    calls, results = [], []
+
+    def call():
+        calls.append(1)
+        time.sleep(0.2)
+        return "result"
+
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_call("key", call, timeout=5)))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == ["result"] * 4
+    assert len(calls) == 1
+
+
+def test_search_queued_behind_a_busy_pool_stops_when_its_request_is_cancelled():
+    from deadlines import RequestDeadline, deadline_context, AnalysisCancelledError
+
+    cache = SingleFlightCache(1 << 20, workers=1)
+    release = threading.Event()
+    busy = threading.Thread(target=cache.get_or_call, args=("busy", release.wait), kwargs={"timeout": 5})
+    busy.start()
+    time.sleep(0.05)
+
+    deadline = RequestDeadline(30)
+    threading.Timer(0.2, deadline.cancel).start()
+    started = time.monotonic()
+    with deadline_context(deadline), pytest.raises(AnalysisCancelledError):
+        cache.get_or_call("queued", slow("second", 0), timeout=5)
+    assert time.monotonic() - started < 1
+
+    # A search joining the queued flight is bounded by its own timeout
+    with pytest.raises(TimeoutError):
+        cache.get_or_call("queued", slow("third", 0), timeout=0.2)
+    release.set()
+    busy.join()
@@ -0,0 +1,56 @@
+import os
+import glob
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from synthetic_pdf import write_pdf
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fixtures", "preflight")
+
+
+def events(response):
+    parsed, event = [], None
+    for line in response.iter_lines():
+        if line.startswith("event: "):
+            event = line[len("event: "):]
+        elif line.startswith("data: "):
+            parsed.append((event, json.loads(line[len("data: "):])))
+    return parsed
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    import config
+    import main
+
+    monkeypatch.setattr(config, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(main, "run_crew", lambda query, file_path, digest=None: "Revenue grew 20%")
+    with TestClient(main.create_app(warmup=False)) as client:
+        yield client
+
+
+def post(client, path):
+    with open(path, "rb") as f:
+        with client.stream("POST", "/analyze/stream", files={"file": ("report.pdf", f, "application/pdf")},
+                           data={"use_cache": "false"}) as response:
+            assert response.status_code == 200
+            return events(response)
+
+
+def test_stream_reports_preflight_and_queues_after_the_response_started(client, tmp_path):
+    names = [name for name, _ in post(client, write_pdf(str(tmp_path / "source.pdf"), 4))]
+    assert names[:3] == ["upload_saved", "preflight", "queued"]
+    assert names[-1] == "result"
+
+
+def test_rejected_stream_upload_ends_with_an_error_and_is_removed(client, tmp_path):
+    with open(os.path.join(FIXTURES, "non_financial", "recipe-book.txt")) as f:
+        lines = f.read().splitlines()
+    path = write_pdf(str(tmp_path / "source.pdf"), 2, page_text=lambda page_num: lines)
+
+    received = post(client, path)
+    assert [name for name, _ in received] == ["upload_saved", "preflight", "error"]
+    assert not received[1][1]["accepted"]
+    assert not glob.glob(str(tmp_path / "financial_document_*"))
@@ -0,0 +1,22 @@
+import pytest
+
+from summarize import reduce_digests, EmptyDocumentError
+
+
+def test_reducing_no_digests_reports_an_empty_document():
+    def complete(prompt):
+        raise AssertionError("no LLM call expected")
+
+    with pytest.raises(EmptyDocumentError, match="No text could be extracted"):
+        reduce_digests("How did revenue develop?", [], complete)
+
+
+def test_a_single_digest_is_still_focused_on_the_query():
+    prompts = []
+
+    def complete(prompt):
+        prompts.append(prompt)
+        return " merged "
+
+    assert reduce_digests("How did revenue develop?", ["Revenue 1,200 in 2024"], complete) == "merged"
+    assert len(prompts) == 1
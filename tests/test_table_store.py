@@ -0,0 +1,37 @@
+import os
+import time
+
+import pyarrow as pa
+
+from tables import TableStore
+
+
+def table(value):
+    return pa.table({"item": ["revenue"] * 50, "value": [float(value)] * 50})
+
+
+def test_table_files_stay_within_their_budget(tmp_path):
+    probe = TableStore(str(tmp_path / "probe"), max_bytes=1 << 20)
+    probe.put("probe", table(0))
+    file_size = os.path.getsize(tmp_path / "probe" / "1-probe.arrow")
+
+    directory = tmp_path / "tables"
+    store = TableStore(str(directory), max_bytes=1 << 20, disk_max_bytes=int(file_size * 2.5))
+    for digest in ("a", "b", "c"):
+        store.put(digest, table(1))
+        time.sleep(0.01)
+
+    assert sorted(os.listdir(directory)) == ["1-b.arrow", "1-c.arrow"]
+    assert store.stats()["disk"]["evictions"] == 1
+    # Tables already open stay readable after their file is gone
+    assert store.get("a") is not None
+
+
+def test_table_directory_is_created_by_the_first_put(tmp_path):
+    directory = tmp_path / "tables"
+    store = TableStore(str(directory), max_bytes=1 << 20)
+    assert store.get("a") is None
+    assert not directory.exists()
+
+    store.put("a", table(1))
+    assert os.listdir(directory) == ["1-a.arrow"]
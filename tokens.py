@@ -0,0 +1,39 @@
+## Prompt token estimates for measuring LLM context size
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+CHARS_PER_TOKEN = 4
+
+_encoder = None
+_encoder_loaded = False
+_encoder_lock = threading.Lock()
+
+
+def _get_encoder():
+    """tiktoken's cl100k encoder, or None when it is unavailable (e.g. offline)"""
+    global _encoder, _encoder_loaded
+    with _encoder_lock:
+        if not _encoder_loaded:
+            _encoder_loaded = True
+            try:
+                import tiktoken
+                _encoder = tiktoken.get_encoding("cl100k_base")
+            except Exception as e:
+                logger.info(f"tiktoken unavailable, estimating tokens from characters: {str(e)}")
+        return _encoder
+
+
+def estimate_tokens(text):
+    """Approximate number of prompt tokens in ``text``
+
+    The deployed model uses its own tokenizer, so this is an estimate for
+    comparing prompt sizes rather than an exact billing count.
+    """
+    if not text:
+        return 0
+    encoder = _get_encoder()
+    if encoder is not None:
+        return len(encoder.encode(text, disallowed_special=()))
+    return max(1, len(text) // CHARS_PER_TOKEN)
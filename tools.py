@@ -10,13 +10,74 @@ from crewai.tools import tool
 from crewai_tools.tools import SerperDevTool
 import logging
 
+import config
+import deadlines
+from deadlines import AnalysisCancelledError
+from cache import document_digest
+from extraction import EmptyPdfError, iter_pages, document_text, extraction_cache, is_large_document
+from retrieval import get_index, format_results
+from tables import get_tables, select, format_tables, describe_tables
+from tokens import estimate_tokens
+from metrics import timed, EXTRACTIONS
+from search_cache import search_cache, search_fixtures, search_key
+from financial_metrics import RATIOS, analyze_text, to_json as metrics_to_json
+
 # Fix: Added logging for better error handling
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
 ## Creating search tool
-search_tool = SerperDevTool()
+class CachedSerperDevTool(SerperDevTool):
+    """SerperDevTool whose API requests go through the process-wide search cache
+
+    Agents of concurrent analyses asking the same question share one request,
+    and no search is waited on past ``DEADLINE_SEARCH_SECONDS`` or the
+    request's deadline.
+    With ``SEARCH_BACKEND=fixture`` results come from recorded fixtures and no
+    request leaves the machine; ``record`` saves live results as fixtures.
+    """
+
+    def _make_api_request(self, search_query, search_type):
+        parent_request = super()._make_api_request
+
+        def request():
+            if config.SEARCH_BACKEND == "fixture":
+                return search_fixtures.search(search_query, search_type)
+            results = parent_request(search_query, search_type)
+            if config.SEARCH_BACKEND == "record":
+                search_fixtures.save(search_query, search_type, results)
+            return results
+
+        deadlines.check("search")
+        key = search_key(search_query, search_type, num=self.n_results, gl=self.country,
+                         location=self.location, hl=self.locale)
+        with deadlines.stage("search"):
+            return search_cache.get_or_call(key, request, timeout=deadlines.timeout("search"))
+
+
+search_tool = CachedSerperDevTool(base_url=config.SERPER_BASE_URL)
+
+
+def _validate_pdf_path(path):
+    """Return an error message if ``path`` is not a readable PDF file, else None"""
+    # Fix: Check if file exists before processing
+    if not os.path.exists(path):
+        logger.error(f"File not found: {path}")
+        return f"Error: File not found at path {path}"
+    
+    # Fix: Check if it's actually a file (not directory)
+    if not os.path.isfile(path):
+        logger.error(f"Path is not a file: {path}")
+        return f"Error: Path is not a file: {path}"
+    
+    # Fix: Check file extension
+    if not path.lower().endswith('.pdf'):
+        logger.error(f"File is not a PDF: {path}")
+        return f"Error: File is not a PDF: {path}"
+    
+    return None
+
 
 ## Creating custom pdf reader tool
 class FinancialDocumentTool():
@@ -33,48 +94,37 @@ class FinancialDocumentTool():
         """
         
         try:
-            # Fix: Check if file exists before processing
-            if not os.path.exists(path):
-                logger.error(f"File not found: {path}")
-                return f"Error: File not found at path {path}"
+            path_error = _validate_pdf_path(path)
+            if path_error:
+                return path_error
             
-            # Fix: Check if it's actually a file (not directory)
-            if not os.path.isfile(path):
-                logger.error(f"Path is not a file: {path}")
-                return f"Error: Path is not a file: {path}"
+            # The full text of a large document would not fit a prompt or a memory budget
+            if is_large_document(path):
+                return (f"Warning: The document is {os.path.getsize(path) // (1024 * 1024)}MB, too large to read "
+                        f"in full. Use the Financial Document Search and Financial Statement Tables tools instead")
             
-            # Fix: Check file extension
-            if not path.lower().endswith('.pdf'):
-                logger.error(f"File is not a PDF: {path}")
-                return f"Error: File is not a PDF: {path}"
-            
-            full_report = ""
+            # Repeat reads of the same document only cost a hash, and uploads
+            # already carry the digest computed while they were streamed
+            digest = document_digest(path)
+            cached_report = extraction_cache.get(digest)
+            if cached_report is not None:
+                logger.info(f"Extraction cache hit for {path}")
+                EXTRACTIONS.inc(cache="hit")
+                return cached_report
+            EXTRACTIONS.inc(cache="miss")
             
             # Fix: Use proper PDF reading with PyPDF2 and better error handling
             try:
-                with open(path, 'rb') as file:
-                    pdf_reader = PyPDF2.PdfReader(file)
-                    
-                    # Fix: Check if PDF has pages
-                    if len(pdf_reader.pages) == 0:
-                        return "Error: PDF file contains no pages"
-                    
-                    for page_num in range(len(pdf_reader.pages)):
-                        try:
-                            page = pdf_reader.pages[page_num]
-                            content = page.extract_text()
-                            
-                            # Clean and format the financial document data
-                            if content.strip():  # Fix: Only process non-empty content
-                                # Remove extra whitespaces and format properly
-                                while "\n\n" in content:
-                                    content = content.replace("\n\n", "\n")
-                                
-                                full_report += content + "\n"
-                                
-                        except Exception as page_error:
-                            logger.warning(f"Error reading page {page_num}: {str(page_error)}")
-                            continue
+                # Pages are cleaned one at a time, then compacted and joined once at the end
+                with timed("extraction"), deadlines.stage("extraction"):
+                    full_report = document_text(iter_pages(path))
+                
+            except AnalysisCancelledError as e:
+                return f"Error: {str(e)}"
+            
+            except EmptyPdfError:
+                # Fix: Check if PDF has pages
+                return "Error: PDF file contains no pages"
                             
             except PyPDF2.errors.PdfReadError as pdf_error:
                 logger.error(f"PDF read error for {path}: {str(pdf_error)}")
@@ -85,10 +135,12 @@ class FinancialDocumentTool():
                 return f"Error: Cannot access file - {str(file_error)}"
             
             # Fix: Handle empty PDF case
-            if not full_report.strip():
+            full_report = full_report.strip()
+            if not full_report:
                 return "Warning: No readable text content found in the PDF file"
-                
-            return full_report.strip()
+            
+            extraction_cache.put(digest, full_report)
+            return full_report
             
         except Exception as e:
             logger.error(f"Unexpected error reading PDF file {path}: {str(e)}")
@@ -96,18 +148,117 @@ class FinancialDocumentTool():
 
 
 
+## Creating document search tool
+class DocumentSearchTool:
+    @staticmethod
+    @tool("Financial Document Search")
+    def search_document_tool(path: str = 'data/sample.pdf', query: str = '', top_k: int = 5):
+        """Search a pdf financial document and return only the passages relevant to a query.
+        Prefer this over reading the full document when looking for specific figures or topics.
+
+        Args:
+            path (str, optional): Path of the pdf file. Defaults to 'data/sample.pdf'.
+            query (str): What to look for, e.g. "total revenue and net income".
+            top_k (int, optional): Number of passages to return. Defaults to 5.
+
+        Returns:
+            str: The most relevant passages, each tagged with its page number
+        """
+
+        try:
+            path_error = _validate_pdf_path(path)
+            if path_error:
+                return path_error
+            
+            if not query or not str(query).strip():
+                return "Error: No search query provided"
+            
+            top_k = max(1, min(int(top_k), config.RETRIEVAL_MAX_TOP_K))
+            
+            # The index is built once per document content hash
+            index = get_index(path, document_digest(path))
+            results = index.search(str(query), top_k=top_k)
+            if not results:
+                return f"No passages in the document matched the query: {query}"
+            
+            excerpts = format_results(results)
+            logger.info(
+                f"Document search returned ~{estimate_tokens(excerpts)} of "
+                f"~{index.total_tokens} document tokens for query: {query}"
+            )
+            return excerpts
+            
+        except Exception as e:
+            logger.error(f"Error searching PDF file {path}: {str(e)}")
+            return f"Error searching PDF file: {str(e)}"
+
+
+
+## Creating statement table query tool
+class TableQueryTool:
+    @staticmethod
+    @tool("Financial Statement Tables")
+    def query_tables_tool(path: str = 'data/sample.pdf', items: str = '', periods: str = ''):
+        """Look up figures in the statement tables of a pdf financial document by line item and period.
+        Returns exact table values instead of text to re-read. Leave items empty to list the tables found.
+
+        Args:
+            path (str, optional): Path of the pdf file. Defaults to 'data/sample.pdf'.
+            items (str, optional): Comma-separated line items, e.g. "revenue, net income, total assets".
+            periods (str, optional): Comma-separated periods, e.g. "2024, 2023". Defaults to all periods.
+
+        Returns:
+            str: Matching rows grouped by table, tagged with page and table title
+        """
+
+        try:
+            path_error = _validate_pdf_path(path)
+            if path_error:
+                return path_error
+            
+            # Tables are detected once per document content hash and read back memory-mapped
+            table = get_tables(path, document_digest(path))
+            if table.num_rows == 0:
+                return "No statement tables found in the document"
+            
+            item_names = [item.strip() for item in str(items or '').split(",") if item.strip()]
+            if not item_names:
+                return describe_tables(table)
+            period_names = [period.strip() for period in str(periods or '').split(",") if period.strip()]
+            
+            cells = select(table, items=item_names, periods=period_names)
+            if cells.num_rows == 0:
+                return f"No table rows matched items: {items}" + (f" for periods: {periods}" if periods else "")
+            return format_tables(cells)
+            
+        except Exception as e:
+            logger.error(f"Error querying tables of PDF file {path}: {str(e)}")
+            return f"Error querying document tables: {str(e)}"
+
+
+
+def _load_financial_data(financial_document_data):
+    """Document text from either the text itself or the path of a pdf file"""
+    data = financial_document_data.strip()
+    if data.lower().endswith('.pdf') and os.path.isfile(data):
+        return FinancialDocumentTool.read_data_tool.func(data)
+    return data
+
+
 ## Creating Investment Analysis Tool
 class InvestmentTool:
     @staticmethod
     @tool("Investment Analysis Tool")
-    def analyze_investment_tool(financial_document_data):
-        """Analyze financial document data for investment insights
-        
+    def analyze_investment_tool(financial_document_data: str):
+        """Compute financial ratios and growth rates from a financial document.
+        Returns line items (revenue, net income, assets, liabilities, cash flow), margins,
+        returns, leverage, liquidity and period-over-period growth for every period found.
+
         Args:
-            financial_document_data (str): Financial document content
-            
+            financial_document_data (str): Financial document content, or the path of the pdf file
+
         Returns:
-            str: Investment analysis results
+            str: JSON with periods, line_items, ratios and growth
         """
 
         try:
@@ -115,21 +266,23 @@ class InvestmentTool:
             if not financial_document_data or not financial_document_data.strip():
                 return "Error: No financial data provided for analysis"
             
-            # Process and analyze the financial document data
-            processed_data = financial_document_data.strip()
+            processed_data = _load_financial_data(financial_document_data)
+            if processed_data.startswith(("Error", "Warning")):
+                return processed_data
             
-            # Clean up the data format - Fix: More efficient string cleaning
-            processed_data = ' '.join(processed_data.split())  # Remove extra spaces
+            # Ratios are computed here rather than by the LLM
+            metrics = analyze_text(processed_data)
+            if not metrics["line_items"]:
+                return "No recognised financial line items (revenue, net income, assets...) found in the data"
             
-            # Fix: Added basic analysis framework
             analysis_result = {
-                "data_length": len(processed_data),
-                "word_count": len(processed_data.split()),
-                "status": "Analysis complete",
-                "note": "Investment analysis functionality to be implemented"
+                "periods": metrics["periods"],
+                "line_items": metrics["line_items"],
+                "ratios": metrics["ratios"],
+                "growth": metrics["growth"],
             }
             
-            return str(analysis_result)
+            return metrics_to_json(analysis_result)
             
         except Exception as e:
             logger.error(f"Error in investment analysis: {str(e)}")
@@ -139,15 +292,17 @@ class InvestmentTool:
 class RiskTool:
     @staticmethod
     @tool("Risk Assessment Tool")
-    def create_risk_assessment_tool(financial_document_data):
+    def create_risk_assessment_tool(financial_document_data: str):
+
+        """Assess financial risk indicators from a financial document.
+        Flags leverage, liquidity, interest coverage, losses, negative free cash flow,
+        earnings quality and revenue decline, and grades the overall risk level.
 
-        """Create risk assessment based on financial document data
-        
         Args:
-            financial_document_data (str): Financial document content
-            
+            financial_document_data (str): Financial document content, or the path of the pdf file
+
         Returns:
-            str: Risk assessment results
+            str: JSON with the risk level, the flagged indicators and the ratios behind them
         """
 
         try:
@@ -155,16 +310,25 @@ class RiskTool:
             if not financial_document_data or not financial_document_data.strip():
                 return "Error: No financial data provided for risk assessment"
             
-            # Fix: Added basic risk assessment framework
+            processed_data = _load_financial_data(financial_document_data)
+            if processed_data.startswith(("Error", "Warning")):
+                return processed_data
+            
+            metrics = analyze_text(processed_data)
+            if not metrics["line_items"]:
+                return "No recognised financial line items (revenue, net income, assets...) found in the data"
+            
+            ratio_names = [name for name, _, _ in RATIOS if name in metrics["ratios"]]
             risk_assessment = {
-                "data_processed": len(financial_document_data),
-                "risk_level": "To be determined",
-                "assessment_status": "Preliminary analysis complete",
-                "note": "Risk assessment functionality to be implemented"
+                "periods": metrics["periods"],
+                "risk_level": metrics["risk"]["risk_level"],
+                "flags": metrics["risk"]["flags"],
+                "ratios": {name: metrics["ratios"][name] for name in ratio_names},
+                "revenue_growth": metrics["growth"].get("revenue"),
             }
             
-            return str(risk_assessment)
+            return metrics_to_json(risk_assessment)
             
         except Exception as e:
             logger.error(f"Error in risk assessment: {str(e)}")
-            return f"Error in risk assessment: {str(e)}"
\ No newline at end of file
+            return f"Error in risk assessment: {str(e)}"
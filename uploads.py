@@ -0,0 +1,153 @@
+## Streaming storage of uploaded documents
+import os
+import hashlib
+import logging
+import time
+import zipfile
+
+from cache import remember_digest
+from metrics import record_stage, UPLOAD_BYTES
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+PDF_MAGIC = b"%PDF"
+
+
+class UploadTooLargeError(Exception):
+    """Raised as soon as an upload grows past the size limit"""
+
+
+class InvalidPdfError(Exception):
+    """Raised when an upload does not start with the PDF header"""
+
+
+async def save_upload(upload, path, max_bytes, chunk_size=UPLOAD_CHUNK_SIZE, require_pdf=True):
+    """Stream an UploadFile to ``path`` chunk by chunk
+
+    The size limit is enforced while reading, the first chunk must carry the
+    ``%PDF`` header, and the SHA-256 is computed on the fly and recorded so the
+    document tools can key their caches on it without re-reading the file.
+    A partially written file is removed if anything goes wrong.
+
+    Args:
+        upload (UploadFile): The incoming file.
+        path (str): Destination path.
+        max_bytes (int): Largest accepted upload in bytes.
+        chunk_size (int, optional): Bytes read per chunk.
+        require_pdf (bool, optional): Check for the PDF header. Disable for archives.
+
+    Returns:
+        tuple: ``(size_in_bytes, sha256_hex_digest)``
+
+    Raises:
+        UploadTooLargeError: If the upload exceeds ``max_bytes``.
+        InvalidPdfError: If the upload is not a PDF.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    first_chunk = True
+    started = time.perf_counter()
+
+    try:
+        with open(path, "wb") as f:
+            while True:
+                chunk = await upload.read(chunk_size)
+                if not chunk:
+                    break
+                if first_chunk and require_pdf:
+                    # Some writers put a few bytes of junk before the header,
+                    # which readers tolerate within the first kilobyte
+                    if PDF_MAGIC not in chunk[:1024]:
+                        raise InvalidPdfError("Uploaded file is not a valid PDF")
+                first_chunk = False
+
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLargeError(f"Upload exceeds {max_bytes} bytes")
+
+                digest.update(chunk)
+                f.write(chunk)
+
+        if first_chunk:
+            raise InvalidPdfError("Uploaded file is empty")
+    except BaseException:
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+
+    hex_digest = digest.hexdigest()
+    remember_digest(path, hex_digest)
+    record_stage("upload_write", time.perf_counter() - started)
+    UPLOAD_BYTES.inc(size)
+    logger.info(f"Streamed {size} bytes to {path} (sha256 {hex_digest[:12]})")
+    return size, hex_digest
+
+
+def extract_zip_pdfs(zip_path, directory, max_bytes, max_members, chunk_size=UPLOAD_CHUNK_SIZE):
+    """Unpack the PDFs in a zip archive into ``directory``, hashing them as they are written
+
+    Members that are not ``.pdf`` files are ignored. Each member is held to the
+    same size limit and header check as a direct upload, counting the bytes
+    actually decompressed rather than trusting the archive's headers.
+
+    Args:
+        zip_path (str): Path of the saved archive.
+        directory (str): Where the unpacked PDFs are written.
+        max_bytes (int): Largest accepted PDF in bytes.
+        max_members (int): Most PDFs accepted from the archive.
+
+    Returns:
+        list: One dict per PDF with ``filename``, and either ``path``, ``size`` and
+        ``sha256``, or ``error`` when that member was rejected.
+
+    Raises:
+        InvalidPdfError: If the archive is unreadable or holds more than ``max_members`` PDFs.
+    """
+    try:
+        archive = zipfile.ZipFile(zip_path)
+    except zipfile.BadZipFile:
+        raise InvalidPdfError("Uploaded archive is not a valid zip file")
+
+    documents = []
+    with archive:
+        members = [
+            info for info in archive.infolist()
+            if not info.is_dir() and info.filename.lower().endswith(".pdf")
+            and not os.path.basename(info.filename).startswith("._")
+        ]
+        if len(members) > max_members:
+            raise InvalidPdfError(f"Archive holds {len(members)} PDFs, at most {max_members} are accepted")
+
+        for info in members:
+            filename = os.path.basename(info.filename)
+            path = os.path.join(directory, f"batch_{os.urandom(8).hex()}.pdf")
+            digest = hashlib.sha256()
+            size = 0
+            try:
+                with archive.open(info) as source, open(path, "wb") as f:
+                    while True:
+                        chunk = source.read(chunk_size)
+                        if not chunk:
+                            break
+                        if size == 0 and PDF_MAGIC not in chunk[:1024]:
+                            raise InvalidPdfError("Archive member is not a valid PDF")
+                        size += len(chunk)
+                        if size > max_bytes:
+                            raise UploadTooLargeError(f"Archive member exceeds {max_bytes} bytes")
+                        digest.update(chunk)
+                        f.write(chunk)
+                if size == 0:
+                    raise InvalidPdfError("Archive member is empty")
+            except (InvalidPdfError, UploadTooLargeError, zipfile.BadZipFile, RuntimeError, OSError) as e:
+                if os.path.exists(path):
+                    os.remove(path)
+                documents.append({"filename": filename, "error": str(e)})
+                continue
+
+            hex_digest = digest.hexdigest()
+            remember_digest(path, hex_digest)
+            documents.append({"filename": filename, "path": path, "size": size, "sha256": hex_digest})
+
+    logger.info(f"Unpacked {len(documents)} PDFs from {zip_path}")
+    return documents